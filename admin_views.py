@@ -0,0 +1,184 @@
+"""Admin pages: login, the dashboard, reviews, uploaded documents and metrics."""
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import (Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template, request,
+                   session, url_for)
+from sqlalchemy import select
+from werkzeug.security import check_password_hash
+
+import documents
+from applications import DOCUMENT_KINDS, bulk_review, filter_applications, instrumentation, parse_date, status_cache
+from models import COURSE_CHOICES, Admin, StoredFile, Student, application_stats, db, letter_queue, search_index
+from pagination import decode_cursor, keyset_page
+
+admin = Blueprint('admin', __name__)
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'admin_id' not in session:
+            return redirect(url_for('admin.admin_login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@admin.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    from forms import LoginForm
+    form = LoginForm()
+    if form.validate_on_submit():
+        admin = Admin.query.filter_by(username=form.username.data).first()
+        if admin and check_password_hash(admin.password_hash, form.password.data):
+            session['admin_id'] = admin.id
+            return redirect(url_for('admin.admin_dashboard'))
+        flash('Invalid username or password!', 'error')
+    
+    return render_template('admin_login.html', form=form)
+
+@admin.route('/admin/logout')
+def admin_logout():
+    session.pop('admin_id', None)
+    return redirect(url_for('public.index'))
+
+@admin.route('/admin/dashboard')
+@login_required
+def admin_dashboard():
+    from forms import BulkReviewForm
+    filters = {
+        'status': request.args.get('status', ''),
+        'course': request.args.get('course', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+        'q': request.args.get('q', '').strip(),
+        'duplicate_group': request.args.get('duplicate_group', ''),
+    }
+    # Badge totals come from the materialized counters, not from counting the table
+    counts = application_stats.counts(course=filters['course'], day_from=parse_date(filters['date_from']),
+                                      day_to=parse_date(filters['date_to']))
+    if filters['q']:
+        # Search results are ranked by relevance and only page forwards
+        page = search_index.search(
+            filters['q'], current_app.config['DASHBOARD_PAGE_SIZE'],
+            after=decode_cursor(request.args.get('after'), (float, int)),
+            where=lambda statement: filter_applications(statement, filters))
+        students = {s.id: s for s in Student.query.filter(Student.id.in_([row.id for row in page.items]))}
+        page = page._replace(items=[students[row.id] for row in page.items if row.id in students])
+        return render_template('admin_dashboard.html', applications=page.items, page=page,
+                               counts=counts, filters=filters,
+                               courses=COURSE_CHOICES, bulk_form=BulkReviewForm())
+
+    query = filter_applications(Student.query, filters, include_status=False)
+    if filters['status']:
+        query = query.filter(Student.status == filters['status'])
+
+    sort_key = [Student.application_date, Student.id]
+    key_types = (datetime, int)
+    page = keyset_page(
+        query, sort_key, current_app.config['DASHBOARD_PAGE_SIZE'],
+        after=decode_cursor(request.args.get('after'), key_types),
+        before=decode_cursor(request.args.get('before'), key_types),
+    )
+    return render_template('admin_dashboard.html', applications=page.items, page=page,
+                           counts=counts, filters=filters,
+                           courses=COURSE_CHOICES, bulk_form=BulkReviewForm())
+
+@admin.route('/admin/review/bulk', methods=['POST'])
+@login_required
+def bulk_review_applications():
+    from forms import BulkReviewForm
+    form = BulkReviewForm()
+    filters = {key: request.form.get(key, '')
+               for key in ('status_filter', 'course', 'date_from', 'date_to', 'duplicate_group')}
+    filters['status'] = filters.pop('status_filter')
+    if not form.validate_on_submit():
+        flash('Invalid bulk review request!', 'error')
+        return redirect(url_for('admin.admin_dashboard', **filters))
+
+    if request.form.get('scope') == 'filtered':
+        ids = None
+        # Only the filters set on the dashboard; with none, this would act on every application
+        active = {key: value for key, value in filters.items() if value}
+        if not active:
+            flash('Set at least one filter before applying to all filtered applications.', 'error')
+            return redirect(url_for('admin.admin_dashboard', **filters))
+    else:
+        active = None
+        ids = request.form.getlist('student_ids', type=int)
+        if not ids:
+            flash('Select at least one application.', 'error')
+            return redirect(url_for('admin.admin_dashboard', **filters))
+
+    try:
+        results = bulk_review(form.status.data, form.comments.data, ids=ids, filters=active)
+    except ValueError as exc:
+        flash(str(exc), 'error')
+        return redirect(url_for('admin.admin_dashboard', **filters))
+
+    updated = sum(1 for r in results if r['result'] == 'updated')
+    flash(f'{updated} applications {form.status.data} successfully!', 'success')
+    return redirect(url_for('admin.admin_dashboard', **filters))
+
+@admin.route('/admin/review/<int:student_id>', methods=['GET', 'POST'])
+@login_required
+def review_application(student_id):
+    from forms import ReviewForm
+    student = Student.query.get_or_404(student_id)
+    form = ReviewForm()
+    
+    if form.validate_on_submit():
+        student.status = form.status.data
+        student.admin_comments = form.comments.data
+        student.review_date = datetime.utcnow()
+        
+        # Queue admission letter generation if approved
+        if form.status.data == 'approved':
+            letter_queue.enqueue(student)
+        
+        db.session.commit()
+        status_cache.invalidate(student.application_id)
+        letter_queue.notify()
+        flash(f'Application {form.status.data} successfully!', 'success')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    duplicates = []
+    if student.duplicate_group:
+        duplicates = (Student.query.filter(Student.duplicate_group == student.duplicate_group, Student.id != student.id)
+                      .order_by(Student.id).limit(current_app.config['DUPLICATE_MAX_BUCKET']).all())
+    uploads = {kind: db.session.get(StoredFile, getattr(student, kind)) for kind in DOCUMENT_KINDS
+               if getattr(student, kind)}
+    return render_template('review_application.html', student=student, form=form, duplicates=duplicates,
+                           uploads=uploads)
+
+@admin.route('/admin/review/<int:student_id>/documents/<kind>')
+@login_required
+def view_document(student_id, kind):
+    """An upload: its smaller display copy if it has one, ?version=original or ?version=thumbnail"""
+    version = request.args.get('version', 'display')
+    if kind not in DOCUMENT_KINDS or version not in ('display', 'original', 'thumbnail'):
+        abort(404)
+    application_id, path = db.session.execute(
+        select(Student.application_id, getattr(Student, kind)).filter(Student.id == student_id)).first() or (None, None)
+    if not path:
+        abort(404)
+    # Uploads and their previews are stored under the upload's SHA-256, so a stored copy never changes
+    stored = db.session.get(StoredFile, path)
+    etag, max_age = (stored.sha256, current_app.config['DOCUMENT_MAX_AGE']) if stored else (True, 0)
+    if version == 'thumbnail' or (version == 'display' and stored and stored.display_path):
+        derived = stored and (stored.thumbnail_path if version == 'thumbnail' else stored.display_path)
+        if not derived:
+            abort(404)
+        return documents.send('uploads', derived, f'{application_id}_{kind}_{version}.jpg',
+                              etag=f'{etag}-{version}', max_age=max_age)
+    return documents.send('uploads', path, f'{application_id}_{kind}{os.path.splitext(path)[1]}',
+                          etag=etag, max_age=max_age)
+
+@admin.route('/admin/cache/stats')
+@login_required
+def cache_stats():
+    return jsonify({'status_cache': status_cache.stats()})
+
+@admin.route('/admin/metrics')
+@login_required
+def metrics():
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,66 @@
+"""Seat allocation: assign applicants to courses with limited seats by merit.
+
+Every course ranks applicants the same way (higher CGPA first, then the
+earlier application, then the lower id), so allocation walks applicants
+from best to worst and gives each the first course on their preference
+list that still has a seat: one sort and one pass, O(n log n) overall.
+
+Applicants currently have a single preference, the course they applied for
+(applications.allocate_seats passes (course_applied,)), which makes this a
+per-course merit cut: the top applicants of each course up to its free
+seats. The preference tuple is where ranked choices would go; with one
+common priority order the walk above is then still the stable matching
+that applicant-proposing deferred acceptance (Gale-Shapley) would produce.
+"""
+from collections import namedtuple
+
+# preferences is the applicant's ordered tuple of course codes, first choice first
+Applicant = namedtuple('Applicant', ['id', 'score', 'applied_at', 'preferences'])
+
+# assigned maps applicant id -> course; cutoffs maps course -> lowest admitted score
+Allocation = namedtuple('Allocation', ['assigned', 'unassigned', 'remaining', 'cutoffs'])
+
+
+def merit_key(applicant):
+    return (-applicant.score, applicant.applied_at, applicant.id)
+
+
+def allocate(applicants, capacities):
+    """Stable assignment of applicants to courses within capacities (course -> free seats)"""
+    remaining = dict(capacities)
+    assigned = {}
+    unassigned = []
+    cutoffs = {}
+    for applicant in sorted(applicants, key=merit_key):
+        for course in applicant.preferences:
+            if remaining.get(course, 0) > 0:
+                remaining[course] -= 1
+                assigned[applicant.id] = course
+                cutoffs[course] = applicant.score
+                break
+        else:
+            unassigned.append(applicant.id)
+    return Allocation(assigned, unassigned, remaining, cutoffs)
+
+
+def is_stable(applicants, capacities, allocation):
+    """True if no applicant prefers a course that has a free seat or admitted someone with lower merit.
+
+    A slow O(n * preferences) check, meant for tests and benchmarks.
+    """
+    by_id = {a.id: a for a in applicants}
+    weakest = {}
+    for applicant_id, course in allocation.assigned.items():
+        key = merit_key(by_id[applicant_id])
+        if course not in weakest or key > weakest[course]:
+            weakest[course] = key
+    for applicant in applicants:
+        current = allocation.assigned.get(applicant.id)
+        for course in applicant.preferences:
+            if course == current:
+                break
+            if allocation.remaining.get(course, 0) > 0 and capacities.get(course, 0) > 0:
+                return False
+            if course in weakest and merit_key(applicant) < weakest[course]:
+                return False
+    return True
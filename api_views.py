@@ -0,0 +1,261 @@
+"""JSON API used by the admin tools and integrations."""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import func, select
+
+import export
+import importer
+import search
+from admin_views import login_required
+from applications import (APPLICATION_FIELDS, DEFAULT_APPLICATION_FIELDS, DEFAULT_DETAIL_FIELDS, DEFAULT_MERIT_FIELDS,
+                          allocate_seats, application_serializer, bulk_review, filter_applications,
+                          import_applications, merit_list, parse_date, parse_seats, parse_timestamp)
+from models import COURSE_CHOICES, Student, application_stats, db, search_index
+from pagination import decode_cursor, keyset_rows
+
+api = Blueprint('api', __name__)
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def json_response(payload):
+    """Like jsonify, but encoded with export.dumps (orjson when installed)"""
+    return Response(export.dumps(payload), mimetype='application/json')
+
+def conditional_response(etag, last_modified, build):
+    """Answer 304 if the client already has etag, otherwise build() the response and tag it"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api.route('/api/applications')
+@login_required
+def api_applications():
+    fmt = request.args.get('format', 'json')
+    if fmt != 'json' and fmt not in export.FORMATS:
+        return jsonify({'error': f"format must be one of: json, {', '.join(export.FORMATS)}"}), 400
+    try:
+        fields = export.parse_fields(request.args.get('fields'), APPLICATION_FIELDS, DEFAULT_APPLICATION_FIELDS)
+        updated_since = parse_timestamp(request.args['updated_since']) if request.args.get('updated_since') else None
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    def filtered(statement):
+        statement = filter_applications(statement, request.args)
+        if updated_since:
+            statement = statement.filter(Student.updated_at > updated_since)
+        return statement
+
+    # A count and max(updated_at) over the index fingerprint the result, so an
+    # unchanged poll is answered with 304 before any row is read
+    count, last_modified = db.session.execute(
+        filtered(select(func.count(Student.id), func.max(Student.updated_at)))).one()
+    etag = make_etag(request.query_string, count, last_modified)
+
+    # Select only the columns the requested fields need, not whole Student objects
+    names = export.required_columns(fields, APPLICATION_FIELDS)
+    columns = [getattr(Student, name) for name in names]
+    paginated = fmt == 'json' and any(key in request.args for key in ('limit', 'cursor', 'updated_since'))
+    if paginated:
+        sort_key = [Student.updated_at, Student.id]
+        after = decode_cursor(request.args.get('cursor'), (datetime, int))
+        if request.args.get('cursor') and after is None:
+            return jsonify({'error': 'invalid cursor'}), 400
+        limit = min(max(request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int), 1),
+                    current_app.config['API_PAGE_SIZE_MAX'])
+        statement = filtered(select(*columns, *[c for c in sort_key if c.key not in names]))
+
+        def build():
+            page = keyset_rows(db.session, statement, sort_key, limit, after=after)
+            return json_response({
+                'items': application_serializer.to_dicts(page.items, fields),
+                'next_cursor': page.next_cursor
+            })
+        return conditional_response(etag, last_modified, build)
+
+    statement = filtered(select(*columns)).order_by(Student.id)
+
+    def build():
+        batches = export.iter_batches(db.session, statement, current_app.config['EXPORT_BATCH_SIZE'])
+        if fmt == 'json':
+            return json_response([item for rows in batches for item in application_serializer.to_dicts(rows, fields)])
+        encode = export.ndjson_stream if fmt == 'ndjson' else export.csv_stream
+        response = Response(stream_with_context(encode(batches, fields, application_serializer)),
+                            mimetype=export.FORMATS[fmt])
+        if fmt == 'csv':
+            response.headers['Content-Disposition'] = 'attachment; filename=applications.csv'
+        return response
+    return conditional_response(etag, last_modified, build)
+
+@api.route('/api/applications/search')
+@login_required
+def api_search_applications():
+    query = request.args.get('q', '').strip()
+    if not search.words(query):
+        return jsonify({'error': 'q must contain at least one word'}), 400
+    try:
+        fields = export.parse_fields(request.args.get('fields'), APPLICATION_FIELDS, DEFAULT_APPLICATION_FIELDS)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    after = decode_cursor(request.args.get('cursor'), (float, int))
+    if request.args.get('cursor') and after is None:
+        return jsonify({'error': 'invalid cursor'}), 400
+    limit = min(max(request.args.get('limit', current_app.config['SEARCH_PAGE_SIZE'], type=int), 1),
+                current_app.config['SEARCH_PAGE_SIZE_MAX'])
+
+    page = search_index.search(query, limit, after=after,
+                               where=lambda statement: filter_applications(statement, request.args))
+    ids = [row.id for row in page.items]
+    names = export.required_columns(fields, APPLICATION_FIELDS)
+    columns = [getattr(Student, name) for name in names]
+    rows = db.session.execute(
+        select(Student.id.label('id'), *[c for c in columns if c.key != 'id']).filter(Student.id.in_(ids))).all()
+    items = {row.id: item for row, item in zip(rows, application_serializer.to_dicts(rows, fields))}
+    payload = {
+        'items': [dict(items[row.id], score=row.score) for row in page.items if row.id in items],
+        'next_cursor': page.next_cursor
+    }
+    return conditional_response(make_etag(request.query_string, payload), None, lambda: json_response(payload))
+
+@api.route('/api/applications/import', methods=['POST'])
+@login_required
+def api_import_applications():
+    upload = request.files.get('file')
+    if upload:
+        stream, fmt = upload.stream, importer.detect_format(upload.filename)
+    else:
+        stream, fmt = request.stream, importer.MIMETYPES.get(request.mimetype)
+    fmt = request.args.get('format') or fmt
+    if fmt not in importer.FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(importer.FORMATS)}"}), 400
+
+    errors, limit = [], current_app.config['IMPORT_ERROR_LIMIT']
+    def report(error):
+        if len(errors) <= limit:
+            errors.append(error._asdict())
+    imported, rejected = import_applications(importer.READERS[fmt](importer.text_stream(stream)), report)
+    return jsonify({
+        'imported': imported,
+        'rejected': rejected,
+        'errors': errors[:limit],
+        'errors_truncated': len(errors) > limit
+    })
+
+@api.route('/api/applications/review', methods=['POST'])
+@login_required
+def api_bulk_review():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    status = payload.get('status')
+    comments = payload.get('comments') or ''
+    ids = payload.get('ids')
+    filters = payload.get('filter')
+    if status not in ('approved', 'rejected'):
+        return jsonify({'error': "status must be 'approved' or 'rejected'"}), 400
+    if not isinstance(comments, str) or len(comments) > 500:
+        return jsonify({'error': 'comments must be a string of at most 500 characters'}), 400
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({'error': 'ids must be a list of integers'}), 400
+    elif filters is None:
+        return jsonify({'error': 'provide either ids or a filter'}), 400
+
+    try:
+        results = bulk_review(status, comments, ids=ids, filters=filters)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({
+        'status': status,
+        'updated': sum(1 for r in results if r['result'] == 'updated'),
+        'results': results
+    })
+
+@api.route('/api/allocation', methods=['POST'])
+@login_required
+def api_allocate_seats():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    try:
+        seats = parse_seats(payload.get('seats', current_app.config['COURSE_SEATS']))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(allocate_seats(seats, dry_run=bool(payload.get('dry_run')),
+                                  reject_unassigned=bool(payload.get('reject_unassigned'))))
+
+@api.route('/api/merit-list')
+@login_required
+def api_merit_list():
+    courses = [value for value, _ in COURSE_CHOICES]
+    course = request.args.get('course')
+    status = request.args.get('status')
+    limit = request.args.get('limit', 10, type=int)
+    if course and course not in courses:
+        return jsonify({'error': f"course must be one of: {', '.join(courses)}"}), 400
+    if status and status not in ('pending', 'approved', 'rejected'):
+        return jsonify({'error': "status must be 'pending', 'approved' or 'rejected'"}), 400
+    if not 1 <= limit <= current_app.config['MERIT_LIST_MAX']:
+        return jsonify({'error': f"limit must be between 1 and {current_app.config['MERIT_LIST_MAX']}"}), 400
+    try:
+        fields = export.parse_fields(request.args.get('fields'), APPLICATION_FIELDS, DEFAULT_MERIT_FIELDS)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    names = export.required_columns(fields, APPLICATION_FIELDS)
+    ranked = merit_list(limit, names, courses=[course] if course else None, status=status)
+    return json_response({
+        'limit': limit,
+        'courses': {name: [dict(item, rank=row.rank)
+                           for row, item in zip(rows, application_serializer.to_dicts(rows, fields))]
+                    for name, rows in ranked.items()}
+    })
+
+@api.route('/api/stats')
+@login_required
+def api_stats():
+    courses = [value for value, _ in COURSE_CHOICES]
+    course = request.args.get('course')
+    days = request.args.get('days', current_app.config['STATS_DAYS'], type=int)
+    if course and course not in courses:
+        return jsonify({'error': f"course must be one of: {', '.join(courses)}"}), 400
+    if not 1 <= days <= current_app.config['STATS_DAYS_MAX']:
+        return jsonify({'error': f"days must be between 1 and {current_app.config['STATS_DAYS_MAX']}"}), 400
+    day_from = parse_date(request.args.get('date_from'))
+    day_to = parse_date(request.args.get('date_to'))
+
+    # Every figure is read from the materialized counters; the student table is never scanned
+    payload = {
+        'totals': application_stats.counts(course=course),
+        'by_course': application_stats.by_course(),
+        'by_day': application_stats.by_day(course=course, day_from=day_from, day_to=day_to, limit=days),
+    }
+    return conditional_response(make_etag(request.query_string, payload), None, lambda: jsonify(payload))
+
+@api.route('/api/application/<int:student_id>')
+@login_required
+def api_application_detail(student_id):
+    try:
+        fields = export.parse_fields(request.args.get('fields'), APPLICATION_FIELDS, DEFAULT_DETAIL_FIELDS)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    updated_at = db.session.execute(select(Student.updated_at).filter(Student.id == student_id)).first()
+    if updated_at is None:
+        return jsonify({'error': 'application not found'}), 404
+    etag = make_etag(request.query_string, student_id, updated_at[0])
+
+    def build():
+        columns = [getattr(Student, name) for name in export.required_columns(fields, APPLICATION_FIELDS)]
+        rows = db.session.execute(select(*columns).filter(Student.id == student_id)).all()
+        return json_response(application_serializer.to_dicts(rows, fields)[0])
+    return conditional_response(etag, updated_at[0], build)
@@ -0,0 +1,637 @@
+"""Application workflows shared by the views, the API and the CLI commands.
+
+Status lookups through the status cache, uploads and their reference
+counts, dashboard filters, bulk review, merit lists, seat allocation and
+bulk import, and sending current admission letters. Everything here
+expects an app context.
+"""
+import logging
+import os
+import uuid
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import func, or_, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+import allocation
+import archive
+import dedup
+import export
+import grades
+import importer
+import letters
+import previews
+import storage
+from cache import MemoryBackend, ReadThroughCache, create_backend
+from letter_queue import FAILED, PENDING_STATES, READY
+from letter_store import LetterStore, file_mtime_ns, read_letter, write_letter
+from metrics import Instrumentation, gauge_lines
+from ratelimit import RateLimiter
+from models import (COURSE_CHOICES, ArchivedApplication, StoredFile, Student, application_stats, db, document_queue,
+                    duplicate_index, letter_queue, search_index)
+
+logger = logging.getLogger(__name__)
+
+instrumentation = Instrumentation()
+rate_limiter = RateLimiter(instrumentation.registry)
+
+# Fields shown by /check_status and needed by /download_letter, and where an archived application's documents are
+StatusSnapshot = namedtuple('StatusSnapshot', [
+    'application_id', 'first_name', 'last_name', 'email', 'course_applied', 'status',
+    'application_date', 'review_date', 'admin_comments', 'admission_letter_path', 'letter_status',
+    'archive_cycle', 'archive_pack'
+], defaults=(None, None))
+STUDENT_STATUS_FIELDS = StatusSnapshot._fields[:-2]
+
+# Shared by every app in the process; create_app configures them from the app's config (init_caches)
+status_cache = ReadThroughCache(MemoryBackend())
+letter_store = LetterStore()
+letter_queue.on_change(lambda application_ids: status_cache.invalidate(*application_ids))
+letter_queue.on_rendered(instrumentation.observe_letters)
+
+
+def init_caches(app):
+    """Build status_cache and letter_store from app.config; with several apps in a process the last one built wins"""
+    config = app.config
+    status_cache.configure(create_backend(config['STATUS_CACHE_BACKEND'], config['STATUS_CACHE_SIZE'],
+                                          config['STATUS_CACHE_PATH']), config['STATUS_CACHE_TTL'])
+    letter_store.configure(config['LETTER_CACHE_SIZE'], config['LETTER_CACHE_MAX_BYTES'])
+
+
+@instrumentation.registry.register_collector
+def status_cache_metrics():
+    stats = status_cache.stats()
+    lines = []
+    for key in ('hits', 'misses', 'evictions', 'size'):
+        lines.extend(gauge_lines(f'status_cache_{key}', f'Status cache {key}.', stats[key]))
+    return lines
+
+
+@instrumentation.registry.register_collector
+def letter_store_metrics():
+    stats = letter_store.stats()
+    lines = []
+    for key in ('hits', 'misses', 'coalesced', 'evictions', 'size', 'bytes'):
+        lines.extend(gauge_lines(f'letter_cache_{key}', f'Admission letter cache {key}.', stats[key]))
+    return lines
+
+
+@lru_cache(maxsize=None)
+def _row_validator():
+    from forms import ApplicationForm
+    return importer.RowValidator(ApplicationForm)
+
+def application_validator(record, line=0):
+    """Check an import record with ApplicationForm's validators, collected on first use"""
+    return _row_validator()(record, line)
+
+def generate_application_id():
+    return f"APP{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:8].upper()}"
+
+# Student columns holding uploads
+DOCUMENT_KINDS = ('degree_certificate', 'id_proof')
+
+def save_file(file, folder):
+    """Store an upload content-addressed under folder and take a reference to it"""
+    if file:
+        blob = storage.save_stream(file.stream, folder, file.filename)
+        add_file_reference(blob)
+        if not os.path.exists(os.path.join(folder, blob.path)):
+            # The same content lost its last reference and was deleted after save_stream
+            # found it; taking the reference waited for that, so store the file again
+            file.stream.seek(0)
+            storage.save_stream(file.stream, folder, file.filename)
+        return blob.path
+    return None
+
+def add_file_reference(blob):
+    """Count one more student column pointing at blob; committed with the caller's session"""
+    updated = (StoredFile.query.filter_by(path=blob.path)
+               .update({'ref_count': StoredFile.ref_count + 1}, synchronize_session=False))
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredFile(path=blob.path, sha256=blob.sha256, size=blob.size, ref_count=1,
+                                      **document_queue.queued_values()))
+    except IntegrityError:
+        # Another request stored the same content first
+        (StoredFile.query.filter_by(path=blob.path)
+         .update({'ref_count': StoredFile.ref_count + 1}, synchronize_session=False))
+
+def release_file(path):
+    """Drop one reference to an upload.
+
+    Returns True when that was the last reference. The row stays, with a
+    ref_count of 0, until delete_unreferenced_file() is called after the
+    caller's session is committed.
+    """
+    stored = db.session.get(StoredFile, path)
+    if stored is None:
+        return False
+    stored.ref_count -= 1
+    return stored.ref_count <= 0
+
+def delete_unreferenced_file(path):
+    """Delete an upload, its previews and its row, unless a new reference was taken after its release.
+
+    The row is deleted only while its ref_count is still 0, and the files
+    are removed before that DELETE commits. A request storing the same
+    content meanwhile waits on the row, then stores the file again
+    (see save_file). Commits; returns whether the upload was deleted.
+    """
+    deleted = (StoredFile.query.filter(StoredFile.path == path, StoredFile.ref_count <= 0)
+               .delete(synchronize_session=False))
+    if deleted:
+        folder = current_app.config['UPLOAD_FOLDER']
+        try:
+            storage.delete_blob(folder, path)
+            previews.delete_derived(folder, path)
+        except OSError:
+            db.session.rollback()  # keep the row, so a later run tries again
+            raise
+    db.session.commit()
+    return bool(deleted)
+
+# Fields available to /api/applications?fields=...
+APPLICATION_FIELDS = {name: export.column(name) for name in (
+    'id', 'application_id', 'first_name', 'last_name', 'email', 'phone', 'address',
+    'date_of_birth', 'course_applied', 'previous_qualification', 'cgpa', 'status',
+    'application_date', 'review_date', 'admin_comments', 'letter_status', 'updated_at',
+    'cgpa_score', 'birth_date', 'duplicate_group'
+)}
+APPLICATION_FIELDS['name'] = export.Field(('first_name', 'last_name'), lambda row: f"{row.first_name} {row.last_name}")
+APPLICATION_FIELDS['course'] = export.column('course_applied')
+application_serializer = export.Serializer(APPLICATION_FIELDS, Student.__table__)
+DEFAULT_APPLICATION_FIELDS = ('id', 'application_id', 'name', 'email', 'course', 'status', 'application_date')
+DEFAULT_MERIT_FIELDS = ('id', 'application_id', 'name', 'cgpa', 'cgpa_score', 'status', 'application_date')
+DEFAULT_DETAIL_FIELDS = ('id', 'application_id', 'first_name', 'last_name', 'email', 'phone', 'course_applied',
+                         'status', 'cgpa', 'application_date', 'admin_comments')
+
+def load_status(application_id):
+    """Status fields of an application from the student table, or else from its cycle's archive"""
+    columns = [getattr(Student, name) for name in STUDENT_STATUS_FIELDS]
+    row = db.session.query(*columns).filter(Student.application_id == application_id).first()
+    if row:
+        return tuple(row)
+    archived = db.session.get(ArchivedApplication, application_id)
+    if archived is None:
+        return None
+    row = archive.load_row(current_app.config['ARCHIVE_FOLDER'], archived.cycle, Student.__table__,
+                           application_id, STUDENT_STATUS_FIELDS + ('archive_pack',))
+    return tuple(row[:-1]) + (archived.cycle, row[-1]) if row else None
+
+def lookup_status(application_id):
+    """Status snapshot for an application ID through the read-through status cache"""
+    if not application_id:
+        return None
+    values = status_cache.get(application_id, load_status)
+    return StatusSnapshot(*values) if values else None
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp into the naive UTC datetimes stored in the database"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def filter_applications(query, filters, include_status=True):
+    """Apply dashboard/API filters (status, course, date ranges, minimum CGPA, duplicate group) to a Student query"""
+    if include_status and filters.get('status'):
+        query = query.filter(Student.status == filters['status'])
+    if filters.get('course'):
+        query = query.filter(Student.course_applied == filters['course'])
+    date_from = parse_date(filters.get('date_from'))
+    if date_from:
+        query = query.filter(Student.application_date >= date_from)
+    date_to = parse_date(filters.get('date_to'))
+    if date_to:
+        query = query.filter(Student.application_date < date_to + timedelta(days=1))
+    born_from = grades.parse_birth_date(filters.get('born_from'))
+    if born_from:
+        query = query.filter(Student.birth_date >= born_from)
+    born_to = grades.parse_birth_date(filters.get('born_to'))
+    if born_to:
+        query = query.filter(Student.birth_date <= born_to)
+    min_cgpa = grades.parse_cgpa(filters.get('min_cgpa'))
+    if min_cgpa is not None:
+        query = query.filter(Student.cgpa_score >= min_cgpa)
+    if str(filters.get('duplicate_group') or '').isdigit():
+        query = query.filter(Student.duplicate_group == int(filters['duplicate_group']))
+    return query
+
+# Filters a bulk review may select applications by, and how each value is read
+REVIEW_FILTERS = {
+    'status': lambda value: value if value in ('pending', 'approved', 'rejected') else None,
+    'course': lambda value: value if value in dict(COURSE_CHOICES) else None,
+    'date_from': parse_date,
+    'date_to': parse_date,
+    'born_from': grades.parse_birth_date,
+    'born_to': grades.parse_birth_date,
+    'min_cgpa': grades.parse_cgpa,
+    'duplicate_group': lambda value: int(value) if str(value).isdigit() else None,
+}
+
+def check_review_filter(filters):
+    """Reject a bulk review filter that could select more than was meant.
+
+    Unknown keys, empty or unreadable values and a filter without any
+    condition raise ValueError, so that a typo never widens the update to
+    the whole table.
+    """
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError('filter must be an object with at least one of: ' + ', '.join(REVIEW_FILTERS))
+    unknown = sorted(set(filters) - set(REVIEW_FILTERS))
+    if unknown:
+        raise ValueError(f"unknown filter {', '.join(unknown)}; use: {', '.join(REVIEW_FILTERS)}")
+    for key, value in filters.items():
+        if isinstance(value, bool) or value in (None, '') or REVIEW_FILTERS[key](value) is None:
+            raise ValueError(f'filter {key} has an invalid value: {value!r}')
+
+def bulk_review(status, comments, ids=None, filters=None):
+    """Apply one decision to many applications with a single UPDATE and report per-item results"""
+    query = Student.query
+    if ids is not None:
+        query = query.filter(Student.id.in_(ids))
+    else:
+        check_review_filter(filters)
+        query = filter_applications(query, filters)
+    limit = current_app.config['BULK_REVIEW_LIMIT']
+    matched = (query.with_entities(Student.id, Student.application_id, Student.application_date,
+                                   Student.course_applied, Student.status)
+               .order_by(Student.id).limit(limit + 1).all())
+    if len(matched) > limit:
+        raise ValueError(f'Bulk review is limited to {limit} applications at a time')
+
+    matched_ids = [row.id for row in matched]
+    if matched_ids:
+        values = {'status': status, 'admin_comments': comments, 'review_date': datetime.utcnow()}
+        if status == 'approved':
+            values.update(letter_queue.queued_values())
+        Student.query.filter(Student.id.in_(matched_ids)).update(values, synchronize_session=False)
+        application_stats.record((row.application_date, row.course_applied, row.status, status) for row in matched)
+    db.session.commit()
+
+    status_cache.invalidate(*[row.application_id for row in matched])
+
+    # Letters for the whole batch are rendered together
+    letter_states = {}
+    if status == 'approved' and matched_ids:
+        letter_queue.notify()
+        letter_states = dict(db.session.query(Student.id, Student.letter_status)
+                             .filter(Student.id.in_(matched_ids)))
+
+    results = [{
+        'id': row.id,
+        'application_id': row.application_id,
+        'result': 'updated',
+        'letter_status': letter_states.get(row.id),
+    } for row in matched]
+    missing = set(ids or []) - set(matched_ids)
+    results.extend({'id': student_id, 'result': 'not_found'} for student_id in sorted(missing))
+    return results
+
+def merit_list(per_course, names, courses=None, status=None):
+    """The top per_course applicants of each course by cgpa_score, ranked in SQL with ROW_NUMBER().
+
+    Ranking every row would read the whole table, so each course's top
+    per_course ids are first read in merit order from ix_student_course_cgpa
+    with a LIMIT. The window function then only ranks those rows. Ties on
+    score go to the earlier application.
+    """
+    courses = courses or [value for value, _ in COURSE_CHOICES]
+    ranked_by = aliased(Student)
+    tops = []
+    for course in courses:
+        top = (select(ranked_by.id)
+               .where(ranked_by.course_applied == course, ranked_by.cgpa_score.isnot(None))
+               .order_by(ranked_by.cgpa_score.desc(), ranked_by.application_date, ranked_by.id)
+               .limit(per_course))
+        if status:
+            top = top.where(ranked_by.status == status)
+        # SQLite only allows LIMIT on a compound member inside a subquery
+        tops.append(select(top.subquery().c.id))
+    candidate_ids = union_all(*tops) if len(tops) > 1 else tops[0]
+
+    rank = func.row_number().over(
+        partition_by=Student.course_applied,
+        order_by=(Student.cgpa_score.desc(), Student.application_date, Student.id),
+    ).label('rank')
+    columns = [getattr(Student, name) for name in names if name != 'course_applied']
+    candidates = select(Student.course_applied, *columns, rank).where(Student.id.in_(candidate_ids)).subquery()
+    rows = db.session.execute(select(candidates)
+                              .where(candidates.c.rank <= per_course)
+                              .order_by(candidates.c.course_applied, candidates.c.rank)).all()
+
+    result = {course: [] for course in courses}
+    for row in rows:
+        result[row.course_applied].append(row)
+    return result
+
+def allocate_seats(seats, dry_run=False, reject_unassigned=False):
+    """Allocate course seats to pending applicants by merit and, unless dry_run, record the decisions.
+
+    seats maps course -> total seats; applications already approved count
+    against them. Decisions are written with one UPDATE per
+    ALLOCATION_BATCH_SIZE applicants and committed together.
+    """
+    approved = dict(db.session.execute(
+        select(Student.course_applied, func.count(Student.id))
+        .where(Student.status == 'approved').group_by(Student.course_applied)).all())
+    capacities = {course: max(total - approved.get(course, 0), 0) for course, total in seats.items()}
+
+    rows = db.session.execute(
+        select(Student.id, Student.application_id, Student.course_applied, Student.cgpa_score,
+               Student.application_date)
+        .where(Student.status == 'pending', Student.cgpa_score.isnot(None), Student.course_applied.in_(list(seats)))
+        .execution_options(yield_per=current_app.config['ALLOCATION_BATCH_SIZE']))
+    application_ids = {}
+    cells = {}
+    applicants = []
+    for row in rows:
+        application_ids[row.id] = row.application_id
+        cells[row.id] = (row.application_date, row.course_applied)
+        applicants.append(allocation.Applicant(row.id, row.cgpa_score, row.application_date or datetime.min,
+                                               (row.course_applied,)))
+    result = allocation.allocate(applicants, capacities)
+
+    summary = {
+        'dry_run': dry_run,
+        'applicants': len(applicants),
+        'allocated': len(result.assigned),
+        'unassigned': len(result.unassigned),
+        'courses': {course: {
+            'seats': seats[course],
+            'already_approved': approved.get(course, 0),
+            'allocated': capacities[course] - result.remaining[course],
+            'remaining': result.remaining[course],
+            'cutoff': result.cutoffs.get(course),
+        } for course in seats},
+    }
+    if dry_run:
+        return summary
+
+    now = datetime.utcnow()
+    batch_size = current_app.config['ALLOCATION_BATCH_SIZE']
+    approve = dict(letter_queue.queued_values(), status='approved', review_date=now,
+                   admin_comments='Seat allocated by merit')
+    decisions = [(list(result.assigned), approve)]
+    if reject_unassigned:
+        decisions.append((result.unassigned, {'status': 'rejected', 'review_date': now,
+                                              'admin_comments': 'No seat available in the chosen course'}))
+    changed = {}
+    for ids, values in decisions:
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            (Student.query
+             .filter(Student.id.in_(batch), Student.status == 'pending')
+             .update(values, synchronize_session=False))
+            # Applicants reviewed meanwhile were skipped; the review date identifies the rows this changed
+            changed[values['status']] = changed.get(values['status'], []) + list(db.session.scalars(
+                select(Student.id).where(Student.id.in_(batch), Student.status == values['status'],
+                                         Student.review_date == now)))
+        application_stats.record((*cells[i], 'pending', values['status']) for i in changed[values['status']])
+    db.session.commit()
+
+    status_cache.invalidate(*[application_ids[i] for ids in changed.values() for i in ids])
+    if changed.get('approved'):
+        letter_queue.notify()
+    return summary
+
+def parse_seats(raw):
+    """Validate a course -> seats mapping, raising ValueError on unknown courses or bad counts"""
+    courses = {value for value, _ in COURSE_CHOICES}
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError('seats must map course codes to seat counts')
+    unknown = sorted(set(raw) - courses)
+    if unknown:
+        raise ValueError(f"Unknown courses: {', '.join(unknown)}")
+    if not all(isinstance(n, int) and not isinstance(n, bool) and n >= 0 for n in raw.values()):
+        raise ValueError('seat counts must be non-negative integers')
+    return dict(raw)
+
+def unique_application_ids(count):
+    """count new IDs in the generate_application_id() format that no application has yet"""
+    ids = set()
+    while len(ids) < count:
+        candidates = {generate_application_id() for _ in range(count - len(ids))} - ids
+        taken = set(db.session.execute(
+            select(Student.application_id).where(Student.application_id.in_(candidates))).scalars())
+        ids |= candidates - taken
+    return list(ids)
+
+def insert_applications(batch, report):
+    """Insert a batch of validated (line, values) rows with one multi-row INSERT and commit.
+
+    Rows repeating an application still pending for the same course, in the
+    database or earlier in the batch, are passed to report() instead.
+    Returns (imported, rejected).
+    """
+    block_kinds = current_app.config['DUPLICATE_BLOCK_KEYS']
+    students = [SimpleNamespace(**values) for _, values in batch]
+    refused = {id(student) for student in duplicate_index.pending_matches(students, block_kinds)}
+    claimed, rows, accepted = set(), [], []
+    for (line, values), student in zip(batch, students):
+        claims = {(kind, value, student.course_applied) for kind, value in dedup.keys(student) if kind in block_kinds}
+        if id(student) in refused or claims & claimed:
+            report(importer.RowError(line, '', 'An application for this course with these details is already pending.'))
+            continue
+        claimed |= claims
+        rows.append(values)
+        accepted.append(student)
+    if not rows:
+        return 0, len(batch)
+
+    table = Student.__table__
+    now = datetime.utcnow()
+    for row, student, application_id in zip(rows, accepted, unique_application_ids(len(rows))):
+        row.update(application_id=application_id, status='pending', application_date=now, updated_at=now)
+        vars(student).update(row)
+    db.session.execute(table.insert(), rows)
+    # RETURNING would cost one INSERT per row on SQLite; the new IDs find the rows instead
+    ids = dict(db.session.execute(select(Student.application_id, Student.id)
+                                  .where(Student.application_id.in_([row['application_id'] for row in rows]))).all())
+    for student in accepted:
+        student.id = ids[student.application_id]
+    # The ORM session never sees these rows, so its listeners have to be told
+    application_stats.record((now, row['course_applied'], None, 'pending') for row in rows)
+    search_index.add(accepted)
+    duplicate_index.add(accepted)
+    db.session.commit()
+    return len(rows), len(batch) - len(rows)
+
+def import_applications(records, report):
+    """Validate and insert applications from the (line, record) pairs of an importer reader.
+
+    Valid rows are inserted IMPORT_BATCH_SIZE at a time and committed per
+    batch, so memory stays at one batch however large the input. Rows that
+    fail ApplicationForm's checks, or repeat an application still pending
+    for the same course, are passed to report() as RowErrors. Returns
+    (imported, rejected).
+    """
+    batch_size = current_app.config['IMPORT_BATCH_SIZE']
+    batch = []
+    imported = rejected = 0
+    for line, record in records:
+        if isinstance(record, importer.RowError):
+            errors = [record]
+        else:
+            values, errors = application_validator(record, line)
+        if errors:
+            rejected += 1
+            for error in errors:
+                report(error)
+            continue
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            inserted, refused = insert_applications(batch, report)
+            imported, rejected, batch = imported + inserted, rejected + refused, []
+    if batch:
+        inserted, refused = insert_applications(batch, report)
+        imported, rejected = imported + inserted, rejected + refused
+    return imported, rejected
+
+def archive_applications(before, dry_run=False):
+    """Move decided applications made before the cutoff into their intake cycle's archive.
+
+    ARCHIVE_BATCH_SIZE applications at a time, their documents are packed
+    and their rows copied into the cycle's applications.db (see archive.py).
+    Only then are they deleted from the student table, through the session
+    so the counters and the search and duplicate indexes follow, in the same
+    commit that records them in archived_application. Letters, and uploads
+    no remaining application references (delete_unreferenced_file), are
+    removed after that commit.
+    Applications whose letter is still being generated wait for a later
+    run. Returns the number of applications per cycle.
+    """
+    config = current_app.config
+    folder, start_month = config['ARCHIVE_FOLDER'], config['ARCHIVE_CYCLE_START_MONTH']
+    candidates = (Student.query
+                  .filter(Student.status.in_(('approved', 'rejected')), Student.application_date < before,
+                          or_(Student.letter_status.is_(None), Student.letter_status.notin_(PENDING_STATES)))
+                  .order_by(Student.id))
+    archived = Counter()
+    if dry_run:
+        for (applied,) in candidates.with_entities(Student.application_date):
+            archived[archive.cycle_of(applied, start_month)] += 1
+        return dict(archived)
+
+    table = Student.__table__
+    while True:
+        students = candidates.limit(config['ARCHIVE_BATCH_SIZE']).all()
+        if not students:
+            break
+        cycles = {}
+        for student in students:
+            cycles.setdefault(archive.cycle_of(student.application_date, start_month), []).append(student)
+        for cycle, group in cycles.items():
+            members = {}
+            for student in group:
+                stored = [('uploads', config['UPLOAD_FOLDER'], getattr(student, kind)) for kind in DOCUMENT_KINDS]
+                stored.append(('letters', config['PDF_FOLDER'], student.admission_letter_path))
+                for area, root, path in stored:
+                    if path:
+                        members[archive.member(area, path)] = os.path.join(root, path)
+            pack = archive.write_pack(folder, cycle, members.items())
+            archive.store_rows(folder, cycle, table,
+                               [{c.name: getattr(student, c.name) for c in table.columns} for student in group], pack)
+
+        application_ids = [student.application_id for student in students]
+        letter_paths = [student.admission_letter_path for student in students if student.admission_letter_path]
+        for cycle, group in cycles.items():
+            for student in group:
+                for path in (getattr(student, kind) for kind in DOCUMENT_KINDS):
+                    if path:
+                        release_file(path)
+                db.session.add(ArchivedApplication(application_id=student.application_id, cycle=cycle))
+                db.session.delete(student)
+            archived[cycle] += len(group)
+        db.session.commit()
+
+        # Also picks up uploads released by an earlier run that stopped here
+        for (path,) in StoredFile.query.filter(StoredFile.ref_count <= 0).with_entities(StoredFile.path).all():
+            delete_unreferenced_file(path)
+        for path in letter_paths:
+            storage.delete_blob(config['PDF_FOLDER'], path)
+        status_cache.invalidate(*application_ids)
+    return dict(archived)
+
+def current_letter(application_id, in_memory=True):
+    """The up-to-date admission letter of an approved application still in the student table.
+
+    Returns a StoredLetter from letter_store, or without in_memory the
+    letter's path under PDF_FOLDER, or None if the application is not
+    approved or its letter cannot be rendered. A letter whose file is
+    missing, whose last render failed, or that was rendered from other
+    student fields is rendered again first. Concurrent downloads share one
+    read or render, waiting at most LETTER_DOWNLOAD_WAIT seconds for it
+    (TimeoutError). Letters rendered before their key was recorded are sent as they are.
+    """
+    columns = [getattr(Student, name) for name in letters.LETTER_FIELDS]
+    row = (db.session.query(Student.id, Student.status, Student.letter_status, Student.letter_key,
+                            Student.admission_letter_path, *columns)
+           .filter(Student.application_id == application_id).first())
+    if row is None or row.status != 'approved':
+        return None
+    fields = {name: getattr(row, name) for name in letters.LETTER_FIELDS}
+    key = letters.letter_key(fields)
+    relative = row.admission_letter_path or letters.letter_filename(application_id)
+    path = os.path.join(current_app.config['PDF_FOLDER'], relative)
+    mtime_ns = file_mtime_ns(path)
+    current = mtime_ns is not None and row.letter_status != FAILED and row.letter_key in (key, None)
+    if current and not in_memory:
+        return relative
+
+    if current:
+        def produce():
+            return read_letter(key, path)
+    else:
+        def produce():
+            return _render_letter(row.id, fields, key, relative, path)
+    try:
+        letter = letter_store.load(key, produce, fresh=lambda letter: letter.mtime_ns == mtime_ns,
+                                   timeout=current_app.config['LETTER_DOWNLOAD_WAIT'])
+    except TimeoutError:
+        raise
+    except Exception:
+        return None
+    return letter if in_memory else relative
+
+
+def _render_letter(student_id, fields, key, relative, path):
+    """Render a stale or missing letter in the request and record it on the student row"""
+    # Leave letters queued in the meantime to the queue
+    unclaimed = Student.query.filter(Student.id == student_id,
+                                     or_(Student.letter_status.is_(None), Student.letter_status.notin_(PENDING_STATES)))
+    letter_queue.make_folder()
+    try:
+        letter = write_letter(key, path, _letter_bytes(fields))
+    except Exception:
+        logger.exception('Rendering admission letter for %s failed', fields['application_id'])
+        unclaimed.update({'letter_status': FAILED, 'letter_status_at': datetime.utcnow()},
+                         synchronize_session=False)
+        db.session.commit()
+        status_cache.invalidate(fields['application_id'])
+        raise
+    unclaimed.update({'letter_status': READY, 'letter_status_at': datetime.utcnow(), 'letter_key': key,
+                      'admission_letter_path': relative}, synchronize_session=False)
+    db.session.commit()
+    status_cache.invalidate(fields['application_id'])
+    return letter
+
+
+@instrumentation.timed_letter
+def _letter_bytes(fields):
+    """Render one letter in this process; queued letters are timed through letter_queue.on_rendered"""
+    return letters.get_template(letter_queue.fonts()).render_bytes(fields)
@@ -0,0 +1,130 @@
+"""Per-cycle archives of decided applications.
+
+Applications from past intake cycles are moved out of the student table
+(see archive_applications in applications.py) into one folder per cycle:
+
+    ARCHIVE_FOLDER/2024/applications.db       the cycle's student rows, as they were
+    ARCHIVE_FOLDER/2024/documents-0001.zip    uploads and letters of one archived batch
+
+A cycle starts in ARCHIVE_CYCLE_START_MONTH. It is named after its first
+year ('2024'), or after both years when it starts after January ('2024-25').
+The applications.db files are SQLite whatever the main database is, so an
+old cycle can be copied, backed up or dropped as a single file.
+
+Each batch of documents goes into a new deflated zip pack. Packs are
+written under a temporary name and renamed when complete, and never
+changed afterwards, so an interrupted run leaves no half-written archive.
+The row of an archived application records which pack holds its
+documents.
+"""
+import os
+import threading
+import zipfile
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, create_engine, select
+from sqlalchemy.dialects import sqlite
+
+ROWS_FILE = 'applications.db'
+PACK_PREFIX = 'documents-'
+
+_engines = {}
+_tables = {}
+_lock = threading.Lock()
+
+
+def cycle_of(when, start_month=1):
+    """Name of the intake cycle an application date falls in"""
+    year = when.year if when.month >= start_month else when.year - 1
+    return str(year) if start_month == 1 else f'{year}-{(year + 1) % 100:02d}'
+
+
+def cycle_folder(folder, cycle):
+    return os.path.join(folder, cycle)
+
+
+def member(area, relative):
+    """Name in a pack of a document stored under area ('uploads' or 'letters', as in documents.AREAS)"""
+    return f"{area}/{relative.replace(os.sep, '/')}"
+
+
+def archive_table(source):
+    """The archive's copy of source (the student table): its columns, plus the pack and archive time"""
+    table = _tables.get(source.name)
+    if table is None:
+        columns = [Column(c.name, c.type, primary_key=c.primary_key) for c in source.columns]
+        table = _tables[source.name] = Table(
+            source.name, MetaData(), *columns,
+            Column('archive_pack', String(100)),
+            Column('archived_at', DateTime),
+            Index(f'ix_{source.name}_application_id', 'application_id', unique=True))
+    return table
+
+
+def engine(folder, cycle, source):
+    """Engine of a cycle's applications.db, created with its table on first use"""
+    path = os.path.abspath(os.path.join(cycle_folder(folder, cycle), ROWS_FILE))
+    with _lock:
+        cycle_engine = _engines.get(path)
+        if cycle_engine is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cycle_engine = _engines[path] = create_engine(f'sqlite:///{path}')
+            archive_table(source).create(cycle_engine, checkfirst=True)
+    return cycle_engine
+
+
+def write_pack(folder, cycle, members):
+    """Pack (member name, path) pairs into a new zip of the cycle; returns the pack's name.
+
+    Paths that no longer exist are skipped; with nothing to pack this returns
+    None. The pack only appears under its final name once it is complete.
+    """
+    members = [(entry, path) for entry, path in members if os.path.isfile(path)]
+    if not members:
+        return None
+    target_folder = cycle_folder(folder, cycle)
+    os.makedirs(target_folder, exist_ok=True)
+    numbers = [int(name[len(PACK_PREFIX):-4]) for name in os.listdir(target_folder)
+               if name.startswith(PACK_PREFIX) and name.endswith('.zip') and name[len(PACK_PREFIX):-4].isdigit()]
+    name = f'{PACK_PREFIX}{max(numbers, default=0) + 1:04d}.zip'
+    partial = os.path.join(target_folder, f'.{name}.partial')
+    with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_DEFLATED) as pack:
+        for entry, path in members:
+            pack.write(path, entry)
+    with open(partial, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(partial, os.path.join(target_folder, name))
+    return name
+
+
+def store_rows(folder, cycle, source, rows, pack):
+    """Copy student rows (mappings of source's columns) into the cycle, replacing any earlier copy"""
+    table = archive_table(source)
+    now = datetime.utcnow()
+    values = [dict(row, archive_pack=pack, archived_at=now) for row in rows]
+    if values:
+        with engine(folder, cycle, source).begin() as conn:
+            conn.execute(sqlite.insert(table).prefix_with('OR REPLACE'), values)
+
+
+def load_row(folder, cycle, source, application_id, names):
+    """The named columns of an archived application, or None"""
+    if not os.path.isfile(os.path.join(cycle_folder(folder, cycle), ROWS_FILE)):
+        return None
+    table = archive_table(source)
+    with engine(folder, cycle, source).connect() as conn:
+        return conn.execute(select(*[table.c[name] for name in names])
+                            .where(table.c.application_id == application_id)).first()
+
+
+def read_document(folder, cycle, pack, member):
+    """(bytes, ZipInfo) of a packed document, or None if it is not there"""
+    path = os.path.join(cycle_folder(folder, cycle), os.path.basename(pack or ''))
+    if not pack or not os.path.isfile(path):
+        return None
+    with zipfile.ZipFile(path) as archive:
+        try:
+            info = archive.getinfo(member)
+        except KeyError:
+            return None
+        return archive.read(info), info
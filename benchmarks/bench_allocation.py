@@ -0,0 +1,97 @@
+"""Seat allocation benchmark: the matching itself and allocate_seats end to end.
+
+    python benchmarks/bench_allocation.py [--applicants 100000] [--rows 100000] [--max-seconds 5]
+
+First times allocation.allocate on --applicants synthetic applicants with
+ranked preferences over all courses and checks the result is stable. Then
+seeds a throwaway SQLite database with --rows applications (as bench_load
+does) and times allocate_seats as a dry run and as a real run that writes
+the decisions. Exits non-zero if any step takes longer than --max-seconds.
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import COURSES, seed  # noqa: E402
+import allocation  # noqa: E402
+
+
+def synthetic_applicants(count, rng):
+    applicants = []
+    for i in range(count):
+        preferences = tuple(rng.sample(COURSES, rng.randint(1, 3)))
+        applicants.append(allocation.Applicant(i, round(rng.uniform(5, 10), 2), rng.randrange(10 ** 6), preferences))
+    return applicants
+
+
+def timed(label, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    print(f'{label:<34} {elapsed:>8.3f}s')
+    return result, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--applicants', type=int, default=100000, help='synthetic applicants for the matching')
+    parser.add_argument('--rows', type=int, default=100000, help='applications seeded for allocate_seats')
+    parser.add_argument('--seats', type=int, default=0,
+                        help='seats per course (default: scaled to the applicants or rows)')
+    parser.add_argument('--max-seconds', type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    applicants = synthetic_applicants(args.applicants, rng)
+    per_course = args.seats or max(args.applicants // 10 // len(COURSES), 1)
+    capacities = {course: per_course for course in COURSES}
+    result, matching = timed(f'allocate {args.applicants} applicants', allocation.allocate, applicants, capacities)
+    print(f'  {len(result.assigned)} allocated, {len(result.unassigned)} unassigned')
+    if not allocation.is_stable(applicants, capacities, result):
+        print('FAIL allocation is not stable')
+        return 1
+    timings = [matching]
+
+    workdir = tempfile.mkdtemp(prefix='bench_allocation_')
+    try:
+        # The app reads these when it is imported
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        os.environ['PDF_FOLDER'] = os.path.join(workdir, 'letters')
+        from app import app, db, Student, Admin, allocate_seats, letter_queue
+        letter_queue.notify = lambda: None  # leave letters queued; rendering is bench_letters' job
+        logging.getLogger('metrics').setLevel(logging.ERROR)
+
+        started = time.perf_counter()
+        seed(app, db, Student, Admin, args.rows)
+        print(f'seeded {args.rows} rows in {time.perf_counter() - started:.1f}s')
+
+        # A fifth of the seeded applications are already approved, so offer seats for a third
+        per_course = args.seats or max(args.rows // 3 // len(COURSES), 1)
+        seats = {course: per_course for course in COURSES}
+        with app.app_context():
+            summary, elapsed = timed(f'allocate_seats dry run ({args.rows} rows)', allocate_seats, seats, dry_run=True)
+            timings.append(elapsed)
+            summary, elapsed = timed(f'allocate_seats write ({args.rows} rows)', allocate_seats, seats,
+                                     reject_unassigned=True)
+            timings.append(elapsed)
+            print(f"  {summary['allocated']} of {summary['applicants']} pending applicants allocated")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if max(timings) > args.max_seconds:
+        print(f'FAIL slowest step took {max(timings):.2f}s, budget {args.max_seconds:.2f}s')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Bulk import benchmark: throughput and peak memory of import_applications.
+
+    python benchmarks/bench_import.py [--rows 200000] [--format csv] [--max-seconds 300] [--max-memory-mb 64]
+
+Writes a --rows partner file (one row in a hundred invalid) to a throwaway
+directory and imports it into an empty SQLite database. Reports rows per
+second and how much the process's anonymous memory (Linux RssAnon, which
+leaves out the database pages SQLite maps from disk) grew at its peak during
+the import. That growth should not depend on --rows. Exits non-zero if the
+import takes longer than --max-seconds or grows memory by more than
+--max-memory-mb.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import COURSES  # noqa: E402
+
+FIELDS = ('first_name', 'last_name', 'email', 'phone', 'address', 'date_of_birth', 'course_applied',
+          'previous_qualification', 'cgpa')
+
+
+def record(i):
+    return {
+        'first_name': f'Partner{i}', 'last_name': f'Portal{i % 997}',
+        'email': f'partner{i}@example.com' if i % 100 else 'not-an-email',
+        'phone': f'8{i:09d}'[-10:], 'address': f'{i} Partner Street, Test City', 'date_of_birth': '2001-04-05',
+        'course_applied': COURSES[i % len(COURSES)], 'previous_qualification': 'Higher Secondary',
+        'cgpa': f'{5 + (i % 50) / 10:.1f}',
+    }
+
+
+def write_source(path, rows, fmt):
+    with open(path, 'w', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for i in range(rows):
+                writer.writerow(record(i))
+        else:
+            for i in range(rows):
+                f.write(json.dumps(record(i)) + '\n')
+
+
+def anonymous_memory():
+    """Resident anonymous memory of this process in MiB"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class PeakSampler(threading.Thread):
+    """Samples anonymous memory every interval seconds until stopped, keeping the peak"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = anonymous_memory()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, anonymous_memory())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    parser.add_argument('--max-seconds', type=float, default=300.0)
+    parser.add_argument('--max-memory-mb', type=float, default=64.0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bench_import_')
+    try:
+        # The app reads these when it is imported
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        os.environ['PDF_FOLDER'] = os.path.join(workdir, 'letters')
+        from app import app, db, import_applications
+        import importer
+        import migrations
+        logging.getLogger('metrics').setLevel(logging.ERROR)
+
+        source = os.path.join(workdir, f'partner.{args.format}')
+        write_source(source, args.rows, args.format)
+        print(f'wrote {args.rows} rows ({os.path.getsize(source) / 2 ** 20:.1f} MiB)')
+
+        with app.app_context():
+            db.create_all()
+            migrations.upgrade(db.engine)
+            rejected_lines = []
+            with open(source, 'rb') as f:
+                baseline = anonymous_memory()
+                sampler = PeakSampler()
+                sampler.start()
+                started = time.perf_counter()
+                imported, rejected = import_applications(
+                    importer.READERS[args.format](importer.text_stream(f)),
+                    lambda error: rejected_lines.append(error.line) if len(rejected_lines) < 10 else None)
+                elapsed = time.perf_counter() - started
+                sampler.stopped.set()
+                sampler.join()
+                growth = sampler.peak - baseline
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f'imported {imported}, rejected {rejected} in {elapsed:.1f}s '
+          f'({args.rows / elapsed:,.0f} rows/s), peak memory grew {growth:.1f} MiB')
+    failed = False
+    if elapsed > args.max_seconds:
+        print(f'FAIL import took {elapsed:.1f}s, budget {args.max_seconds:.1f}s')
+        failed = True
+    if growth > args.max_memory_mb:
+        print(f'FAIL peak memory grew {growth:.1f} MiB, budget {args.max_memory_mb:.1f} MiB')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Microbenchmark: admission letter rendering, compiled template vs. the original Platypus story.
+
+    python benchmarks/bench_letters.py [--letters 500] [--min-speedup 10]
+
+Reports per-letter wall time, bulk throughput and tracemalloc allocations for
+both renderers and exits non-zero if the template is not at least
+--min-speedup times faster.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+import letters
+
+
+def legacy_render_admission_letter(fields, filepath):
+    """The pre-template renderer: new stylesheet and Paragraph story for every letter"""
+    doc = SimpleDocTemplate(filepath, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = [Paragraph("UNIVERSITY ADMISSION LETTER", styles['Title']), Spacer(1, 20),
+             Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", styles['Normal']), Spacer(1, 20)]
+    student_info = f"""
+    <para>
+    <b>Dear {fields['first_name']} {fields['last_name']},</b><br/><br/>
+    Congratulations! We are pleased to inform you that your application for admission has been <b>APPROVED</b>.<br/><br/>
+    <b>Application Details:</b><br/>
+    Application ID: {fields['application_id']}<br/>
+    Course: {fields['course_applied'].replace('_', ' ').title()}<br/>
+    Email: {fields['email']}<br/>
+    Phone: {fields['phone']}<br/>
+    Previous Qualification: {fields['previous_qualification']}<br/>
+    CGPA: {fields['cgpa']}<br/><br/>
+    Please report to the admission office within 30 days of receiving this letter to complete your enrollment process.<br/><br/>
+    Welcome to our university!<br/><br/>
+    Best regards,<br/>
+    Admissions Committee<br/>
+    University Name
+    </para>
+    """
+    story.append(Paragraph(student_info, styles['Normal']))
+    doc.build(story)
+    return filepath
+
+
+def sample_fields(i):
+    return {
+        'application_id': f'APP20250101{i:08X}',
+        'first_name': 'Bench',
+        'last_name': f'Student{i}',
+        'course_applied': 'computer_science',
+        'email': f'bench.{i}@example.com',
+        'phone': '9876543210',
+        'previous_qualification': 'Bachelor of Science in Computer Science',
+        'cgpa': '8.7',
+    }
+
+
+def measure(render, count, folder):
+    jobs = [(sample_fields(i), os.path.join(folder, f'letter_{i}.pdf')) for i in range(count)]
+    render(*jobs[0])  # warm up caches and imports
+
+    start = time.perf_counter()
+    for fields, path in jobs:
+        render(fields, path)
+    elapsed = time.perf_counter() - start
+
+    sample = jobs[:min(count, 50)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for fields, path in sample:
+        render(fields, path)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(max(s.count_diff, 0) for s in stats)
+
+    return {
+        'per_letter_ms': elapsed / count * 1000,
+        'letters_per_sec': count / elapsed,
+        'peak_kib': peak / 1024,
+        'retained_blocks_per_letter': blocks / len(sample),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--letters', type=int, default=500)
+    parser.add_argument('--min-speedup', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        legacy = measure(legacy_render_admission_letter, args.letters, folder)
+        template = measure(letters.render_admission_letter, args.letters, folder)
+
+    print(f"{'renderer':<10} {'ms/letter':>10} {'letters/s':>10} {'peak KiB':>10} {'blocks/letter':>14}")
+    for name, result in (('legacy', legacy), ('template', template)):
+        print(f"{name:<10} {result['per_letter_ms']:>10.3f} {result['letters_per_sec']:>10.0f} "
+              f"{result['peak_kib']:>10.1f} {result['retained_blocks_per_letter']:>14.1f}")
+    speedup = legacy['per_letter_ms'] / template['per_letter_ms']
+    print(f"speedup: {speedup:.2f}x (target {args.min_speedup:.2f}x)")
+    return 0 if speedup >= args.min_speedup else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
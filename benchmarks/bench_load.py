@@ -0,0 +1,297 @@
+"""Load benchmark: the apply, status, dashboard, API, merit list, search and review flows against a seeded database.
+
+    python benchmarks/bench_load.py [--rows 1000] [--concurrency 8] [--requests 200]
+                                    [--scenarios apply,status,...] [--save-baseline]
+
+Seeds a throwaway SQLite database with --rows applications (1000, 100000 and
+1000000 are the usual sizes), then drives each scenario through the Flask test
+client from --concurrency threads. Reports p50/p95/p99 latency, throughput and
+the process peak RSS after each scenario.
+
+Results are compared against benchmarks/baselines/load_<rows>.json: the run
+exits non-zero if any scenario's p95 latency or peak RSS grew, or its
+throughput dropped, by more than --tolerance. --save-baseline writes the
+current results as the new baseline instead. Baselines are machine specific;
+record them on the machine that runs the comparison.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import queue
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+SCENARIOS = ('apply', 'status', 'dashboard', 'api', 'merit', 'search', 'review')
+COURSES = ('computer_science', 'mechanical_engineering', 'electrical_engineering',
+           'civil_engineering', 'business_administration', 'data_science')
+SEED_BATCH = 20000
+ADMIN_PASSWORD = 'bench-password'
+
+
+def seed(app, db, Student, Admin, rows):
+    """Insert rows applications with a realistic status mix, SEED_BATCH rows per statement"""
+    from werkzeug.security import generate_password_hash
+    import migrations
+
+    rng = random.Random(0)
+    start = datetime.utcnow() - timedelta(days=365)
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade(db.engine)
+        db.session.add(Admin(username='bench', password_hash=generate_password_hash(ADMIN_PASSWORD)))
+        table = Student.__table__
+        for offset in range(0, rows, SEED_BATCH):
+            batch = []
+            for i in range(offset, min(offset + SEED_BATCH, rows)):
+                applied = start + timedelta(seconds=i * 31536000 // max(rows, 1))
+                status = rng.choices(('pending', 'approved', 'rejected'), (6, 2, 2))[0]
+                batch.append({
+                    'application_id': f'APPSEED{i:012d}',
+                    'first_name': f'First{i}',
+                    'last_name': f'Last{i % 997}',
+                    'email': f'student{i}@example.com',
+                    'phone': f'9{i:09d}'[-10:],
+                    'address': f'{i} Benchmark Street, Test City',
+                    'date_of_birth': '2000-01-01',
+                    'course_applied': COURSES[i % len(COURSES)],
+                    'previous_qualification': 'Bachelor of Science',
+                    'cgpa': f'{5 + (i % 50) / 10:.1f}',
+                    'cgpa_score': 5 + (i % 50) / 10,
+                    'birth_date': date(2000, 1, 1),
+                    'status': status,
+                    'application_date': applied,
+                    'review_date': None if status == 'pending' else applied + timedelta(days=3),
+                    'updated_at': applied,
+                })
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+        # Core inserts bypass the dashboard counters and the duplicate keys, so build them once
+        from app import application_stats, duplicate_index
+        application_stats.reconcile()
+        duplicate_index.rebuild()
+        pending = [row.id for row in db.session.query(Student.id).filter(Student.status == 'pending')]
+    rng.shuffle(pending)
+    return pending
+
+
+class Driver:
+    """Issues requests through a pool of logged-in test clients, one per concurrent request"""
+
+    def __init__(self, app, rows, pending, concurrency):
+        self.app = app
+        self.rows = rows
+        self.pending = pending
+        self._clients = queue.Queue()
+        for _ in range(concurrency):
+            client = app.test_client()
+            client.post('/admin/login', data={'username': 'bench', 'password': ADMIN_PASSWORD})
+            self._clients.put(client)
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    @contextmanager
+    def client(self):
+        client = self._clients.get()
+        try:
+            yield client
+        finally:
+            self._clients.put(client)
+
+    def next_index(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def apply(self):
+        i = self.next_index()
+        document = b'%PDF-1.4\n' + os.urandom(32 * 1024)
+        with self.client() as client:
+            return client.post('/apply', content_type='multipart/form-data', data={
+                'first_name': 'Load', 'last_name': f'Tester{i}', 'email': f'load{i}@example.com',
+                'phone': '9876543210', 'address': '42 Benchmark Avenue, Test City',
+                'date_of_birth': '2001-02-03', 'course_applied': 'data_science',
+                'previous_qualification': 'Higher Secondary', 'cgpa': '8.2',
+                'degree_certificate': (io.BytesIO(document), 'degree.pdf'),
+                'id_proof': (io.BytesIO(document[:4096]), 'id.pdf'),
+            })
+
+    def status(self):
+        application_id = f'APPSEED{random.randrange(self.rows):012d}'
+        with self.client() as client:
+            return client.post('/check_status', data={'application_id': application_id})
+
+    def dashboard(self):
+        with self.client() as client:
+            return client.get('/admin/dashboard', query_string={'status': random.choice(('', 'pending'))})
+
+    def api(self):
+        with self.client() as client:
+            return client.get('/api/applications', query_string={'limit': 100})
+
+    def merit(self):
+        with self.client() as client:
+            return client.get('/api/merit-list', query_string={'limit': 50, 'status': random.choice(('', 'pending'))})
+
+    def search(self):
+        i = random.randrange(self.rows)
+        query = random.choice((f'First{i}', f'Last{i % 997}', f'student{i}@example.com', f'APPSEED{i:012d}'))
+        with self.client() as client:
+            return client.get('/api/applications/search', query_string={'q': query, 'limit': 20})
+
+    def review(self):
+        with self._lock:
+            student_id = self.pending.pop() if self.pending else None
+        if student_id is None:
+            return None
+        with self.client() as client:
+            return client.post(f'/admin/review/{student_id}', data={
+                'status': random.choice(('approved', 'rejected')), 'comments': 'Load test decision'})
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(driver, name, requests, concurrency):
+    action = getattr(driver, name)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        start = time.perf_counter()
+        response = action()
+        elapsed = time.perf_counter() - start
+        with lock:
+            if response is None:
+                return
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    action()  # warm up the route and its templates
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'throughput_rps': len(latencies) / wall if wall else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Human readable regressions of results against baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('p95_ms', 'peak_rss_mb'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {current[metric]:.1f} > baseline {previous[metric]:.1f}')
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput_rps {current['throughput_rps']:.1f} "
+                               f"< baseline {previous['throughput_rps']:.1f}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: errors {current['errors']} > baseline {previous['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--baseline', help='baseline file (default benchmarks/baselines/load_<rows>.json)')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'load_{args.rows}.json')
+
+    workdir = tempfile.mkdtemp(prefix='bench_load_')
+    try:
+        # The app reads these when it is imported
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        os.environ['PDF_FOLDER'] = os.path.join(workdir, 'letters')
+        from app import app, db, Student, Admin
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LETTER_WORKERS'] = 0  # render letters inside the review request
+        logging.getLogger('metrics').setLevel(logging.ERROR)  # slow query warnings would flood the table
+
+        started = time.perf_counter()
+        pending = seed(app, db, Student, Admin, args.rows)
+        print(f'seeded {args.rows} rows in {time.perf_counter() - started:.1f}s')
+
+        driver = Driver(app, args.rows, pending, args.concurrency)
+        results = {}
+        print(f"{'scenario':<10} {'reqs':>6} {'errs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'req/s':>8} {'RSS MB':>8}")
+        for name in scenarios:
+            result = results[name] = run_scenario(driver, name, args.requests, args.concurrency)
+            print(f"{name:<10} {result['requests']:>6} {result['errors']:>5} {result['p50_ms']:>8.2f} "
+                  f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['throughput_rps']:>8.1f} "
+                  f"{result['peak_rss_mb']:>8.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump({'rows': args.rows, 'concurrency': args.concurrency, 'scenarios': results},
+                      f, indent=2, sort_keys=True)
+        print(f'baseline written to {baseline_path}')
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f'no baseline at {baseline_path}; run with --save-baseline to record one')
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('concurrency') != args.concurrency:
+        print(f"warning: baseline was recorded at concurrency {baseline.get('concurrency')}")
+    regressions = compare(results, baseline['scenarios'], args.tolerance)
+    for line in regressions:
+        print('REGRESSION', line)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
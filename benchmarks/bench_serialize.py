@@ -0,0 +1,137 @@
+"""Serialization benchmark: API payload encoding per 100k rows, old and new.
+
+    python benchmarks/bench_serialize.py [--rows 100000] [--fields all] [--json json] [--min-speedup 1.5]
+
+Seeds a throwaway SQLite database with --rows applications (as bench_load
+does) and encodes them all as a JSON array three ways:
+
+    orm          Student objects, a dict built field by field, json.dumps
+    to_dict      Core rows, export.to_dict per row (the list comprehension
+                 the routes used), json.dumps
+    serializer   Core rows, the compiled export.Serializer encoder, export.dumps
+
+Each way is timed from the query to the encoded bytes. The fastest of
+--repeat runs is reported, with the encoding time on its own. A separate run
+under tracemalloc gives the peak Python memory. Both are scaled to 100k rows.
+--fields is a comma separated list, 'default' (the /api/applications default)
+or 'all'. --json json measures the serializer without orjson. Exits non-zero
+if the serializer is not at least --min-speedup times faster than to_dict end
+to end.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import seed  # noqa: E402
+
+PER = 100000
+
+
+def approaches(db, Student, fields, serializer):
+    import export
+    from app import APPLICATION_FIELDS
+    from sqlalchemy import select
+
+    names = export.required_columns(fields, APPLICATION_FIELDS)
+    statement = select(*[getattr(Student, name) for name in names]).order_by(Student.id)
+
+    def orm():
+        students = Student.query.order_by(Student.id).all()
+        started = time.perf_counter()
+        body = json.dumps([export.to_dict(student, fields, APPLICATION_FIELDS) for student in students],
+                          separators=(',', ':')).encode('utf-8')
+        db.session.expunge_all()
+        return body, time.perf_counter() - started
+
+    def to_dict():
+        rows = db.session.execute(statement).all()
+        started = time.perf_counter()
+        body = json.dumps([export.to_dict(row, fields, APPLICATION_FIELDS) for row in rows],
+                          separators=(',', ':')).encode('utf-8')
+        return body, time.perf_counter() - started
+
+    def compiled():
+        rows = db.session.execute(statement).all()
+        started = time.perf_counter()
+        body = export.dumps(serializer.to_dicts(rows, fields))
+        return body, time.perf_counter() - started
+
+    return {'orm': orm, 'to_dict': to_dict, 'serializer': compiled}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--fields', default='all')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', choices=('auto', 'json'), default='auto',
+                        help='json: use the standard library even if orjson is installed')
+    parser.add_argument('--min-speedup', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bench_serialize_')
+    try:
+        # The app reads these when it is imported
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        os.environ['PDF_FOLDER'] = os.path.join(workdir, 'letters')
+        from app import app, db, Student, Admin, APPLICATION_FIELDS, DEFAULT_APPLICATION_FIELDS
+        import export
+        logging.getLogger('metrics').setLevel(logging.ERROR)
+        if args.json == 'json':
+            export.orjson, export.JSON_BACKEND = None, 'json'
+
+        fields = {'all': list(APPLICATION_FIELDS), 'default': list(DEFAULT_APPLICATION_FIELDS)}.get(
+            args.fields) or export.parse_fields(args.fields, APPLICATION_FIELDS, ())
+        seed(app, db, Student, Admin, args.rows)
+        scale = PER / args.rows
+        print(f'{args.rows} rows, {len(fields)} fields, JSON backend {export.JSON_BACKEND}')
+        print(f"{'':<12} {'total':>10} {'encode':>10} {'rows/s':>12} {'peak MiB':>10}   (per {PER:,} rows)")
+
+        results = {}
+        with app.app_context():
+            serializer = export.Serializer(APPLICATION_FIELDS, Student.__table__)
+            bodies = {}
+            for name, run in approaches(db, Student, fields, serializer).items():
+                best = None
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    body, encoding = run()
+                    total = time.perf_counter() - started
+                    if best is None or total < best[0]:
+                        best = (total, encoding)
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+                bodies[name] = body
+                results[name] = best
+                total, encoding = best
+                print(f'{name:<12} {total * scale:>9.3f}s {encoding * scale:>9.3f}s '
+                      f'{args.rows / total:>12,.0f} {peak * scale:>10.1f}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if len({json.dumps(json.loads(body), sort_keys=True) for body in bodies.values()}) != 1:
+        print('FAIL the approaches produced different payloads')
+        return 1
+    speedup = results['to_dict'][0] / results['serializer'][0]
+    print(f'serializer is {speedup:.1f}x to_dict end to end, '
+          f"{results['to_dict'][1] / results['serializer'][1]:.1f}x on encoding alone")
+    if speedup < args.min_speedup:
+        print(f'FAIL speedup {speedup:.1f}x below {args.min_speedup:.1f}x')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Startup benchmark: the time `import app` takes, from `python -X importtime`.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-ms 250] [--top 12]
+
+Imports the app in --runs fresh interpreters, each run from an empty
+working directory with the database, upload and letter paths pointed into
+it. Flask and Flask-SQLAlchemy are imported first and reported on their
+own: every worker pays for them whatever the app does, so the budget is on
+what the app's modules add on top (the median over the runs). The app's
+slowest direct imports are listed from the median run.
+
+Exits non-zero if that median exceeds --max-ms, if a module that should
+only load on first use (LAZY) was imported, or if importing the app created
+any file or folder. tests/test_startup.py runs it as part of the test suite.
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FRAMEWORK = ('flask', 'flask_sqlalchemy')
+# Loaded by the first form, letter, upload check or PostgreSQL connection, never by the import
+LAZY = ('reportlab', 'wtforms', 'flask_wtf', 'email_validator', 'PIL', 'sqlalchemy.dialects.postgresql')
+
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(workdir, module='app'):
+    """Run one import under -X importtime; returns [(depth, name, self_us, cumulative_us)] in import order"""
+    env = dict(os.environ, PYTHONPATH=ROOT, APP_CONFIG='config.Config',
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'startup.db'),
+               UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               PDF_FOLDER=os.path.join(workdir, 'letters'),
+               STATUS_CACHE_PATH=os.path.join(workdir, 'instance', 'status_cache.db'))
+    code = f"import {', '.join(FRAMEWORK)}; import {module}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr}')
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((len(indent) // 2, name, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def summarize(rows, module='app'):
+    """(framework ms, app ms, the app's direct imports as [(ms, name)] slowest first, lazy modules imported)"""
+    top = {name: cumulative for depth, name, _, cumulative in rows if depth == 0}
+    framework = sum(top.get(name, 0) for name in FRAMEWORK) / 1000
+    # -X importtime prints a module after everything it imports, so app's children come just before it
+    end = max(i for i, (depth, name, _, _) in enumerate(rows) if depth == 0 and name == module)
+    start = end
+    while start > 0 and rows[start - 1][0] > 0:
+        start -= 1
+    children = sorted(((cumulative / 1000, name) for depth, name, _, cumulative in rows[start:end] if depth == 1),
+                      reverse=True)
+    imported = {name for _, name, _, _ in rows[start:end + 1]}
+    lazy = sorted({prefix for prefix in LAZY for name in imported if name == prefix or name.startswith(prefix + '.')})
+    return framework, top[module] / 1000, children, lazy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=250, help='budget for the app on top of the framework')
+    parser.add_argument('--top', type=int, default=12, help='direct imports of the app to list')
+    args = parser.parse_args(argv)
+
+    failures = []
+    runs = []
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix='bench_startup_')
+        try:
+            runs.append(summarize(import_times(workdir)))
+            created = sorted(os.listdir(workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if created and not any('created' in failure for failure in failures):
+            failures.append(f"importing the app created {', '.join(created)}")
+
+    runs.sort(key=lambda run: run[1])
+    framework, own, children, lazy = runs[len(runs) // 2]
+    print(f"{'framework':<28} {statistics.median(run[0] for run in runs):>8.1f} ms   ({', '.join(FRAMEWORK)})")
+    print(f"{'app':<28} {own:>8.1f} ms   (median of {args.runs}, budget {args.max_ms:.0f} ms)")
+    for ms, name in children[:args.top]:
+        print(f'  {name:<26} {ms:>8.1f} ms')
+
+    lazy = sorted({name for run in runs for name in run[3]})
+    if lazy:
+        failures.append(f"imported modules that should load on first use: {', '.join(lazy)}")
+    if own > args.max_ms:
+        failures.append(f'import took {own:.1f} ms, over the {args.max_ms:.0f} ms budget')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
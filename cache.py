@@ -0,0 +1,191 @@
+"""Read-through TTL + LRU caches with pluggable storage backends.
+
+MemoryBackend keeps entries in this process. SQLiteBackend keeps them in a
+local SQLite file so every worker process on the host shares one cache and
+sees the same invalidations.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Bounded in-process store; least recently used entries are evicted first"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Store shared by all processes on the host through a local SQLite file.
+
+    The file (and its folder) is opened on first use, not when the backend
+    is built, so importing the app touches no files. Lookups only read;
+    expired entries are dropped, and the oldest evicted, when the rows
+    written since the last count would take the table past max_size. Each
+    process counts its own writes, so with several the table can briefly
+    hold more than max_size rows.
+    """
+
+    def __init__(self, path, max_size=10000):
+        self.path = path
+        self.max_size = max_size
+        self.evictions = 0
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'expires REAL NOT NULL, accessed REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)')
+            self._local.count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        # A read only: recording recency here would make every hit a write to
+        # the shared file, so entries are evicted oldest written first
+        row = self._connect().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return _MISSING
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                     (key, pickle.dumps(value), now + ttl, now))
+        # Rows counted by this process since the table was last counted; an
+        # overwrite counts too, so the table is counted again before evicting
+        self._local.count += 1
+        if self._local.count > self.max_size:
+            self._sweep(conn, now)
+
+    def _sweep(self, conn, now):
+        conn.execute('DELETE FROM cache WHERE expires < ?', (now,))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        excess = count - self.max_size
+        if excess > 0:
+            conn.execute('DELETE FROM cache WHERE key IN '
+                         '(SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
+            self.evictions += excess
+            count -= excess
+        self._local.count = count
+
+    def delete(self, keys):
+        keys = list(keys)
+        if keys:
+            self._connect().executemany('DELETE FROM cache WHERE key = ?', [(k,) for k in keys])
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+class ReadThroughCache:
+    """Memoizes loader(key) in a backend for ttl seconds and counts hits and misses.
+
+    A loader returning None (nothing found) is not cached, so a key that
+    does not exist yet is looked up again and unknown keys take no room.
+    """
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, backend, ttl):
+        """Switch to another backend (starting empty) and ttl"""
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, key, loader):
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader(key)
+        if value is not None:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, *keys):
+        self.backend.delete(keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'size': len(self.backend),
+            'max_size': self.backend.max_size,
+            'ttl': self.ttl,
+        }
+
+
+def create_backend(backend='memory', max_size=10000, path=None):
+    """Build a cache backend from configuration values"""
+    if backend == 'memory':
+        return MemoryBackend(max_size)
+    if backend == 'sqlite':
+        return SQLiteBackend(path, max_size)
+    raise ValueError(f'Unknown cache backend: {backend}')
+
+
+def create_cache(backend='memory', max_size=10000, ttl=60, path=None):
+    """Build a ReadThroughCache from configuration values"""
+    return ReadThroughCache(create_backend(backend, max_size, path), ttl)
@@ -0,0 +1,143 @@
+"""Flask CLI commands, registered on the app by create_app()."""
+import contextlib
+import sys
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+import importer
+import migrations
+from applications import allocate_seats, archive_applications, import_applications, parse_seats
+from models import Admin, application_stats, db, document_queue, duplicate_index, letter_queue, search_index
+
+def create_admin_user():
+    """Create default admin user if not exists"""
+    admin = Admin.query.filter_by(username='admin').first()
+    if not admin:
+        admin = Admin(
+            username='admin',
+            password_hash=generate_password_hash('admin123')
+        )
+        db.session.add(admin)
+        db.session.commit()
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Create missing tables and apply pending schema migrations"""
+    db.create_all()
+    applied = migrations.upgrade(db.engine)
+    print(f"Applied migrations: {applied}" if applied else "Database schema is up to date")
+
+@click.command('letters-worker')
+@with_appcontext
+def letters_worker_command():
+    """Run the admission letter dispatcher in the foreground"""
+    current_app.config['LETTER_WORKERS'] = max(current_app.config['LETTER_WORKERS'], 1)
+    letter_queue.run_forever()
+
+@click.command('documents-worker')
+@click.option('--requeue-all', is_flag=True, help='Check every stored upload again first.')
+@with_appcontext
+def documents_worker_command(requeue_all):
+    """Run the upload check and preview dispatcher in the foreground"""
+    if requeue_all:
+        print(f"{document_queue.requeue_all()} uploads queued")
+    current_app.config['DOCUMENT_WORKERS'] = max(current_app.config['DOCUMENT_WORKERS'], 1)
+    document_queue.run_forever()
+
+@click.command('reconcile-stats')
+@click.option('--every', type=int, default=None, metavar='SECONDS',
+              help='Keep running, reconciling at this interval (default STATS_RECONCILE_INTERVAL).')
+@click.option('--once', is_flag=True, help='Reconcile once and exit.')
+@with_appcontext
+def reconcile_stats_command(every, once):
+    """Recount the dashboard counters from the student table, correcting drift"""
+    interval = every or current_app.config['STATS_RECONCILE_INTERVAL']
+    while True:
+        wrong = application_stats.reconcile()
+        print(f'{wrong} counters corrected' if wrong else 'Counters are up to date')
+        if once:
+            return
+        time.sleep(interval)
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the application search index from the student table"""
+    search_index.rebuild()
+    print(f'Search index rebuilt ({search_index.backend()})')
+
+@click.command('find-duplicates')
+@click.option('--rebuild', is_flag=True, help='Rebuild the duplicate keys from the student table first.')
+@with_appcontext
+def find_duplicates_command(rebuild):
+    """Group possible duplicate applications across the whole table"""
+    if rebuild:
+        duplicate_index.rebuild()
+    groups, changed = duplicate_index.cluster()
+    print(f'{groups} duplicate groups, {changed} applications regrouped')
+
+@click.command('import-applications')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(importer.FORMATS),
+              help='Input format; detected from the file extension by default.')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+              help='Write the rejected rows to this CSV report instead of stderr.')
+@with_appcontext
+def import_applications_command(path, fmt, errors_path):
+    """Import applications from a CSV or JSON Lines file"""
+    fmt = fmt or importer.detect_format(path)
+    if fmt is None:
+        raise click.BadParameter('cannot tell the format from the file name', param_hint='--format')
+    report_file = open(errors_path, 'w', newline='') if errors_path else contextlib.nullcontext(sys.stderr)
+    with open(path, 'rb') as source, report_file as report_stream:
+        imported, rejected = import_applications(importer.READERS[fmt](importer.text_stream(source)),
+                                                 importer.write_report(report_stream))
+    print(f'{imported} applications imported, {rejected} rows rejected'
+          + (f' (see {errors_path})' if errors_path and rejected else ''))
+
+@click.command('allocate-seats')
+@click.option('--seats', 'seat_args', multiple=True, metavar='COURSE=N',
+              help='Seats for a course; defaults to COURSE_SEATS. Repeat for each course.')
+@click.option('--dry-run', is_flag=True, help='Compute and print the allocation without saving it.')
+@click.option('--reject-unassigned', is_flag=True, help='Reject pending applicants who got no seat.')
+@with_appcontext
+def allocate_seats_command(seat_args, dry_run, reject_unassigned):
+    """Allocate course seats to pending applicants by merit"""
+    try:
+        seats = dict(current_app.config['COURSE_SEATS'])
+        for arg in seat_args:
+            course, _, count = arg.partition('=')
+            seats[course] = int(count)
+        seats = parse_seats(seats)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint='--seats')
+    summary = allocate_seats(seats, dry_run=dry_run, reject_unassigned=reject_unassigned)
+    for course, stats in summary['courses'].items():
+        print(f"{course:<26} seats {stats['seats']:>6}  allocated {stats['allocated']:>6}  "
+              f"remaining {stats['remaining']:>6}  cutoff {stats['cutoff']}")
+    print(f"{summary['allocated']} of {summary['applicants']} applicants allocated"
+          + (' (dry run, nothing saved)' if dry_run else ''))
+
+@click.command('archive-applications')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive applications made before this date; defaults to ARCHIVE_AFTER_DAYS ago.')
+@click.option('--dry-run', is_flag=True, help='Count the applications per cycle without moving them.')
+@with_appcontext
+def archive_applications_command(before, dry_run):
+    """Move decided applications of past intake cycles into the per-cycle archives"""
+    before = before or datetime.utcnow() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    counts = archive_applications(before, dry_run=dry_run)
+    for cycle, count in sorted(counts.items()):
+        print(f'{cycle:<10} {count:>8} applications')
+    print(f"{sum(counts.values())} applications made before {before:%Y-%m-%d} "
+          + ('to archive (dry run, nothing moved)' if dry_run else 'archived'))
+
+COMMANDS = (migrate_command, letters_worker_command, documents_worker_command, allocate_seats_command,
+            reconcile_stats_command, rebuild_search_index_command, find_duplicates_command,
+            import_applications_command, archive_applications_command)
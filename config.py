@@ -1,16 +1,131 @@
 import os
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///admission_system.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = 'static/uploads'
-    PDF_FOLDER = 'static/admission_letters'
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(BASE_DIR, 'static/uploads')
+    PDF_FOLDER = os.environ.get('PDF_FOLDER') or 'static/admission_letters'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
+    # Connection pool (ignored for in-memory SQLite, which uses a single shared connection)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = True
+
+    # SQLite tuning, applied to every new connection
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+    DASHBOARD_PAGE_SIZE = 50
+    BULK_REVIEW_LIMIT = 1000
+    EXPORT_BATCH_SIZE = 1000
+    API_PAGE_SIZE = 100
+    API_PAGE_SIZE_MAX = 1000
+    MERIT_LIST_MAX = 1000  # largest top-N per course
+
+    # Seat allocation
+    COURSE_SEATS = {
+        'computer_science': 60,
+        'mechanical_engineering': 60,
+        'electrical_engineering': 60,
+        'civil_engineering': 60,
+        'business_administration': 60,
+        'data_science': 60,
+    }
+    ALLOCATION_BATCH_SIZE = 5000  # applicants per UPDATE
+
+    # Application search, see search.py
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')  # auto, fts5 or trigram
+    SEARCH_PAGE_SIZE = 20
+    SEARCH_PAGE_SIZE_MAX = 100
+    SEARCH_MIN_SIMILARITY = 0.6  # share of the query's trigrams a trigram match needs
+    SEARCH_RANK_LIMIT = 10000  # FTS5 queries matching more applications are listed newest first
+
+    # Duplicate detection, see dedup.py
+    DUPLICATE_BLOCK_KEYS = ('email',)  # keys that refuse a new application while a match is pending
+    DUPLICATE_MAX_BUCKET = 20  # keys shared by more applications are ignored
+
+    # Bulk import, see importer.py
+    IMPORT_BATCH_SIZE = 1000  # applications per INSERT and commit
+    IMPORT_ERROR_LIMIT = 1000  # rejected rows listed in an /api/applications/import response
+
+    # Document downloads, see documents.py
+    DOCUMENT_OFFLOAD = os.environ.get('DOCUMENT_OFFLOAD', '')  # '', 'x-accel' (nginx) or 'x-sendfile'
+    DOCUMENT_ACCEL_PREFIX = os.environ.get('DOCUMENT_ACCEL_PREFIX', '/protected')  # internal nginx location
+    DOCUMENT_MAX_AGE = 86400  # seconds a browser may reuse an uploaded document without asking
+
+    # Admission letters held in memory and rendered again on download when stale, see letter_store.py
+    LETTER_CACHE_SIZE = int(os.environ.get('LETTER_CACHE_SIZE', 256))  # letters per process, 0 disables
+    LETTER_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    LETTER_DOWNLOAD_WAIT = 10  # seconds a download waits for a render of the same letter before answering 202
+    # TTF files embedded in every letter, for scripts ReportLab's bundled Vera lacks; unset, letters
+    # use the built-in Helvetica (see letters.py)
+    LETTER_FONT = os.environ.get('LETTER_FONT') or None
+    LETTER_BOLD_FONT = os.environ.get('LETTER_BOLD_FONT') or None
+
+    # Upload checks and previews, see document_queue.py and previews.py
+    DOCUMENT_THUMBNAIL_PX = 320
+    DOCUMENT_IMAGE_MAX_BYTES = 1024 * 1024  # larger images get a smaller display copy
+    DOCUMENT_IMAGE_MAX_PX = 2000
+
+    # Archival of decided applications from past intake cycles, see archive.py
+    ARCHIVE_FOLDER = os.environ.get('ARCHIVE_FOLDER') or os.path.join(BASE_DIR, 'instance', 'archive')
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))  # applications older than this are archived
+    ARCHIVE_CYCLE_START_MONTH = 1  # month an intake cycle starts in
+    ARCHIVE_BATCH_SIZE = 500  # applications per archive pack and commit
+
+    # Materialized dashboard counters, see stats.py
+    STATS_DAYS = 30  # days returned by /api/stats by default
+    STATS_DAYS_MAX = 366
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))  # seconds
+
+    # Rate limiting and admission control for the public endpoints, see ratelimit.py
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory or sqlite
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH') or os.path.join(BASE_DIR, 'instance', 'rate_limits.db')
+    RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS', 0))  # trusted proxies setting X-Forwarded-For
+    RATE_LIMIT_MAX_KEYS = 100000  # buckets kept by a store
+    RATE_LIMIT_BUSY_RETRY_AFTER = 2  # seconds, in the Retry-After of a shed request
+    # endpoint: (burst, seconds); a bucket holds burst requests and refills at burst per seconds
+    RATE_LIMITS = {  # per client IP
+        'public.apply': (5, 600),
+        'public.check_status': (30, 60),
+        'admin.admin_login': (10, 300),
+    }
+    RATE_LIMITS_TOTAL = {  # shared by all clients; none for admin_login, where anyone could lock the admins out
+        'public.apply': (300, 60),
+        'public.check_status': (1200, 60),
+    }
+    INFLIGHT_LIMITS = {  # requests running at once per process
+        'public.apply': 8,
+        'public.check_status': 32,
+        'admin.admin_login': 4,
+    }
+
+    # sqlite: shared by the worker processes on the host, so a review is seen by all of them at once;
+    # memory: per process, only for a single worker process
+    STATUS_CACHE_BACKEND = os.environ.get('STATUS_CACHE_BACKEND', 'sqlite')
+    STATUS_CACHE_PATH = os.environ.get('STATUS_CACHE_PATH') or os.path.join(BASE_DIR, 'instance', 'status_cache.db')
+    STATUS_CACHE_SIZE = 10000
+    STATUS_CACHE_TTL = 60  # seconds
+
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))  # repeats of one statement per request
+
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     UPLOAD_FOLDER = 'test_uploads'
-    PDF_FOLDER = 'test_pdfs'
\ No newline at end of file
+    PDF_FOLDER = 'test_pdfs'
+    LETTER_WORKERS = 0  # render letters inline
+    DOCUMENT_WORKERS = 0  # check uploads inline
+    RATE_LIMIT_ENABLED = False  # the tests post every form from one address
+    STATUS_CACHE_BACKEND = 'memory'
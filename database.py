@@ -0,0 +1,45 @@
+"""Engine configuration: connection pool sizing and SQLite pragmas.
+
+SQLite allows one writer at a time. WAL journal mode lets readers proceed
+while a write is in progress, and busy_timeout makes a second writer wait for
+the lock instead of failing straight away with "database is locked".
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database, keeping any set explicitly"""
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING'], 'pool_recycle': config['DB_POOL_RECYCLE']}
+    if not is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'],
+                       pool_timeout=config['DB_POOL_TIMEOUT'])
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def configure_sqlite(engine, config):
+    """Apply the SQLITE_* pragmas to every connection the engine opens"""
+    pragmas = [f"busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+               f"synchronous = {config['SQLITE_SYNCHRONOUS']}"]
+    if not is_memory_sqlite(str(engine.url)):
+        pragmas.insert(0, f"journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+        pragmas.append(f"mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+
+    return set_pragmas
@@ -0,0 +1,275 @@
+"""Duplicate application detection with blocking keys.
+
+Every application is indexed under a few normalized keys:
+
+    email       janeroe@gmail.com        lowercased, +tags and Gmail dots dropped
+    phone       9876543210               digits only, the last ten
+    name_dob    jane roe|2000-01-31      name words casefolded, accents stripped, sorted
+
+Applications that share a key are possible duplicates. The keys are stored
+in the duplicate_key table. Its primary key is (kind, value, student_id), so
+checking a new application costs a few index lookups however large the
+table is.
+
+A new application is linked to the applications it matches as it is
+inserted, by giving them all the same duplicate_group: the lowest student id
+among them. cluster() recomputes every group in one ordered pass over the key
+table with a union-find, which also merges groups joined through a chain of
+different keys. A key shared by more than DUPLICATE_MAX_BUCKET applications,
+such as a school switchboard number, says nothing about who applied, so it is
+ignored.
+"""
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import bindparam, event, func, inspect, select
+from sqlalchemy.orm.attributes import set_committed_value
+
+KINDS = ('email', 'phone', 'name_dob')
+# Student attributes the keys are built from
+KEY_FIELDS = ('email', 'phone', 'first_name', 'last_name', 'date_of_birth')
+PHONE_DIGITS = 10
+MAX_BUCKET = 20
+BATCH_SIZE = 5000
+IN_BATCH = 500  # values per IN (...) lookup
+
+_NAME_WORD = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+
+def normalize_email(value):
+    email = (value or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    local = local.split('+', 1)[0]
+    if domain in ('gmail.com', 'googlemail.com'):
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f'{local}@{domain}' if at and local and domain else None
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-PHONE_DIGITS:] if len(digits) >= PHONE_DIGITS else None
+
+
+def normalize_name(first_name, last_name):
+    """Name words without accents or case, sorted so swapped first and last names still match"""
+    text = unicodedata.normalize('NFKD', f'{first_name or ""} {last_name or ""}')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(sorted(_NAME_WORD.findall(text)))
+
+
+def keys(row):
+    """(kind, value) blocking keys of an application, from any object with the Student columns"""
+    result = []
+    email = normalize_email(row.email)
+    if email:
+        result.append(('email', email))
+    phone = normalize_phone(row.phone)
+    if phone:
+        result.append(('phone', phone))
+    name = normalize_name(row.first_name, row.last_name)
+    if name and row.birth_date:
+        born = row.birth_date.isoformat() if hasattr(row.birth_date, 'isoformat') else str(row.birth_date)
+        result.append(('name_dob', f'{name}|{born}'))
+    return result
+
+
+def chunks(values, size=IN_BATCH):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class UnionFind:
+    """Disjoint sets of student ids, each named by its lowest id"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, i):
+        root = i
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while i != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def merge(self, ids):
+        roots = {self.find(i) for i in ids}
+        lowest = min(roots)
+        for root in roots:
+            self.parent[root] = lowest
+
+
+def rebuild_keys(conn, student, key):
+    """Refill the key table from the student table, one id range at a time"""
+    conn.execute(key.delete())
+    last_id = 0
+    while True:
+        rows = conn.execute(select(student.c.id, student.c.birth_date, *[student.c[name] for name in KEY_FIELDS])
+                            .where(student.c.id > last_id).order_by(student.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        values = [{'kind': kind, 'value': value, 'student_id': row.id} for row in rows for kind, value in keys(row)]
+        if values:
+            conn.execute(key.insert(), values)
+        last_id = rows[-1].id
+
+
+def cluster(conn, student, key, max_bucket=MAX_BUCKET):
+    """Recompute every duplicate_group from the key table; returns (groups, applications regrouped).
+
+    The keys are read once in index order, so each bucket of applications
+    sharing a key arrives together and is merged with a union-find. Nothing
+    is compared pairwise, and memory grows with the number of duplicates,
+    not with the table.
+    """
+    sets = UnionFind()
+
+    def merge(bucket):
+        if 1 < len(bucket) <= max_bucket:
+            sets.merge(bucket)
+
+    bucket_key, bucket = None, []
+    rows = conn.execute(select(key.c.kind, key.c.value, key.c.student_id)
+                        .order_by(key.c.kind, key.c.value, key.c.student_id)
+                        .execution_options(yield_per=BATCH_SIZE))
+    for kind, value, student_id in rows:
+        if (kind, value) != bucket_key:
+            merge(bucket)
+            bucket_key, bucket = (kind, value), []
+        if len(bucket) <= max_bucket:
+            bucket.append(student_id)
+    merge(bucket)
+
+    groups = {i: sets.find(i) for i in sets.parent}
+    current = dict(conn.execute(select(student.c.id, student.c.duplicate_group)
+                                .where(student.c.duplicate_group.isnot(None))).all())
+    changes = [{'row_id': i, 'group': group} for i, group in groups.items() if current.get(i) != group]
+    changes += [{'row_id': i, 'group': None} for i in current if i not in groups]
+    update = (student.update().where(student.c.id == bindparam('row_id'))
+              .values(duplicate_group=bindparam('group')))
+    for i in range(0, len(changes), BATCH_SIZE):
+        conn.execute(update, changes[i:i + BATCH_SIZE])
+    return len(set(groups.values())), len(changes)
+
+
+class DuplicateIndex:
+    """Keeps the blocking keys in step with the student table and links duplicates as they are inserted"""
+
+    def __init__(self, db=None, model=None, key_model=None):
+        self.db = db
+        self.model = model
+        self.key = key_model.__table__
+        event.listen(db.session, 'after_flush', self._after_flush)
+
+    def _after_flush(self, session, flush_context):
+        stale, fresh = [], []
+        for obj in session.new:
+            if isinstance(obj, self.model):
+                fresh.append(obj)
+        for obj in session.dirty:
+            if isinstance(obj, self.model):
+                state = inspect(obj)
+                if any(state.attrs[name].history.has_changes() for name in KEY_FIELDS):
+                    stale.append(obj.id)
+                    fresh.append(obj)
+        for obj in session.deleted:
+            if isinstance(obj, self.model):
+                stale.append(obj.id)
+        if not stale and not fresh:
+            return
+        conn = session.connection()
+        if stale:
+            conn.execute(self.key.delete().where(self.key.c.student_id.in_(stale)))
+        self._insert(conn, fresh)
+        # Regrouping edited applications could split or merge whole groups; that is cluster()'s job
+        new = [obj for obj in session.new if isinstance(obj, self.model)]
+        if new:
+            groups = self._link(conn, new)
+            for obj in new:
+                if obj.id in groups:
+                    set_committed_value(obj, 'duplicate_group', groups[obj.id])
+
+    def _insert(self, conn, rows):
+        values = [{'kind': kind, 'value': value, 'student_id': row.id} for row in rows for kind, value in keys(row)]
+        if values:
+            conn.execute(self.key.insert(), values)
+
+    def add(self, rows):
+        """Index and link applications inserted without the ORM session (rows with an id and the Student columns)"""
+        conn = self.db.session.connection()
+        self._insert(conn, rows)
+        self._link(conn, rows)
+
+    def _link(self, conn, rows):
+        """Put new applications in the group of the applications they share a key with; returns {id: group}.
+
+        One lookup per kind of key covers the whole batch, and the matches are
+        merged locally the way cluster() merges the whole table.
+        """
+        key, student = self.key, self.model.__table__
+        max_bucket = current_app.config['DUPLICATE_MAX_BUCKET']
+        wanted = {}
+        for row in rows:
+            for kind, value in keys(row):
+                wanted.setdefault(kind, set()).add(value)
+        sets = UnionFind()
+        for kind, values in wanted.items():
+            for chunk in chunks(sorted(values)):
+                shared = (select(key.c.value).where(key.c.kind == kind, key.c.value.in_(chunk))
+                          .group_by(key.c.value).having(func.count().between(2, max_bucket)))
+                buckets = {}
+                for value, student_id in conn.execute(select(key.c.value, key.c.student_id)
+                                                      .where(key.c.kind == kind, key.c.value.in_(shared))):
+                    buckets.setdefault(value, []).append(student_id)
+                for ids in buckets.values():
+                    sets.merge(ids)
+        members = list(sets.parent)
+        if not members:
+            return {}
+        # Matches already in a group bring it along
+        current = {}
+        for chunk in chunks(members):
+            current.update(conn.execute(select(student.c.id, student.c.duplicate_group)
+                                        .where(student.c.id.in_(chunk), student.c.duplicate_group.isnot(None))).all())
+        for i, group in current.items():
+            sets.merge([i, group])
+
+        # Applications already grouped keep their group; cluster() merges groups
+        groups = {i: sets.find(i) for i in members}
+        changes = [{'row_id': i, 'group': group} for i, group in groups.items() if i not in current]
+        if changes:
+            conn.execute(student.update().where(student.c.id == bindparam('row_id'))
+                         .values(duplicate_group=bindparam('group')), changes)
+        new = {row.id for row in rows}
+        return {i: group for i, group in groups.items() if i in new}
+
+    def pending_matches(self, rows, kinds):
+        """The rows sharing one of the given kinds of key with a pending application for the same course"""
+        Student, key = self.model, self.key
+        wanted = {}
+        for row in rows:
+            for kind, value in keys(row):
+                if kind in kinds:
+                    wanted.setdefault(kind, set()).add(value)
+        pending = set()
+        for kind, values in wanted.items():
+            for chunk in chunks(sorted(values)):
+                pending.update((kind, value, course) for value, course in self.db.session.execute(
+                    select(key.c.value, Student.course_applied).join(Student, Student.id == key.c.student_id)
+                    .where(key.c.kind == kind, key.c.value.in_(chunk), Student.status == 'pending')))
+        return [row for row in rows
+                if any((kind, value, row.course_applied) in pending for kind, value in keys(row) if kind in kinds)]
+
+    def rebuild(self):
+        """Rebuild the keys from the student table, e.g. after rows were loaded with raw SQL"""
+        rebuild_keys(self.db.session.connection(), self.model.__table__, self.key)
+        self.db.session.commit()
+
+    def cluster(self):
+        """Regroup every duplicate from the key table and commit; returns (groups, applications regrouped)"""
+        result = cluster(self.db.session.connection(), self.model.__table__, self.key,
+                         current_app.config['DUPLICATE_MAX_BUCKET'])
+        self.db.session.commit()
+        return result
@@ -0,0 +1,86 @@
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+import previews
+from job_queue import TableQueue
+
+logger = logging.getLogger(__name__)
+
+# Check states persisted on StoredFile.check_status, besides previews.READY and previews.MISMATCH
+QUEUED = 'queued'
+PROCESSING = 'processing'
+FAILED = 'failed'
+PENDING_STATES = (QUEUED, PROCESSING)
+
+RESULT_COLUMNS = ('check_status', 'detected_type', 'page_count', 'thumbnail_path', 'display_path')
+
+
+class DocumentQueue(TableQueue):
+    """Checks uploads and builds their previews on a process pool, off the request path.
+
+    The stored_file table is the job queue (see job_queue.py): a new upload
+    is stored 'queued' and the dispatcher hands claimed rows to
+    DOCUMENT_WORKERS processes, DOCUMENT_BATCH_SIZE at a time. Uploads are
+    content-addressed, so a file sent by many applicants is processed once.
+    Setting DOCUMENT_WORKERS to 0 processes inline when notify() is called.
+    """
+
+    label = 'document'
+    extension_name = 'document_queue'
+    defaults = {'DOCUMENT_WORKERS': 2, 'DOCUMENT_POLL_INTERVAL': 2.0,
+                'DOCUMENT_PROCESS_TIMEOUT': 120, 'DOCUMENT_BATCH_SIZE': 10}
+    workers_key, poll_key = 'DOCUMENT_WORKERS', 'DOCUMENT_POLL_INTERVAL'
+    batch_key, timeout_key = 'DOCUMENT_BATCH_SIZE', 'DOCUMENT_PROCESS_TIMEOUT'
+    key_column = 'path'
+    status_column, status_at_column = 'check_status', 'check_status_at'
+    queued_state, claimed_state = QUEUED, PROCESSING
+
+    @staticmethod
+    def queued_values():
+        """Column values of a new upload waiting to be checked"""
+        return {'check_status': QUEUED, 'check_status_at': datetime.utcnow()}
+
+    def requeue_all(self):
+        """Check every upload again, e.g. after changing the preview settings; returns how many"""
+        count = (self.model.query
+                 .filter(self.model.check_status.notin_(PENDING_STATES) | self.model.check_status.is_(None))
+                 .update(self.queued_values(), synchronize_session=False))
+        self.db.session.commit()
+        return count
+
+    def _jobs(self, claimed):
+        """Paths of the claimed uploads"""
+        return [row.path for row in claimed.with_entities(self.model.path)]
+
+    def _task(self, paths):
+        config = self.config
+        settings = {'thumbnail_px': config['DOCUMENT_THUMBNAIL_PX'],
+                    'image_max_bytes': config['DOCUMENT_IMAGE_MAX_BYTES'],
+                    'image_max_px': config['DOCUMENT_IMAGE_MAX_PX']}
+        return previews.process_batch, (os.path.abspath(config['UPLOAD_FOLDER']), paths, settings)
+
+    def _complete(self, paths, result=None, error=None):
+        self._record(paths, [(None, error)] * len(paths) if error is not None else result)
+
+    def _record(self, paths, results):
+        """Store the results of processed uploads in one executemany UPDATE"""
+        table = self.model.__table__
+        now = datetime.utcnow()
+        rows = []
+        for path, (values, error) in zip(paths, results):
+            if error is not None:
+                logger.error('Processing upload %s failed: %s', path, error)
+                values = dict.fromkeys(RESULT_COLUMNS)
+                values['check_status'] = FAILED
+            rows.append(dict(values, key=path, checked_at=now))
+        if rows:
+            self.db.session.execute(
+                table.update()
+                .where(table.c.path == bindparam('key'), table.c.check_status == PROCESSING)
+                .values(check_status_at=bindparam('checked_at'),
+                        **{name: bindparam(name) for name in RESULT_COLUMNS}),
+                rows)
+        self.db.session.commit()
@@ -0,0 +1,131 @@
+"""Serving uploaded documents and admission letters.
+
+Documents are only sent through the routes that check who is asking (the
+admin review pages for uploads, the application id for letters), never from
+/static. send() answers conditional requests (ETag, Last-Modified) and byte
+ranges, so a PDF viewer can fetch the pages it shows and resume a download.
+
+With DOCUMENT_OFFLOAD set, the worker only checks access and sets the
+headers, and the reverse proxy sends the bytes:
+
+    x-accel     nginx; X-Accel-Redirect: <DOCUMENT_ACCEL_PREFIX>/<area>/<path>
+    x-sendfile  Apache mod_xsendfile, lighttpd; X-Sendfile: <absolute path>
+
+The proxy then also handles Range requests, and a large PDF never ties up a
+worker while it downloads. Documents of archived applications are read from
+their zip pack by send_archived(), and letters cached in memory are sent
+by send_bytes(), always by the worker.
+"""
+import io
+import os
+from datetime import datetime
+
+from flask import abort, current_app, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+import archive
+
+# Document areas and the config keys of their folders
+AREAS = {'uploads': 'UPLOAD_FOLDER', 'letters': 'PDF_FOLDER'}
+OFFLOAD_MODES = ('', 'x-accel', 'x-sendfile')
+
+
+def root(area):
+    return os.path.abspath(current_app.config[AREAS[area]])
+
+
+def locate(area, relative):
+    """Absolute path of a stored document, or None if it is missing or outside its area"""
+    if not relative:
+        return None
+    path = safe_join(root(area), relative)
+    return path if path and os.path.isfile(path) else None
+
+
+def send(area, relative, download_name, as_attachment=False, etag=True, max_age=0):
+    """Response sending a stored document, or 404.
+
+    etag is True for one derived from the file's size and modification time,
+    or a string, such as the SHA-256 of a content-addressed upload. A
+    positive max_age lets the browser reuse its copy without asking; the
+    response is always private.
+    """
+    path = locate(area, relative)
+    if path is None:
+        abort(404)
+    mode = current_app.config['DOCUMENT_OFFLOAD']
+    if mode not in OFFLOAD_MODES:
+        raise ValueError(f'DOCUMENT_OFFLOAD must be one of {OFFLOAD_MODES}, not {mode!r}')
+
+    response = send_file(path, request.environ, as_attachment=as_attachment, download_name=download_name,
+                         conditional=not mode, etag=etag, use_x_sendfile=bool(mode),
+                         response_class=current_app.response_class)
+    if not mode:
+        # Werkzeug only says so in answer to a Range request; PDF viewers look for it on the first response
+        response.accept_ranges = 'bytes'
+    else:
+        # Ranges are left to the proxy; only answer 304 here
+        response = response.make_conditional(request.environ)
+        response.headers.pop('X-Sendfile', None)
+        if response.status_code != 304:
+            if mode == 'x-accel':
+                prefix = current_app.config['DOCUMENT_ACCEL_PREFIX'].rstrip('/')
+                response.headers['X-Accel-Redirect'] = f"{prefix}/{area}/{os.path.relpath(path, root(area))}"
+            else:
+                response.headers['X-Sendfile'] = path
+        # The body is empty; the proxy sets the length of the one it sends
+        response.headers.pop('Content-Length', None)
+
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.no_cache = None if max_age else True
+    response.cache_control.max_age = max_age or None
+    return response
+
+
+def send_archived(cycle, pack, area, relative, download_name, as_attachment=False):
+    """Response sending a document from an archive pack (see archive.py), or None if it is not there"""
+    found = relative and archive.read_document(current_app.config['ARCHIVE_FOLDER'], cycle, pack,
+                                               archive.member(area, relative))
+    if not found:
+        return None
+    data, info = found
+    return send_bytes(data, download_name, f'{cycle}-{pack}-{info.CRC:08x}', datetime(*info.date_time),
+                      as_attachment=as_attachment)
+
+
+def send_bytes(data, download_name, etag, last_modified, as_attachment=False):
+    """Response sending a document held in memory, such as a cached letter, with ranges and conditional requests"""
+    response = send_file(io.BytesIO(data), request.environ, as_attachment=as_attachment,
+                         download_name=download_name, etag=etag, last_modified=last_modified,
+                         response_class=current_app.response_class)
+    response.accept_ranges = 'bytes'
+    # Cached like a letter from send(): private, and checked against the ETag on each use
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def protect_static(app):
+    """Stop the /static route from serving files in the document folders.
+
+    The default folders live under static/, so without this anyone with a
+    document's path could fetch it without going through the checks above.
+    """
+    serve_static = app.view_functions.get('static')
+    if serve_static is None:
+        return
+
+    def static(filename):
+        path = safe_join(app.static_folder, filename)
+        if path:
+            path = os.path.realpath(path)
+            for key in AREAS.values():
+                folder = os.path.realpath(app.config[key])
+                if path == folder or path.startswith(folder + os.sep):
+                    abort(404)
+        return serve_static(filename=filename)
+
+    app.view_functions['static'] = static
@@ -0,0 +1,176 @@
+"""Row serialization and streaming export for the applications API.
+
+Payloads are built from Core row tuples, never from ORM objects. A
+Serializer compiles one encoder per projection (the requested fields and
+the columns of the rows): a getter per field, which reads it by position
+and converts only the date columns. When every field is a plain column,
+one itemgetter reads them all.
+
+Rows are fetched from the database in batches and encoded as they arrive,
+so memory stays at one batch and the first byte goes out before the last
+row has been read.
+
+JSON is written with orjson when it is installed and with the standard
+library json module otherwise.
+"""
+import csv
+import io
+import json
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from operator import itemgetter
+
+from sqlalchemy import Date, DateTime
+
+try:
+    import orjson
+except ImportError:  # optional, only faster
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+# An exported field: the columns it reads and how to turn a row into its value.
+# column is set when the field is a single column exported as is.
+Field = namedtuple('Field', ['columns', 'value', 'column'], defaults=(None,))
+
+# A compiled projection: row -> dict of the fields, and row -> list of their values
+Encoder = namedtuple('Encoder', ['to_dict', 'to_list'])
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def column(name):
+    """Field that exports a single column unchanged (dates as ISO 8601)"""
+    def value(row):
+        v = getattr(row, name)
+        return v.isoformat() if isinstance(v, (datetime, date)) else v
+    return Field((name,), value, name)
+
+
+def parse_fields(raw, available, default):
+    """Validate a comma separated fields= parameter against the available field names"""
+    if not raw:
+        return list(default)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+
+def required_columns(names, available):
+    """Columns to select for the given fields, each listed once"""
+    return list(dict.fromkeys(col for name in names for col in available[name].columns))
+
+
+def iter_batches(session, statement, batch_size):
+    """Execute statement and yield lists of rows, fetching batch_size rows at a time"""
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def to_dict(row, names, available):
+    """One row as a dict, field by field; Serializer does the same with a compiled encoder"""
+    return {name: available[name].value(row) for name in names}
+
+
+def dumps(obj):
+    """obj as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+class Serializer:
+    """Encodes Core rows as the fields of an API payload.
+
+    encoder(names, keys) compiles, once per projection, the functions that
+    turn a row whose columns are keys into the named fields. The most
+    recent max_encoders projections are kept.
+    """
+
+    def __init__(self, fields, table, max_encoders=256):
+        self.fields = fields
+        self.temporal = {c.key for c in table.columns if isinstance(c.type, (Date, DateTime))}
+        self.max_encoders = max_encoders
+        self._encoders = {}
+        self._lock = threading.Lock()
+
+    def encoder(self, names, keys):
+        projection = (tuple(names), tuple(keys))
+        encoder = self._encoders.get(projection)
+        if encoder is None:
+            with self._lock:
+                encoder = self._encoders.get(projection)
+                if encoder is None:
+                    while len(self._encoders) >= self.max_encoders:
+                        del self._encoders[next(iter(self._encoders))]
+                    encoder = self._encoders[projection] = self._compile(*projection)
+        return encoder
+
+    def _compile(self, names, keys):
+        position = {key: i for i, key in enumerate(keys)}
+        getters = []
+        plain = []  # positions of fields read straight from the row
+        for name in names:
+            field = self.fields[name]
+            if field.column not in position:
+                getters.append(field.value)
+                continue
+            i = position[field.column]
+            if field.column in self.temporal:
+                getters.append(lambda row, i=i: _isoformat(row[i]))
+            else:
+                getters.append(itemgetter(i))
+                plain.append(i)
+
+        if len(plain) == len(names) > 1:
+            values = itemgetter(*plain)  # one C call, returning a tuple
+        else:
+            def values(row):
+                return [getter(row) for getter in getters]
+
+        def to_dict(row):
+            return dict(zip(names, values(row)))
+
+        def to_list(row):
+            return list(values(row))
+        return Encoder(to_dict, to_list)
+
+    def to_dicts(self, rows, names):
+        """The named fields of each row in a list of rows selected together"""
+        if not rows:
+            return []
+        to_dict = self.encoder(names, rows[0]._fields).to_dict
+        return [to_dict(row) for row in rows]
+
+
+def ndjson_stream(batches, names, serializer):
+    for rows in batches:
+        if rows:
+            to_dict = serializer.encoder(names, rows[0]._fields).to_dict
+            yield b''.join(dumps(to_dict(row)) + b'\n' for row in rows)
+
+
+def csv_stream(batches, names, serializer):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        if rows:
+            to_list = serializer.encoder(names, rows[0]._fields).to_list
+            writer.writerows(to_list(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
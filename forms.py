@@ -0,0 +1,56 @@
+"""WTForms forms of the public and admin pages.
+
+The views import this module when they first build a form, so WTForms
+(and email_validator with it) is not loaded just by importing the app.
+"""
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, TextAreaField, SelectField, SubmitField, ValidationError
+from wtforms.validators import DataRequired, Email, Length
+
+import grades
+from models import COURSE_CHOICES
+
+
+class ApplicationForm(FlaskForm):
+    first_name = StringField('First Name', validators=[DataRequired(), Length(min=2, max=100)])
+    last_name = StringField('Last Name', validators=[DataRequired(), Length(min=2, max=100)])
+    email = StringField('Email', validators=[DataRequired(), Email()])
+    phone = StringField('Phone', validators=[DataRequired(), Length(min=10, max=20)])
+    address = TextAreaField('Address', validators=[DataRequired(), Length(min=10, max=500)])
+    date_of_birth = StringField('Date of Birth (YYYY-MM-DD)', validators=[DataRequired()])
+    course_applied = SelectField('Course Applied', choices=COURSE_CHOICES, validators=[DataRequired()])
+    previous_qualification = StringField('Previous Qualification', validators=[DataRequired(), Length(min=5, max=200)])
+    cgpa = StringField('CGPA/Percentage', validators=[DataRequired(), Length(min=1, max=10)])
+    degree_certificate = FileField('Degree Certificate', validators=[
+        FileRequired(),
+        FileAllowed(['pdf', 'jpg', 'jpeg', 'png'], 'Only PDF, JPG, JPEG, PNG files allowed!')
+    ])
+    id_proof = FileField('ID Proof', validators=[
+        FileRequired(),
+        FileAllowed(['pdf', 'jpg', 'jpeg', 'png'], 'Only PDF, JPG, JPEG, PNG files allowed!')
+    ])
+    submit = SubmitField('Submit Application')
+
+    def validate_date_of_birth(self, field):
+        if grades.parse_birth_date(field.data) is None:
+            raise ValidationError('Enter the date of birth as YYYY-MM-DD.')
+
+    def validate_cgpa(self, field):
+        if grades.parse_cgpa(field.data) is None:
+            raise ValidationError('Enter a CGPA (e.g. 8.5 or 3.6/4) or a percentage (e.g. 85%).')
+
+class LoginForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired()])
+    password = StringField('Password', validators=[DataRequired()])
+    submit = SubmitField('Login')
+
+class ReviewForm(FlaskForm):
+    status = SelectField('Status', choices=[('approved', 'Approve'), ('rejected', 'Reject')], validators=[DataRequired()])
+    comments = TextAreaField('Comments', validators=[Length(max=500)])
+    submit = SubmitField('Update Status')
+
+class BulkReviewForm(FlaskForm):
+    status = SelectField('Status', choices=[('approved', 'Approve'), ('rejected', 'Reject')], validators=[DataRequired()])
+    comments = TextAreaField('Comments', validators=[Length(max=500)])
+    submit = SubmitField('Apply to Selected')
@@ -0,0 +1,46 @@
+"""Normalization of the free-form CGPA and date of birth entered on the application form.
+
+Applicants enter either a CGPA or a percentage. Both are stored as a score on
+the 10-point CGPA scale so they can be ranked and filtered in SQL:
+
+    '8.7', '8.7/10'   -> 8.7
+    '3.6/4'           -> 9.0
+    '87%', '87'       -> 8.7   (values above 10 are read as percentages)
+"""
+import re
+from datetime import date, datetime
+
+CGPA_SCALE = 10.0
+_CGPA_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(%|/\s*(\d+(?:\.\d+)?))?\s*$')
+
+
+def parse_cgpa(raw):
+    """Score on the 10-point scale for a CGPA or percentage string, or None if it cannot be read"""
+    if raw is None:
+        return None
+    match = _CGPA_PATTERN.match(str(raw))
+    if not match:
+        return None
+    value = float(match.group(1))
+    if match.group(3):
+        scale = float(match.group(3))
+        if scale <= 0 or value > scale:
+            return None
+        score = value / scale * CGPA_SCALE
+    elif match.group(2) == '%' or value > CGPA_SCALE:
+        if value > 100:
+            return None
+        score = value / 100 * CGPA_SCALE
+    else:
+        score = value
+    return round(score, 2)
+
+
+def parse_birth_date(raw):
+    """Date for a YYYY-MM-DD string, or None if it is not a valid date"""
+    if isinstance(raw, date):
+        return raw
+    try:
+        return datetime.strptime(str(raw).strip(), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,186 @@
+"""Streaming bulk import of applications from CSV or JSON Lines files.
+
+Partner portals send applications as files with one application per row and
+the application form's field names as columns (CSV header) or keys (JSONL).
+Rows are read one at a time and checked against the validators declared on
+the application form. The validators are collected from the form class once,
+so no WTForms form is built per row. Documents are not part of an import.
+
+The caller inserts the valid rows in batches (see import_applications in
+app.py). Invalid rows are reported as RowError(line, field, message) and are
+never held in memory, so a file of any size imports in constant memory.
+Rows that are not valid UTF-8 or not valid CSV are reported the same way,
+and the rest of the file is still read.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+
+import grades
+
+FORMATS = ('csv', 'jsonl')
+MIMETYPES = {'text/csv': 'csv', 'application/x-ndjson': 'jsonl', 'application/jsonl': 'jsonl'}
+
+RowError = namedtuple('RowError', ['line', 'field', 'message'])
+REPORT_FIELDS = RowError._fields
+NOT_UTF8 = 'Not valid UTF-8 text.'
+
+
+def detect_format(filename):
+    """'csv' or 'jsonl' from a file name's extension, or None"""
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(extension)
+
+
+def text_stream(binary):
+    """Decode a binary stream as UTF-8 (with or without a BOM) for the readers below.
+
+    Bytes that are not UTF-8 are kept as lone surrogates rather than
+    stopping the stream, so the readers can report the rows holding them.
+    """
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='surrogateescape', newline='')
+
+
+def _undecodable(value):
+    """Whether text read by text_stream() held bytes that are not UTF-8"""
+    if isinstance(value, list):
+        return any(_undecodable(item) for item in value)
+    if not isinstance(value, str):
+        return False
+    try:
+        value.encode('utf-8')
+    except UnicodeEncodeError:
+        return True
+    return False
+
+
+def read_csv(stream):
+    """Yield (line, record) for each CSV row, or (line, RowError) if it cannot be read; line is where the row starts"""
+    reader = csv.DictReader(stream)
+    try:
+        header = reader.fieldnames
+    except csv.Error as exc:
+        yield 1, RowError(1, '', f'Invalid CSV header: {exc}')
+        return
+    if _undecodable(header):
+        yield 1, RowError(1, '', f'{NOT_UTF8} The header cannot be read, so no row was imported.')
+        return
+    line = reader.line_num + 1
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            yield line, RowError(line, '', f'Invalid CSV: {exc}')
+        else:
+            if _undecodable(list(record.values())):
+                yield line, RowError(line, '', NOT_UTF8)
+            else:
+                yield line, record
+        line = reader.line_num + 1
+
+
+def read_jsonl(stream):
+    """Yield (line, record) for each JSON object line, or (line, RowError) for lines that are not one"""
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        if _undecodable(text):
+            yield line, RowError(line, '', NOT_UTF8)
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as exc:
+            yield line, RowError(line, '', f'Invalid JSON: {exc}')
+            continue
+        if not isinstance(record, dict):
+            yield line, RowError(line, '', 'Each line must be a JSON object.')
+            continue
+        yield line, record
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+class _Field:
+    """The parts of a bound WTForms field that validators use"""
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+class RowValidator:
+    """Checks import records with the validators declared on a form class.
+
+    Calling it with a record returns (values, errors): the form's fields
+    with the typed cgpa_score and birth_date added, and a RowError per
+    invalid field with the message the form would show.
+    """
+
+    def __init__(self, form_class):
+        # WTForms is only needed once there is something to validate
+        from flask_wtf.file import FileField
+        from wtforms import SelectField, SubmitField
+        from wtforms.fields.core import UnboundField
+        from wtforms.validators import StopValidation, ValidationError
+
+        self.failures = (StopValidation, ValidationError)
+        self.rules = []
+        fields = [(name, value) for name, value in vars(form_class).items() if isinstance(value, UnboundField)]
+        for name, unbound in sorted(fields, key=lambda item: item[1].creation_counter):
+            if issubclass(unbound.field_class, (FileField, SubmitField)):
+                continue
+            validators = list(unbound.kwargs.get('validators') or [])
+            choices = None
+            if issubclass(unbound.field_class, SelectField):
+                choices = {value for value, _ in unbound.kwargs.get('choices') or []}
+            inline = getattr(form_class, f'validate_{name}', None)
+            self.rules.append((name, validators, choices, inline))
+
+    def __call__(self, record, line=0):
+        values, errors = {}, []
+        for name, validators, choices, inline in self.rules:
+            value = record.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            values[name] = value
+            message = self._check(value, validators, choices, inline)
+            if message:
+                errors.append(RowError(line, name, message))
+        if not errors:
+            values['cgpa_score'] = grades.parse_cgpa(values.get('cgpa'))
+            values['birth_date'] = grades.parse_birth_date(values.get('date_of_birth'))
+        return values, errors
+
+    def _check(self, value, validators, choices, inline):
+        """The first error for value, in the order a form checks its field, or None"""
+        if value is not None and not isinstance(value, str):
+            return 'Must be text.'
+        field = _Field(value)
+        try:
+            if choices is not None and value not in choices:
+                # SelectField checks its choices before running the validators
+                return 'Not a valid choice.'
+            for validator in validators:
+                validator(None, field)
+            if inline is not None:
+                inline(None, field)
+        except self.failures as exc:
+            return str(exc) or 'Invalid value.'
+        return None
+
+
+def write_report(stream):
+    """A report(error) callback writing each RowError as a CSV line to stream, after a header"""
+    writer = csv.writer(stream)
+    writer.writerow(REPORT_FIELDS)
+    return writer.writerow
@@ -0,0 +1,214 @@
+"""Background work queues kept in a database table.
+
+TableQueue is the dispatcher shared by LetterQueue (admission letters) and
+DocumentQueue (upload checks). The rows to process double as the job
+queue: a row waiting for work is marked queued, and a dispatcher thread
+claims queued rows with a conditional UPDATE, so several app processes
+sharing one database never take the same row. Claimed rows are handed to a
+process pool a batch at a time and their results recorded on the rows.
+Rows whose claim is older than the timeout (their process died) are
+queued again. With no workers configured, notify() processes the queue
+inline instead.
+
+A subclass names its config keys and state columns, and supplies how
+claimed rows become jobs (_jobs), the function a batch runs in a worker
+(_task) and how a finished batch is recorded (_complete).
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class TableQueue:
+    label = 'job'  # in log messages and the dispatcher thread's name
+    extension_name = 'table_queue'  # key in app.extensions
+    defaults = {}  # config defaults set by init_app
+    workers_key = poll_key = batch_key = timeout_key = None  # config keys
+    key_column = 'id'
+    status_column = status_at_column = None
+    queued_state = 'queued'
+    claimed_state = None
+
+    def __init__(self, app=None, db=None, model=None):
+        self.app = None
+        self.db = db
+        self.model = model
+        self._executor = None
+        self._thread = None
+        self._inflight = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in self.defaults.items():
+            app.config.setdefault(key, value)
+        app.extensions[self.extension_name] = self
+        if self.app is None:
+            self.app = app
+
+    @property
+    def config(self):
+        """Config of the current app, or of the app the dispatcher runs for"""
+        return current_app.config if has_app_context() else self.app.config
+
+    def notify(self):
+        """Wake the dispatcher once new work is committed, starting it if this process has not yet.
+
+        Without workers this processes everything still queued right away,
+        in one batch.
+        """
+        self.prepare()
+        if self.config[self.workers_key] <= 0:
+            jobs = self._claim(None)
+            if jobs:
+                task, args = self._task(jobs)
+                self._complete(jobs, result=task(*args))
+            return
+        self.start()
+        self._wake.set()
+
+    def prepare(self):
+        """Called before work is dispatched, e.g. to create an output folder"""
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if has_app_context():
+                self.app = current_app._get_current_object()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'{self.label}-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._inflight.clear()
+
+    def run_forever(self):
+        """Run the dispatcher in the calling thread until interrupted"""
+        self.prepare()
+        try:
+            self._run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def run_once(self):
+        """Record finished batches, requeue stale claims and dispatch queued rows"""
+        self._collect()
+        self._requeue_stale()
+        batch_size = self.config[self.batch_key]
+        jobs = self._claim(self.config[self.workers_key] * batch_size * 2 - self._inflight_count())
+        for i in range(0, len(jobs), batch_size):
+            batch = jobs[i:i + batch_size]
+            self._inflight[self._submit(batch)] = batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.run_once()
+            except Exception:
+                logger.exception('%s dispatcher iteration failed', self.label.capitalize())
+            self._wake.wait(self.config[self.poll_key])
+            self._wake.clear()
+
+    def _inflight_count(self):
+        return sum(len(batch) for batch in self._inflight.values())
+
+    def _inflight_keys(self):
+        return [self._job_key(job) for batch in self._inflight.values() for job in batch]
+
+    def _submit(self, jobs):
+        task, args = self._task(jobs)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.config[self.workers_key])
+        try:
+            future = self._executor.submit(task, *args)
+        except BrokenProcessPool:
+            logger.warning('%s worker pool died, starting a new one', self.label.capitalize())
+            self._executor = ProcessPoolExecutor(max_workers=self.config[self.workers_key])
+            future = self._executor.submit(task, *args)
+        future.add_done_callback(lambda _: self._wake.set())
+        return future
+
+    def _columns(self):
+        model = self.model
+        return (getattr(model, self.key_column), getattr(model, self.status_column),
+                getattr(model, self.status_at_column))
+
+    def _claim(self, capacity):
+        """Mark up to capacity queued rows as claimed and return their jobs"""
+        if capacity is not None and capacity <= 0:
+            return []
+        key, status, status_at = self._columns()
+        query = self.db.session.query(key).filter(status == self.queued_state).order_by(status_at)
+        if capacity is not None:
+            query = query.limit(capacity)
+        keys = [row[0] for row in query]
+        if not keys:
+            return []
+
+        # One conditional UPDATE claims the rows; the timestamp identifies this claim
+        claimed_at = datetime.utcnow()
+        (self.model.query
+         .filter(key.in_(keys), status == self.queued_state)
+         .update({self.status_column: self.claimed_state, self.status_at_column: claimed_at},
+                 synchronize_session=False))
+        self.db.session.commit()
+        return self._jobs(self.model.query.filter(key.in_(keys), status == self.claimed_state,
+                                                  status_at == claimed_at))
+
+    def _collect(self):
+        for future in [f for f in self._inflight if f.done()]:
+            batch = self._inflight.pop(future)
+            error = future.exception()
+            if error:
+                self._complete(batch, error=repr(error))
+            else:
+                self._complete(batch, result=future.result())
+
+    def _requeue_stale(self):
+        """Put back rows whose worker (possibly in another process) died while on them"""
+        key, status, status_at = self._columns()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.config[self.timeout_key])
+        stale = (self.model.query
+                 .filter(status == self.claimed_state, status_at < cutoff, key.notin_(self._inflight_keys()))
+                 .update({self.status_column: self.queued_state}, synchronize_session=False))
+        if stale:
+            logger.warning('Requeued %d stale %s jobs', stale, self.label)
+        self.db.session.commit()
+
+    # Provided by subclasses
+    def _jobs(self, claimed):
+        """The jobs for a query of the rows just claimed"""
+        raise NotImplementedError
+
+    def _job_key(self, job):
+        """The key_column value of the row a job is for"""
+        return job
+
+    def _task(self, jobs):
+        """(function, args) processing a batch of jobs in a worker process"""
+        raise NotImplementedError
+
+    def _complete(self, jobs, result=None, error=None):
+        """Record a batch's result, or the error that failed the whole batch, and commit"""
+        raise NotImplementedError
@@ -0,0 +1,156 @@
+import logging
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import case, literal
+
+import letters
+from job_queue import TableQueue
+
+logger = logging.getLogger(__name__)
+
+# Letter states persisted on Student.letter_status
+QUEUED = 'queued'
+RENDERING = 'rendering'
+READY = 'ready'
+FAILED = 'failed'
+PENDING_STATES = (QUEUED, RENDERING)
+
+
+def render_timed(jobs, fonts=None):
+    """Render a batch in a worker, returning its per-job errors and the elapsed render time"""
+    start = time.perf_counter()
+    errors = letters.render_admission_letters(jobs, fonts)
+    return errors, time.perf_counter() - start
+
+
+class LetterQueue(TableQueue):
+    """Renders admission letters on a process pool, off the request path.
+
+    The Student table is the job queue (see job_queue.py): enqueue() marks
+    a row 'queued' and the dispatcher renders claimed rows
+    LETTER_BATCH_SIZE at a time, so each worker reuses one stylesheet
+    across the batch. Setting LETTER_WORKERS to 0 renders inline instead.
+    """
+
+    label = 'letter'
+    extension_name = 'letter_queue'
+    defaults = {'LETTER_WORKERS': 2, 'LETTER_POLL_INTERVAL': 2.0,
+                'LETTER_RENDER_TIMEOUT': 300, 'LETTER_BATCH_SIZE': 20,
+                'LETTER_FONT': None, 'LETTER_BOLD_FONT': None}
+    workers_key, poll_key = 'LETTER_WORKERS', 'LETTER_POLL_INTERVAL'
+    batch_key, timeout_key = 'LETTER_BATCH_SIZE', 'LETTER_RENDER_TIMEOUT'
+    status_column, status_at_column = 'letter_status', 'letter_status_at'
+    queued_state, claimed_state = QUEUED, RENDERING
+
+    def __init__(self, app=None, db=None, model=None):
+        self._listeners = []
+        self._timers = []
+        super().__init__(app, db, model)
+
+    def enqueue(self, student):
+        """Schedule the letter for student; call notify() once the session is committed"""
+        student.admission_letter_path = letters.letter_filename(student.application_id)
+        if self.config[self.workers_key] <= 0:
+            self._render_inline(student)
+        else:
+            self._set_state(student, QUEUED)
+
+    def on_change(self, listener):
+        """Register listener(application_ids), called after rendered letters are recorded"""
+        self._listeners.append(listener)
+        return listener
+
+    def on_rendered(self, listener):
+        """Register listener(count, seconds), called with the render time of each batch"""
+        self._timers.append(listener)
+        return listener
+
+    def queued_values(self):
+        """Column values that queue letters for every row of a bulk UPDATE"""
+        Student = self.model
+        return {
+            'admission_letter_path': literal('admission_letter_') + Student.application_id + '.pdf',
+            'letter_status': QUEUED,
+            'letter_status_at': datetime.utcnow(),
+        }
+
+    def make_folder(self):
+        """Create PDF_FOLDER when letters are first needed, rather than when the app is built"""
+        os.makedirs(self.config['PDF_FOLDER'], exist_ok=True)
+
+    prepare = make_folder
+
+    def fonts(self):
+        """(regular, bold) TTF files letters are set in; None for the built-in Helvetica"""
+        return self.config['LETTER_FONT'], self.config['LETTER_BOLD_FONT']
+
+    def _jobs(self, claimed):
+        """(id, fields, path) jobs of the claimed students"""
+        folder = self.config['PDF_FOLDER']
+        return [(s.id, letters.letter_fields(s), os.path.join(folder, s.admission_letter_path))
+                for s in claimed]
+
+    def _job_key(self, job):
+        return job[0]
+
+    def _task(self, jobs):
+        return render_timed, ([job[1:] for job in jobs], self.fonts())
+
+    def _complete(self, jobs, result=None, error=None):
+        if error is not None:
+            self._record(jobs, [error] * len(jobs))
+            return
+        errors, elapsed = result
+        self._timed(len(jobs), elapsed)
+        self._record(jobs, errors)
+
+    def _timed(self, count, seconds):
+        for listener in self._timers:
+            listener(count, seconds)
+
+    def _record(self, jobs, errors):
+        """Store the outcome of rendered jobs, two UPDATEs per batch"""
+        Student = self.model
+        ready, failed, keys = [], [], {}
+        for (student_id, fields, _), error in zip(jobs, errors):
+            if error is None:
+                ready.append(student_id)
+                keys[student_id] = letters.letter_key(fields)
+            else:
+                logger.error('Rendering admission letter for student %s failed: %s', student_id, error)
+                failed.append(student_id)
+        now = datetime.utcnow()
+        for state, ids in ((READY, ready), (FAILED, failed)):
+            if ids:
+                values = {'letter_status': state, 'letter_status_at': now}
+                if state == READY:
+                    values['letter_key'] = case(keys, value=Student.id)
+                (Student.query
+                 .filter(Student.id.in_(ids), Student.letter_status == RENDERING)
+                 .update(values, synchronize_session=False))
+        self.db.session.commit()
+        application_ids = [fields['application_id'] for _, fields, _ in jobs]
+        for listener in self._listeners:
+            listener(application_ids)
+
+    def _render_inline(self, student):
+        self.make_folder()
+        path = os.path.join(self.config['PDF_FOLDER'], student.admission_letter_path)
+        fields = letters.letter_fields(student)
+        start = time.perf_counter()
+        try:
+            letters.render_admission_letter(fields, path, self.fonts())
+            self._timed(1, time.perf_counter() - start)
+        except Exception:
+            logger.exception('Rendering admission letter for %s failed', student.application_id)
+            self._set_state(student, FAILED)
+        else:
+            student.letter_key = letters.letter_key(fields)
+            self._set_state(student, READY)
+
+    @staticmethod
+    def _set_state(student, state):
+        student.letter_status = state
+        student.letter_status_at = datetime.utcnow()
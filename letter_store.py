@@ -0,0 +1,149 @@
+"""Admission letters kept ready to send.
+
+A letter file is only current while the student fields it was rendered
+from are unchanged: letters.letter_key() hashes them, and the key of the
+file on disk is recorded on the student row (Student.letter_key). A
+download whose row records another key, or whose file is missing, renders
+the letter again (see current_letter in applications.py).
+
+LetterStore keeps the bytes of recently sent letters in memory, in an LRU
+bounded by LETTER_CACHE_SIZE letters and LETTER_CACHE_MAX_BYTES, and makes
+concurrent downloads of one letter share a single read or render: the
+first request loads it and the others wait for its result instead of
+rendering the same letter again. Coalescing is per process; letter files
+are replaced atomically, so two processes rendering the same letter at
+once only cost a duplicate render.
+"""
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+# A letter as sent: its bytes, ETag and Last-Modified, and the mtime of the file they came from
+StoredLetter = namedtuple('StoredLetter', ['data', 'etag', 'last_modified', 'mtime_ns'])
+
+
+def stored_letter(key, data, mtime_ns):
+    return StoredLetter(data, f'{key[:16]}-{zlib.crc32(data):08x}', mtime_ns / 1e9, mtime_ns)
+
+
+def read_letter(key, path):
+    """StoredLetter of the letter file at path"""
+    with open(path, 'rb') as f:
+        data = f.read()
+        return stored_letter(key, data, os.fstat(f.fileno()).st_mtime_ns)
+
+
+def write_letter(key, path, data):
+    """Write a letter file so that readers only ever see the old letter or the new one"""
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.letter-', suffix='.partial')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    return stored_letter(key, data, os.stat(path).st_mtime_ns)
+
+
+def file_mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class LetterStore:
+    """Bounded LRU of StoredLetters by letter key, with one load at a time per key"""
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def load(self, key, produce, fresh=None, timeout=None):
+        """The letter stored under key, or the one produce() returns, which is then stored.
+
+        fresh(letter), if given, decides whether a stored letter may still be
+        sent. While one thread runs produce() for a key, other callers for
+        that key wait up to timeout seconds for its result (TimeoutError
+        after that) and get its exception if it fails.
+        """
+        with self._lock:
+            letter = self._entries.get(key)
+        if letter is not None and (fresh is None or fresh(letter)):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return letter
+
+        with self._lock:
+            future = self._loading.get(key)
+            loader = future is None
+            if loader:
+                future = self._loading[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not loader:
+            return future.result(timeout)
+
+        try:
+            letter = produce()
+        except BaseException as error:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._store(key, letter)
+        future.set_result(letter)
+        return letter
+
+    def configure(self, max_entries, max_bytes):
+        """Change the bounds, starting empty"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._entries.clear()
+            self._bytes = 0
+
+    def discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                letter = self._entries.pop(key, None)
+                if letter is not None:
+                    self._bytes -= len(letter.data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'evictions': self.evictions, 'size': len(self._entries), 'bytes': self._bytes}
+
+    def _store(self, key, letter):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous.data)
+        if self.max_entries <= 0 or len(letter.data) > self.max_bytes:
+            return
+        self._entries[key] = letter
+        self._bytes += len(letter.data)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.data)
+            self.evictions += 1
@@ -0,0 +1,374 @@
+"""Admission letter rendering.
+
+Letters are set in the standard Type1 fonts (Helvetica) by default and
+written by LetterTemplate, which is compiled once per process: the
+ReportLab stylesheet and font metrics are resolved, the static text is
+wrapped and encoded into PDF operators, and the PDF objects every letter
+shares are serialized up front. Rendering a letter then only lays out the
+per-student lines, breaking onto a new page when the text outgrows one,
+and splices them into the cached bytes.
+
+The Type1 fonts only cover WinAnsi (cp1252). A letter whose fields do not
+encode in it is laid out by ReportLab instead (StoryTemplate), in TrueType
+fonts embedded as subsets: ReportLab's bundled Vera, or LETTER_FONT and
+LETTER_BOLD_FONT when they are set, in which case every letter uses them.
+Embedding a font costs several milliseconds and tens of KB per letter,
+which is why it is not the default.
+
+ReportLab is imported when the first template is compiled, so importing
+this module (and the app) stays cheap for processes that never render.
+"""
+import hashlib
+import io
+import os
+import threading
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+# Student attributes that appear in the admission letter
+LETTER_FIELDS = ('application_id', 'first_name', 'last_name', 'course_applied',
+                 'email', 'phone', 'previous_qualification', 'cgpa')
+
+LETTER_TITLE = "UNIVERSITY ADMISSION LETTER"
+
+# Letter body, one entry per line: a list of (style, text) runs, or None for
+# a blank line. '{name}' placeholders are filled from the student's fields.
+LETTER_BODY = [
+    [('normal', 'Date: {date}')],
+    None,
+    [('bold', 'Dear {first_name} {last_name},')],
+    None,
+    [('normal', 'Congratulations! We are pleased to inform you that your application '
+                'for admission has been '), ('bold', 'APPROVED'), ('normal', '.')],
+    None,
+    [('bold', 'Application Details:')],
+    [('normal', 'Application ID: {application_id}')],
+    [('normal', 'Course: {course}')],
+    [('normal', 'Email: {email}')],
+    [('normal', 'Phone: {phone}')],
+    [('normal', 'Previous Qualification: {previous_qualification}')],
+    [('normal', 'CGPA: {cgpa}')],
+    None,
+    [('normal', 'Please report to the admission office within 30 days of receiving this '
+                'letter to complete your enrollment process.')],
+    None,
+    [('normal', 'Welcome to our university!')],
+    None,
+    [('normal', 'Best regards,')],
+    [('normal', 'Admissions Committee')],
+    [('normal', 'University Name')],
+]
+
+
+# Changes to the layout above make every earlier letter stale
+_LAYOUT_DIGEST = hashlib.sha256(repr((LETTER_TITLE, LETTER_BODY)).encode()).digest()
+
+
+def letter_filename(application_id):
+    return f"admission_letter_{application_id}.pdf"
+
+
+def letter_key(fields):
+    """Hash of the letter fields (and layout) a letter is rendered from; a letter is stale once it differs"""
+    digest = hashlib.sha256(_LAYOUT_DIGEST)
+    for name in LETTER_FIELDS:
+        digest.update(b'\x1f' + str(fields.get(name) or '').encode())
+    return digest.hexdigest()
+
+
+def letter_fields(student):
+    """Copy the letter fields off a Student into a plain, picklable dict"""
+    return {name: getattr(student, name) for name in LETTER_FIELDS}
+
+
+def _pdf_string(text):
+    """Encode text as a PDF literal string in the Type1 fonts' WinAnsi encoding (UnicodeEncodeError outside it)"""
+    data = text.encode('cp1252')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class LetterTemplate:
+    """Admission letter layout in the standard Type1 fonts, compiled once and filled in per student"""
+
+    def __init__(self, pagesize=None, body=LETTER_BODY):
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import inch
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        self.string_width = stringWidth
+        styles = getSampleStyleSheet()
+        normal, title = styles['Normal'], styles['Title']
+        self.fonts = {'normal': normal.fontName, 'bold': title.fontName}
+        self.font_refs = {'normal': b'/F1', 'bold': b'/F2'}
+        self.font_size = normal.fontSize
+        self.leading = normal.leading
+
+        # Same frame as SimpleDocTemplate: one inch margins plus 6pt padding
+        self.page_width, self.page_height = pagesize or A4
+        self.left = inch + 6
+        self.width = self.page_width - 2 * self.left
+        top = self.page_height - inch - 6
+        bottom = inch + 6
+
+        title_width = stringWidth(LETTER_TITLE, title.fontName, title.fontSize)
+        title_x = self.left + (self.width - title_width) / 2 if title.alignment == TA_CENTER else self.left
+        title_y = top - title.fontSize
+        body_y = title_y - title.spaceAfter - 20 - self.leading
+        self.header = b''.join([
+            b'BT /F2 %.2f Tf %.2f %.2f Td ' % (title.fontSize, title_x, title_y),
+            _pdf_string(LETTER_TITLE), b' Tj ET\n',
+            b'BT %.2f TL %.2f %.2f Td\n' % (self.leading, self.left, body_y),
+        ])
+        # Later pages start at the top of the frame
+        next_y = top - self.font_size
+        self.continued = b'BT %.2f TL %.2f %.2f Td\n' % (self.leading, self.left, next_y)
+        self.first_capacity = int((body_y - bottom) // self.leading) + 1
+        self.capacity = int((next_y - bottom) // self.leading) + 1
+
+        # Lines without placeholders are wrapped and encoded now, as one entry
+        # per output line; the rest per letter
+        self.lines = []
+        for line in body:
+            if line is None:
+                self.lines.append([b'T*\n'])
+            elif any('{' in text for _, text in line):
+                self.lines.append(line)
+            else:
+                self.lines.append(self._encode(line))
+
+        self.objects, self.offsets = self._compile_objects()
+
+    def render(self, fields, filepath):
+        """Write the letter for one student's fields to filepath"""
+        data = self.render_bytes(fields)
+        with open(filepath, 'wb') as fh:
+            fh.write(data)
+        return filepath
+
+    def render_bytes(self, fields):
+        values = dict(fields)
+        values['course'] = (fields.get('course_applied') or '').replace('_', ' ').title()
+        values['date'] = datetime.now().strftime('%B %d, %Y')
+
+        output = []
+        try:
+            for line in self.lines:
+                if isinstance(line[0], bytes):
+                    output.extend(line)
+                else:
+                    output.extend(self._encode([(style, text.format_map(values)) for style, text in line]))
+        except UnicodeEncodeError:
+            # Not expressible in the Type1 fonts; lay it out with an embedded TrueType font
+            return _cached_template(FALLBACK_FONTS).render_bytes(fields)
+
+        pages, start, capacity = [], 0, self.first_capacity
+        while start < len(output) or not pages:
+            opening = self.header if not pages else self.continued
+            pages.append(b''.join([opening] + output[start:start + capacity] + [b'ET\n']))
+            start, capacity = start + capacity, self.capacity
+        return self._assemble(pages)
+
+    def _encode(self, runs):
+        """Wrap a line of (style, text) runs to the frame width; PDF text operators per output line"""
+        out = []
+        for wrapped in self._wrap(runs):
+            out.append(b''.join(b'%s %.2f Tf %s Tj ' % (self.font_refs[style], self.font_size, _pdf_string(text))
+                                for style, text in wrapped) + b'T*\n')
+        return out
+
+    def _wrap(self, runs):
+        lines, current, used = [], [], 0.0
+        space = self.string_width(' ', self.fonts['normal'], self.font_size)
+        for style, text in runs:
+            font = self.fonts[style]
+            for i, word in enumerate(text.split(' ')):
+                width = self.string_width(word, font, self.font_size)
+                gap = space if (i > 0 and current) else 0.0
+                if current and used + gap + width > self.width:
+                    lines.append(current)
+                    current, used, gap = [], 0.0, 0.0
+                piece = (' ' if gap else '') + word
+                if current and current[-1][0] == style:
+                    current[-1] = (style, current[-1][1] + piece)
+                else:
+                    current.append((style, piece))
+                used += gap + width
+        lines.append(current)
+        return lines
+
+    def _compile_objects(self):
+        """Serialize the objects every letter shares (1-4), recording their offsets.
+
+        The page tree (5) and each page with its content stream (6, 7, ...)
+        are written per letter.
+        """
+        objects = [
+            b'<< /Type /Catalog /Pages 5 0 R >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % self.fonts['normal'].encode(),
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % self.fonts['bold'].encode(),
+            b'<< /Title ' + _pdf_string('Admission Letter') + b' /Producer (ReportLab PDF Library) >>',
+        ]
+        head = [b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n']
+        offsets = []
+        position = len(head[0])
+        for number, body in enumerate(objects, start=1):
+            chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+            offsets.append(position)
+            head.append(chunk)
+            position += len(chunk)
+        return b''.join(head), offsets
+
+    def _assemble(self, pages):
+        kids = b' '.join(b'%d 0 R' % (6 + 2 * i) for i in range(len(pages)))
+        chunks = [b'5 0 obj\n<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n' % (kids, len(pages))]
+        for i, content in enumerate(pages):
+            number = 6 + 2 * i
+            chunks.append(b'%d 0 obj\n<< /Type /Page /Parent 5 0 R /MediaBox [0 0 %.4f %.4f] '
+                          b'/Resources << /Font << /F1 2 0 R /F2 3 0 R >> >> /Contents %d 0 R >>\nendobj\n'
+                          % (number, self.page_width, self.page_height, number + 1))
+            chunks.append(b'%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n'
+                          % (number + 1, len(content), content))
+        offsets = list(self.offsets)
+        position = len(self.objects)
+        for chunk in chunks:
+            offsets.append(position)
+            position += len(chunk)
+        size = len(offsets) + 1
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % size]
+        xref.extend(b'%010d 00000 n \n' % offset for offset in offsets)
+        trailer = (b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (size, position))
+        return b''.join([self.objects] + chunks + xref + [trailer])
+
+
+def _markup(runs):
+    """Paragraph markup of a line of (style, text) runs"""
+    return ''.join(f'<b>{text}</b>' if style == 'bold' else text for style, text in runs)
+
+
+class StoryTemplate:
+    """Admission letter laid out by ReportLab in embedded TrueType fonts.
+
+    fonts is a (regular, bold) pair of TTF paths; missing entries fall back
+    to ReportLab's Vera.
+    """
+
+    def __init__(self, pagesize=None, body=LETTER_BODY, fonts=None):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+        self.paragraph = Paragraph
+        regular, bold = _register_fonts(*(fonts or (None, None)))
+        styles = getSampleStyleSheet()
+        self.style = ParagraphStyle('Letter', parent=styles['Normal'], fontName=regular)
+        title = ParagraphStyle('LetterTitle', parent=styles['Title'], fontName=bold)
+        # Built with a BytesIO per letter, see render_bytes
+        self.doc = SimpleDocTemplate(io.BytesIO(), pagesize=pagesize or A4,
+                                     title='Admission Letter', invariant=True)
+
+        # Flowables of lines without placeholders are built now; the rest per letter
+        self.header = [Paragraph(LETTER_TITLE, title), Spacer(1, 20)]
+        blank = Spacer(1, self.style.leading)
+        self.lines = []
+        for line in body:
+            if line is None:
+                self.lines.append(blank)
+            elif any('{' in text for _, text in line):
+                self.lines.append(line)
+            else:
+                self.lines.append(Paragraph(_markup(line), self.style))
+
+    def render(self, fields, filepath):
+        """Write the letter for one student's fields to filepath"""
+        data = self.render_bytes(fields)
+        with open(filepath, 'wb') as fh:
+            fh.write(data)
+        return filepath
+
+    def render_bytes(self, fields):
+        values = {name: escape(str(value if value is not None else '')) for name, value in fields.items()}
+        values['course'] = escape((fields.get('course_applied') or '').replace('_', ' ').title())
+        values['date'] = datetime.now().strftime('%B %d, %Y')
+
+        story = list(self.header)
+        for line in self.lines:
+            if isinstance(line, list):
+                line = self.paragraph(_markup([(style, text.format_map(values)) for style, text in line]),
+                                      self.style)
+            story.append(line)
+        buffer = io.BytesIO()
+        self.doc.filename = buffer
+        self.doc.build(story)
+        return buffer.getvalue()
+
+
+def _register_fonts(regular=None, bold=None):
+    """Register the letter's TTF fonts with ReportLab, once per process; returns their names"""
+    import reportlab
+    from reportlab.lib.fonts import addMapping
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    bundled = os.path.join(os.path.dirname(reportlab.__file__), 'fonts')
+    regular = regular or os.path.join(bundled, 'Vera.ttf')
+    bold = bold or os.path.join(bundled, 'VeraBd.ttf')
+    names = []
+    for path in (regular, bold):
+        name = 'Letter-' + hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]
+        if name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, path))
+        names.append(name)
+    # <b> in a paragraph set in the regular font switches to the bold one
+    addMapping(names[0], 0, 0, names[0])
+    addMapping(names[0], 1, 0, names[1])
+    addMapping(names[0], 0, 1, names[0])
+    addMapping(names[0], 1, 1, names[1])
+    return names
+
+
+_local = threading.local()
+
+
+# Fonts of the StoryTemplate for letters the Type1 fonts cannot set: ReportLab's Vera
+FALLBACK_FONTS = (None, None)
+
+
+def get_template(fonts=None):
+    """This thread's compiled template: Type1 unless fonts, a (regular, bold) pair of TTF paths, is configured"""
+    return _cached_template(tuple(fonts) if fonts and any(fonts) else None)
+
+
+def _cached_template(fonts):
+    templates = getattr(_local, 'templates', None)
+    if templates is None:
+        templates = _local.templates = {}
+    template = templates.get(fonts)
+    if template is None:
+        template = templates[fonts] = LetterTemplate() if fonts is None else StoryTemplate(fonts=fonts)
+    return template
+
+
+def render_admission_letter(fields, filepath, fonts=None):
+    """Render the admission letter PDF for one student's fields to filepath"""
+    return get_template(fonts).render(fields, filepath)
+
+
+def render_admission_letters(jobs, fonts=None):
+    """Render a batch of (fields, filepath) jobs with the cached template.
+
+    Returns one entry per job: None on success, otherwise the error message,
+    so a single bad row does not fail the rest of the batch.
+    """
+    template = get_template(fonts)
+    results = []
+    for fields, filepath in jobs:
+        try:
+            template.render(fields, filepath)
+        except Exception as exc:
+            results.append(repr(exc))
+        else:
+            results.append(None)
+    return results
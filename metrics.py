@@ -0,0 +1,288 @@
+"""Request-level performance instrumentation exposed in Prometheus text format.
+
+Records per-route latency, SQL query count and time per request (through
+SQLAlchemy engine events), template render time and admission letter render
+time. Statements slower than SLOW_QUERY_MS and statements repeated at least
+N_PLUS_ONE_THRESHOLD times within one request (the usual N+1 pattern) are
+logged. Metrics are kept per process.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter as _Tally
+
+from flask import before_render_template, current_app, has_app_context, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+_ENVIRON_KEY = 'metrics.request_stats'
+DEFAULTS = {'SLOW_QUERY_MS': 200, 'N_PLUS_ONE_THRESHOLD': 10}
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labels, label_values, ('le', _format_number(bound)))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.labels, label_values, ('le', '+Inf'))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {_format_number(total)}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = _Tally()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = _Tally()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable returning extra exposition lines, e.g. gauges read at scrape time"""
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+def _setting(key):
+    # Engine events can fire outside any app context, e.g. in a script
+    return current_app.config.get(key, DEFAULTS[key]) if has_app_context() else DEFAULTS[key]
+
+
+def gauge_lines(name, documentation, value):
+    return [f'# HELP {name} {documentation}', f'# TYPE {name} gauge', f'{name} {_format_number(value)}']
+
+
+class _RequestStats:
+    __slots__ = ('start', 'status', 'sql_count', 'sql_time', 'statements', 'templates')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = 500
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = _Tally()
+        self.templates = {}
+
+
+class Instrumentation:
+    """Flask extension wiring request, SQL, template and letter timings into a Registry"""
+
+    def __init__(self, app=None):
+        self.registry = Registry()
+        r = self.registry
+        self.request_latency = r.register(Histogram(
+            'http_request_duration_seconds', 'Request latency by route.', ('endpoint', 'method', 'status')))
+        self.request_queries = r.register(Histogram(
+            'http_request_sql_queries', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS))
+        self.request_sql_time = r.register(Histogram(
+            'http_request_sql_seconds', 'Time spent in SQL per request.', ('endpoint',)))
+        self.query_latency = r.register(Histogram(
+            'sql_query_duration_seconds', 'Latency of individual SQL statements.'))
+        self.template_latency = r.register(Histogram(
+            'template_render_seconds', 'Jinja template render time.', ('template',)))
+        self.letter_latency = r.register(Histogram(
+            'letter_render_seconds', 'Admission letter render time per letter.'))
+        self.slow_queries = r.register(Counter(
+            'sql_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.', ('endpoint',)))
+        self.repeated_queries = r.register(Counter(
+            'sql_repeated_query_requests_total', 'Requests that repeated one statement N_PLUS_ONE_THRESHOLD times.',
+            ('endpoint',)))
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in DEFAULTS.items():
+            app.config.setdefault(key, value)
+        app.extensions['instrumentation'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_template, app)
+        template_rendered.connect(self._after_template, app)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def observe_letters(self, count, seconds):
+        """Record a batch of count letters rendered in seconds"""
+        for _ in range(count):
+            self.letter_latency.observe(seconds / count)
+
+    def timed_letter(self, fn):
+        """Decorator timing a single-letter render function"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.letter_latency.observe(time.perf_counter() - start)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+
+    def render(self):
+        return self.registry.render()
+
+    # Request hooks. Per-request state lives in the WSGI environ rather than
+    # on g so teardown still finds it when contexts are popped out of order.
+    def _before_request(self):
+        request.environ[_ENVIRON_KEY] = _RequestStats()
+
+    def _after_request(self, response):
+        stats = request.environ.get(_ENVIRON_KEY)
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        stats = request.environ.pop(_ENVIRON_KEY, None)
+        if stats is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        self.request_latency.observe(time.perf_counter() - stats.start, endpoint, request.method, stats.status)
+        self.request_queries.observe(stats.sql_count, endpoint)
+        self.request_sql_time.observe(stats.sql_time, endpoint)
+
+        threshold = _setting('N_PLUS_ONE_THRESHOLD')
+        repeated = [(stmt, n) for stmt, n in stats.statements.items() if n >= threshold]
+        if repeated:
+            self.repeated_queries.inc(endpoint)
+            for statement, count in repeated:
+                logger.warning('Possible N+1 in %s: statement ran %d times: %s', endpoint, count, statement)
+
+    # SQLAlchemy hooks
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = getattr(self._local, 'starts', None)
+        if stack is None:
+            stack = self._local.starts = []
+        stack.append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = getattr(self._local, 'starts', None)
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        self.query_latency.observe(elapsed)
+
+        stats = request.environ.get(_ENVIRON_KEY) if has_request_context() else None
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_time += elapsed
+            stats.statements[statement] += 1
+
+        if elapsed * 1000 >= _setting('SLOW_QUERY_MS'):
+            where = (request.endpoint or 'unmatched') if stats is not None else 'background'
+            self.slow_queries.inc(where)
+            logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, where, statement)
+
+    # Template hooks
+    def _before_template(self, sender, template, context, **extra):
+        stats = request.environ.get(_ENVIRON_KEY) if has_request_context() else None
+        if stats is not None:
+            stats.templates[id(template)] = time.perf_counter()
+
+    def _after_template(self, sender, template, context, **extra):
+        stats = request.environ.get(_ENVIRON_KEY) if has_request_context() else None
+        if stats is not None:
+            start = stats.templates.pop(id(template), None)
+            if start is not None:
+                self.template_latency.observe(time.perf_counter() - start, template.name)
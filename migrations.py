@@ -0,0 +1,200 @@
+"""Versioned schema migrations for existing databases.
+
+`db.create_all()` only creates missing tables, so columns and indexes added
+to the models later never reach a database that already exists. Each
+migration below is applied once, in order, and recorded in the
+`schema_version` table. Migrations are written to be idempotent so they are
+also safe to run against a database freshly built by `create_all()`.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+import dedup
+import grades
+import search
+import stats
+
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table, bindparam, func, inspect, select, text
+
+BACKFILL_BATCH_SIZE = 5000
+
+Migration = namedtuple('Migration', ['version', 'description', 'upgrade'])
+
+_meta = MetaData()
+schema_version = Table(
+    'schema_version', _meta,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a function as the upgrade step for the given schema version"""
+    def decorator(fn):
+        MIGRATIONS.append(Migration(version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+
+def create_index(conn, table_name, name, *columns):
+    """Create an index unless a database built by create_all() already has it"""
+    existing = {ix['name'] for ix in inspect(conn).get_indexes(table_name)}
+    if name not in existing:
+        table = Table(table_name, MetaData(), autoload_with=conn)
+        Index(name, *[table.c[c] for c in columns]).create(conn)
+
+
+def add_column(conn, table_name, column):
+    """Add column to an existing table unless it is already there"""
+    existing = {c['name'] for c in inspect(conn).get_columns(table_name)}
+    if column.name not in existing:
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'))
+
+
+def current_version(conn):
+    schema_version.create(conn, checkfirst=True)
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine, target=None):
+    """Apply all pending migrations up to target (default: latest), returning the versions applied"""
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+    for m in MIGRATIONS:
+        if m.version <= version or (target is not None and m.version > target):
+            continue
+        with engine.begin() as conn:
+            m.upgrade(conn)
+            conn.execute(schema_version.insert().values(
+                version=m.version, description=m.description, applied_at=datetime.utcnow()))
+        applied.append(m.version)
+    return applied
+
+
+# Migrations
+@migration(1, 'Indexes for dashboard ordering, status/course filters and email lookups')
+def add_student_indexes(conn):
+    create_index(conn, 'student', 'ix_student_application_date_id', 'application_date', 'id')
+    create_index(conn, 'student', 'ix_student_status_date', 'status', 'application_date', 'id')
+    create_index(conn, 'student', 'ix_student_course_status', 'course_applied', 'status')
+    create_index(conn, 'student', 'ix_student_email', 'email')
+
+
+@migration(2, 'Track background admission letter rendering on student rows')
+def add_letter_status(conn):
+    add_column(conn, 'student', Column('letter_status', String(20)))
+    add_column(conn, 'student', Column('letter_status_at', DateTime))
+    create_index(conn, 'student', 'ix_student_letter_status', 'letter_status', 'letter_status_at')
+
+
+@migration(3, 'Add student.updated_at for incremental API sync')
+def add_updated_at(conn):
+    add_column(conn, 'student', Column('updated_at', DateTime))
+    conn.execute(text('UPDATE student SET updated_at = COALESCE(review_date, application_date) '
+                      'WHERE updated_at IS NULL'))
+    create_index(conn, 'student', 'ix_student_updated_at_id', 'updated_at', 'id')
+
+
+@migration(4, 'Typed cgpa_score and birth_date columns for merit ranking and age filters')
+def add_typed_grades(conn):
+    add_column(conn, 'student', Column('cgpa_score', Float))
+    add_column(conn, 'student', Column('birth_date', Date))
+
+    # Parsing free-form input needs Python, so walk the table in id order, one batch per UPDATE
+    student = Table('student', MetaData(), autoload_with=conn)
+    update = (student.update().where(student.c.id == bindparam('row_id'))
+              .values(cgpa_score=bindparam('score'), birth_date=bindparam('born')))
+    last_id = 0
+    while True:
+        rows = conn.execute(select(student.c.id, student.c.cgpa, student.c.date_of_birth)
+                            .where(student.c.id > last_id)
+                            .order_by(student.c.id).limit(BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            break
+        conn.execute(update, [{'row_id': row.id, 'score': grades.parse_cgpa(row.cgpa),
+                               'born': grades.parse_birth_date(row.date_of_birth)} for row in rows])
+        last_id = rows[-1].id
+
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_student_course_cgpa '
+                      'ON student (course_applied, cgpa_score DESC, application_date, id)'))
+    create_index(conn, 'student', 'ix_student_birth_date', 'birth_date')
+
+
+@migration(5, 'Materialized application counts for the dashboard and /api/stats')
+def add_application_stats(conn):
+    stat = Table(
+        'application_stat', MetaData(),
+        Column('day', String(10), primary_key=True),
+        Column('course', String(100), primary_key=True),
+        Column('status', String(20), primary_key=True),
+        Column('count', Integer, nullable=False, default=0),
+    )
+    stat.create(conn, checkfirst=True)
+    stats.reconcile(conn, Table('student', MetaData(), autoload_with=conn), stat)
+
+
+@migration(6, 'Full-text search index over applications')
+def add_search_index(conn):
+    trigram = Table(
+        'student_trigram', MetaData(),
+        Column('trigram', String(3), primary_key=True),
+        Column('student_id', Integer, primary_key=True, index=True),
+    )
+    trigram.create(conn, checkfirst=True)
+    if conn.dialect.name == 'sqlite' and search.fts_available(conn):
+        search.create_fts(conn)
+    else:
+        search.rebuild_trigrams(conn, Table('student', MetaData(), autoload_with=conn), trigram)
+
+
+@migration(7, 'Blocking keys and groups for duplicate application detection')
+def add_duplicate_keys(conn):
+    add_column(conn, 'student', Column('duplicate_group', Integer))
+    create_index(conn, 'student', 'ix_student_duplicate_group', 'duplicate_group')
+    key = Table(
+        'duplicate_key', MetaData(),
+        Column('kind', String(10), primary_key=True),
+        Column('value', String(255), primary_key=True),
+        Column('student_id', Integer, primary_key=True, index=True),
+    )
+    key.create(conn, checkfirst=True)
+    student = Table('student', MetaData(), autoload_with=conn)
+    dedup.rebuild_keys(conn, student, key)
+    dedup.cluster(conn, student, key)
+
+
+@migration(8, 'Upload checks, page counts and previews on stored_file')
+def add_document_checks(conn):
+    if 'stored_file' not in inspect(conn).get_table_names():
+        return  # create_all() builds it with the new columns
+    add_column(conn, 'stored_file', Column('check_status', String(20)))
+    add_column(conn, 'stored_file', Column('check_status_at', DateTime))
+    add_column(conn, 'stored_file', Column('detected_type', String(10)))
+    add_column(conn, 'stored_file', Column('page_count', Integer))
+    add_column(conn, 'stored_file', Column('thumbnail_path', String(200)))
+    add_column(conn, 'stored_file', Column('display_path', String(200)))
+    create_index(conn, 'stored_file', 'ix_stored_file_check_status', 'check_status', 'check_status_at')
+    # Existing uploads are checked by the document workers like new ones
+    conn.execute(text("UPDATE stored_file SET check_status = 'queued', check_status_at = :now "
+                      "WHERE check_status IS NULL"), {'now': datetime.utcnow()})
+
+
+@migration(9, 'Index of applications moved to the per-cycle archives')
+def add_archived_applications(conn):
+    Table(
+        'archived_application', MetaData(),
+        Column('application_id', String(20), primary_key=True),
+        Column('cycle', String(10), nullable=False),
+        Column('archived_at', DateTime),
+    ).create(conn, checkfirst=True)
+
+
+@migration(10, 'Record which student fields each admission letter was rendered from')
+def add_letter_key(conn):
+    add_column(conn, 'student', Column('letter_key', String(64)))
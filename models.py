@@ -0,0 +1,133 @@
+"""Database models, and the queues and indexes that follow their changes.
+
+Importing this module declares the tables and attaches the session
+listeners; it does not touch the database or the filesystem.
+"""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
+
+import grades
+from dedup import DuplicateIndex
+from document_queue import DocumentQueue
+from letter_queue import LetterQueue
+from search import SearchIndex
+from stats import ApplicationStats
+
+db = SQLAlchemy()
+
+
+class Student(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.String(20), unique=True, nullable=False)
+    first_name = db.Column(db.String(100), nullable=False)
+    last_name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    address = db.Column(db.Text, nullable=False)
+    date_of_birth = db.Column(db.String(20), nullable=False)
+    course_applied = db.Column(db.String(100), nullable=False)
+    previous_qualification = db.Column(db.String(200), nullable=False)
+    cgpa = db.Column(db.String(10), nullable=False)
+    cgpa_score = db.Column(db.Float)  # cgpa normalized to the 10-point scale, see grades.py
+    birth_date = db.Column(db.Date)  # date_of_birth parsed
+    status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
+    degree_certificate = db.Column(db.String(200))
+    id_proof = db.Column(db.String(200))
+    application_date = db.Column(db.DateTime, default=datetime.utcnow)
+    review_date = db.Column(db.DateTime)
+    admin_comments = db.Column(db.Text)
+    admission_letter_path = db.Column(db.String(200))
+    letter_status = db.Column(db.String(20))  # queued, rendering, ready, failed
+    letter_status_at = db.Column(db.DateTime)
+    letter_key = db.Column(db.String(64))  # letters.letter_key() of the fields the letter file was rendered from
+    duplicate_group = db.Column(db.Integer)  # lowest id among possible duplicates, see dedup.py
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Keep in sync with migrations.py so existing databases get the same indexes
+    __table_args__ = (
+        db.Index('ix_student_application_date_id', 'application_date', 'id'),
+        db.Index('ix_student_status_date', 'status', 'application_date', 'id'),
+        db.Index('ix_student_course_status', 'course_applied', 'status'),
+        db.Index('ix_student_email', 'email'),
+        db.Index('ix_student_letter_status', 'letter_status', 'letter_status_at'),
+        db.Index('ix_student_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_student_birth_date', 'birth_date'),
+        db.Index('ix_student_duplicate_group', 'duplicate_group'),
+    )
+
+    @validates('cgpa', 'date_of_birth')
+    def normalize(self, key, value):
+        """Keep the typed cgpa_score and birth_date columns in step with the raw form values"""
+        if key == 'cgpa':
+            self.cgpa_score = grades.parse_cgpa(value)
+        else:
+            self.birth_date = grades.parse_birth_date(value)
+        return value
+
+# Merit order within a course: best score first, then earliest application
+db.Index('ix_student_course_cgpa', Student.course_applied, Student.cgpa_score.desc(),
+         Student.application_date, Student.id)
+
+class Admin(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(120), nullable=False)
+
+class StoredFile(db.Model):
+    """A content-addressed upload, shared by every student column that references it"""
+    path = db.Column(db.String(200), primary_key=True)  # relative to UPLOAD_FOLDER
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set by the document workers, see document_queue.py and previews.py
+    check_status = db.Column(db.String(20))
+    check_status_at = db.Column(db.DateTime)
+    detected_type = db.Column(db.String(10))  # pdf, png or jpeg, from the file's first bytes
+    page_count = db.Column(db.Integer)
+    thumbnail_path = db.Column(db.String(200))  # relative to UPLOAD_FOLDER, like path
+    display_path = db.Column(db.String(200))  # smaller copy of an oversized image
+
+db.Index('ix_stored_file_check_status', StoredFile.check_status, StoredFile.check_status_at)
+
+class ApplicationStat(db.Model):
+    """One materialized count of applications, see stats.py"""
+    day = db.Column(db.String(10), primary_key=True)  # YYYY-MM-DD, or '' for all days
+    course = db.Column(db.String(100), primary_key=True)  # or '' for all courses
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class StudentTrigram(db.Model):
+    """Search index rows for backends without SQLite FTS5, see search.py"""
+    trigram = db.Column(db.String(3), primary_key=True)
+    student_id = db.Column(db.Integer, primary_key=True, index=True)
+
+class DuplicateKey(db.Model):
+    """A normalized email, phone or name and birth date of an application, see dedup.py"""
+    kind = db.Column(db.String(10), primary_key=True)
+    value = db.Column(db.String(255), primary_key=True)
+    student_id = db.Column(db.Integer, primary_key=True, index=True)
+
+class ArchivedApplication(db.Model):
+    """Where an application moved out of the student table went, see archive.py"""
+    application_id = db.Column(db.String(20), primary_key=True)
+    cycle = db.Column(db.String(10), nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+letter_queue = LetterQueue(db=db, model=Student)
+document_queue = DocumentQueue(db=db, model=StoredFile)
+application_stats = ApplicationStats(db=db, model=Student, stat_model=ApplicationStat)
+search_index = SearchIndex(db=db, model=Student, trigram_model=StudentTrigram)
+duplicate_index = DuplicateIndex(db=db, model=Student, key_model=DuplicateKey)
+
+# Courses open for application, as (value, label) pairs
+COURSE_CHOICES = [
+    ('computer_science', 'Computer Science'),
+    ('mechanical_engineering', 'Mechanical Engineering'),
+    ('electrical_engineering', 'Electrical Engineering'),
+    ('civil_engineering', 'Civil Engineering'),
+    ('business_administration', 'Business Administration'),
+    ('data_science', 'Data Science')
+]
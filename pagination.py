@@ -0,0 +1,79 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(values):
+    """Encode the sort key of a row as an opaque URL-safe cursor"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    """Decode a cursor produced by encode_cursor, returning None if it is malformed"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            return None
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(payload, types)
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(query, columns, per_page, after=None, before=None):
+    """Fetch one page of query ordered descending by columns using keyset pagination.
+
+    `after` continues past the given sort key (next page), `before` walks back
+    towards the start (previous page). Only per_page + 1 rows are ever read, so
+    the cost of a page does not depend on how deep into the table it is.
+    """
+    key = tuple_(*columns)
+    if before is not None:
+        rows = (query.filter(key > tuple_(*before))
+                .order_by(*[c.asc() for c in columns])
+                .limit(per_page + 1).all())
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        next_cursor = _row_cursor(rows[-1], columns) if rows else None
+        prev_cursor = _row_cursor(rows[0], columns) if rows and has_more else None
+        return Page(rows, next_cursor, prev_cursor)
+
+    if after is not None:
+        query = query.filter(key < tuple_(*after))
+    rows = query.order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = _row_cursor(rows[-1], columns) if rows and has_more else None
+    prev_cursor = _row_cursor(rows[0], columns) if rows and after is not None else None
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def _row_cursor(row, columns):
+    return encode_cursor([getattr(row, c.key) for c in columns])
+
+
+def keyset_rows(session, statement, columns, per_page, after=None):
+    """Fetch one page of a Core select ordered ascending by columns, starting after the given sort key.
+
+    Used for API sync where clients walk forward through rows as they change;
+    the returned next_cursor is None once the end has been reached.
+    """
+    if after is not None:
+        statement = statement.filter(tuple_(*columns) > tuple_(*after))
+    rows = session.execute(statement.order_by(*columns).limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = _row_cursor(rows[-1], columns) if rows and has_more else None
+    return Page(rows, next_cursor, None)
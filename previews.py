@@ -0,0 +1,167 @@
+"""Checks and previews of uploaded documents, run on the document worker pool.
+
+For each stored upload, process() works out what the file really is from
+its first bytes and compares that with its extension. It then reads the
+page count and writes two derived files next to the upload:
+
+    previews/ab/cd/<sha256>_thumb.jpg      first page, at most THUMBNAIL_PX square
+    previews/ab/cd/<sha256>_display.jpg    a smaller copy of an oversized image
+
+Images are handled with Pillow, imported on first use so the web app that
+queues the checks never loads it. PDF pages are counted by reading the page
+tree. A PDF thumbnail needs pdftoppm (poppler-utils) on the PATH; without it
+PDFs only get their page count. Uploads themselves are never changed; they
+are the documents the applicant submitted.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zlib
+
+THUMBNAIL_PX = 320
+IMAGE_MAX_BYTES = 1024 * 1024
+IMAGE_MAX_PX = 2000
+JPEG_QUALITY = 85
+PDFTOPPM_TIMEOUT = 30  # seconds
+
+# Results stored on StoredFile.check_status
+READY = 'ready'
+MISMATCH = 'mismatch'  # the content is not what the extension says, or is unreadable
+
+SIGNATURES = (
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+)
+EXTENSION_TYPES = {'.pdf': 'pdf', '.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+
+_PAGES_COUNT = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b')
+_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_OBJECT_STREAM = re.compile(rb'<<((?:(?!<<).){0,1000}?/Type\s*/ObjStm(?:(?!<<).){0,1000}?)>>\s*stream\r?\n', re.S)
+
+
+def sniff(head):
+    """File type from its first bytes, or None. PDF readers accept %PDF- anywhere in the first 1024 bytes."""
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature) or (kind == 'pdf' and signature in head[:1024]):
+            return kind
+    return None
+
+
+def derived_path(relative, suffix):
+    stem = os.path.splitext(os.path.basename(relative))[0]
+    return os.path.join('previews', os.path.dirname(relative), f'{stem}_{suffix}.jpg')
+
+
+def pdf_page_count(data):
+    """Pages in a PDF from its page tree, looking inside compressed object streams too; None if unknown"""
+    sources = [data]
+    for match in _OBJECT_STREAM.finditer(data):
+        if b'/FlateDecode' in match.group(1):
+            end = data.find(b'endstream', match.end())
+            try:
+                sources.append(zlib.decompressobj().decompress(data[match.end():end]))
+            except zlib.error:
+                pass
+    # The root of the page tree counts every page; an incremental update may repeat it
+    counts = [int(a or b) for source in sources for a, b in _PAGES_COUNT.findall(source)]
+    if counts:
+        return max(counts)
+    return sum(len(_PAGE.findall(source)) for source in sources) or None
+
+
+def pdf_thumbnail(path, target, size):
+    """Render the first page with pdftoppm; False when it is not installed or fails"""
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm is None:
+        return False
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'page')
+        try:
+            subprocess.run([pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-jpeg', '-scale-to', str(size),
+                            path, out], check=True, capture_output=True, timeout=PDFTOPPM_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            return False
+        shutil.move(out + '.jpg', target)
+    return True
+
+
+def _save_jpeg(image, target, quality=JPEG_QUALITY):
+    from PIL import Image
+
+    if image.mode not in ('RGB', 'L'):
+        # Scans with transparency are shown on white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    image.save(target, 'JPEG', quality=quality, optimize=True)
+
+
+def process(root, relative, thumbnail_px=THUMBNAIL_PX, image_max_bytes=IMAGE_MAX_BYTES, image_max_px=IMAGE_MAX_PX):
+    """Check one upload and write its previews; returns the values to store on its StoredFile row"""
+    path = os.path.join(root, relative)
+    with open(path, 'rb') as f:
+        detected = sniff(f.read(1024))
+    result = {'check_status': MISMATCH, 'detected_type': detected, 'page_count': None,
+              'thumbnail_path': None, 'display_path': None}
+    if detected is None or detected != EXTENSION_TYPES.get(os.path.splitext(relative)[1].lower()):
+        return result
+
+    thumbnail = derived_path(relative, 'thumb')
+    if detected == 'pdf':
+        with open(path, 'rb') as f:
+            result['page_count'] = pdf_page_count(f.read())
+        os.makedirs(os.path.join(root, os.path.dirname(thumbnail)), exist_ok=True)
+        if pdf_thumbnail(path, os.path.join(root, thumbnail), thumbnail_px):
+            result['thumbnail_path'] = thumbnail
+        result['check_status'] = READY
+        return result
+
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(path) as image:
+            image.load()
+            image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return result
+    result['page_count'] = 1
+    preview = image.copy()
+    preview.thumbnail((thumbnail_px, thumbnail_px))
+    _save_jpeg(preview, os.path.join(root, thumbnail))
+    result['thumbnail_path'] = thumbnail
+
+    if os.path.getsize(path) > image_max_bytes or max(image.size) > image_max_px:
+        display = derived_path(relative, 'display')
+        image.thumbnail((image_max_px, image_max_px))
+        _save_jpeg(image, os.path.join(root, display))
+        # Keep the copy only if it is actually smaller
+        if os.path.getsize(os.path.join(root, display)) < os.path.getsize(path):
+            result['display_path'] = display
+        else:
+            os.unlink(os.path.join(root, display))
+    result['check_status'] = READY
+    return result
+
+
+def process_batch(root, relatives, settings):
+    """Process uploads in a worker; returns (values, error) per upload"""
+    results = []
+    for relative in relatives:
+        try:
+            results.append((process(root, relative, **settings), None))
+        except Exception as exc:
+            results.append((None, repr(exc)))
+    return results
+
+
+def delete_derived(root, relative):
+    """Remove the previews of an upload that is being deleted"""
+    for suffix in ('thumb', 'display'):
+        try:
+            os.unlink(os.path.join(root, derived_path(relative, suffix)))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,109 @@
+"""Pages for applicants: the application form, status checks and letter downloads."""
+from flask import Blueprint, current_app, flash, make_response, redirect, render_template, request, url_for
+
+import documents
+from applications import current_letter, generate_application_id, lookup_status, save_file
+from letter_queue import FAILED, PENDING_STATES
+from models import Student, db, document_queue, duplicate_index, letter_queue
+
+public = Blueprint('public', __name__)
+
+@public.route('/')
+def index():
+    return render_template('index.html')
+
+@public.route('/apply', methods=['GET', 'POST'])
+def apply():
+    from forms import ApplicationForm
+    form = ApplicationForm()
+    if form.validate_on_submit():
+        # Create new student application
+        student = Student(
+            application_id=generate_application_id(),
+            first_name=form.first_name.data,
+            last_name=form.last_name.data,
+            email=form.email.data,
+            phone=form.phone.data,
+            address=form.address.data,
+            date_of_birth=form.date_of_birth.data,
+            course_applied=form.course_applied.data,
+            previous_qualification=form.previous_qualification.data,
+            cgpa=form.cgpa.data
+        )
+        # Refuse a repeat of an application still under review, before storing its uploads
+        if duplicate_index.pending_matches([student], current_app.config['DUPLICATE_BLOCK_KEYS']):
+            flash('An application for this course with these details is already under review. '
+                  'Check its status with the Application ID you were given.', 'error')
+            return render_template('apply.html', form=form), 409
+
+        # Save uploaded files
+        student.degree_certificate = save_file(form.degree_certificate.data, current_app.config['UPLOAD_FOLDER'])
+        student.id_proof = save_file(form.id_proof.data, current_app.config['UPLOAD_FOLDER'])
+        
+        db.session.add(student)
+        db.session.commit()
+        document_queue.notify()
+        
+        flash(f'Application submitted successfully! Your Application ID is: {student.application_id}', 'success')
+        return redirect(url_for('public.application_status'))
+    
+    return render_template('apply.html', form=form)
+
+@public.route('/status')
+def application_status():
+    return render_template('status.html')
+
+@public.route('/check_status', methods=['POST'])
+def check_status():
+    application_id = request.form.get('application_id')
+    student = lookup_status(application_id)
+    
+    if student:
+        return render_template('status_result.html', student=student)
+    else:
+        flash('Application ID not found!', 'error')
+        return redirect(url_for('public.application_status'))
+
+@public.route('/download_letter/<application_id>')
+def download_letter(application_id):
+    student = lookup_status(application_id)
+    
+    if not student or student.status != 'approved':
+        flash('Admission letter not available!', 'error')
+        return redirect(url_for('public.application_status'))
+    
+    if student.letter_status in PENDING_STATES:
+        return letter_pending(student)
+    
+    download_name = f"admission_letter_{application_id}.pdf"
+    if student.archive_cycle:
+        # Applications of past cycles keep their letter in the cycle's archive
+        response = None
+        if student.letter_status != FAILED:
+            response = documents.send_archived(student.archive_cycle, student.archive_pack, 'letters',
+                                               student.admission_letter_path, download_name, as_attachment=True)
+        if response is not None:
+            return response
+    else:
+        # Missing or stale letters are rendered again here; behind a proxy it sends the file
+        offload = bool(current_app.config['DOCUMENT_OFFLOAD'])
+        try:
+            letter = current_letter(application_id, in_memory=not offload)
+        except TimeoutError:
+            return letter_pending(student)
+        if letter is not None and offload:
+            return documents.send('letters', letter, download_name, as_attachment=True)
+        if letter is not None:
+            return documents.send_bytes(letter.data, download_name, letter.etag, letter.last_modified,
+                                        as_attachment=True)
+    
+    flash('Admission letter not found!', 'error')
+    return redirect(url_for('public.application_status'))
+
+def letter_pending(student):
+    """202 asking the applicant to come back once their letter is rendered"""
+    letter_queue.notify()
+    flash('Your admission letter is still being generated. Please try again in a few moments.', 'info')
+    response = make_response(render_template('status_result.html', student=student), 202)
+    response.headers['Retry-After'] = str(int(current_app.config['LETTER_POLL_INTERVAL']) + 1)
+    return response
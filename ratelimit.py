@@ -0,0 +1,285 @@
+"""Rate limiting and admission control for the public endpoints.
+
+Two checks run before the view of a limited endpoint:
+
+1. In-flight limits. At most INFLIGHT_LIMITS[endpoint] requests to an
+   endpoint run at once in a process. The next one is shed with 503 and
+   Retry-After: RATE_LIMIT_BUSY_RETRY_AFTER instead of waiting for a worker.
+   A shed request takes no tokens, so retrying after a 503 costs nothing.
+2. Token buckets. Each endpoint in RATE_LIMITS = {endpoint: (burst, seconds)}
+   gets one bucket per client IP, holding up to burst tokens and refilling
+   at burst tokens per seconds. A request takes a token; with none left it
+   is answered 429, with Retry-After set to when the next token arrives.
+   RATE_LIMITS_TOTAL adds one bucket per endpoint shared by all clients.
+   Only requests that got past their own bucket draw from it, so a single
+   noisy client cannot use up everyone's allowance, and a request the
+   shared bucket turns away gets its client's token back. Leave it out where
+   being locked out hurts more than the load, as for the admin login.
+
+Only RATE_LIMIT_METHODS (POST) are limited, so the forms always load.
+Buckets are kept in a store, like the status cache's backends in cache.py:
+'memory' keeps them in this process, 'sqlite' keeps them in a local SQLite
+file (RATE_LIMIT_PATH) that all worker processes on the host share. In-flight
+counts are always per process, since they protect the process's own
+workers. If the store fails, requests are let through.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter as _Tally
+from collections import OrderedDict
+
+from flask import current_app, request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+_ENVIRON_KEY = 'ratelimit.inflight'
+# Requests from all clients share this bucket of an endpoint
+ALL_CLIENTS = '*'
+PRUNE_INTERVAL = 1000  # takes between sweeps of the SQLite store for buckets that are full again
+
+DEFAULTS = {
+    'RATE_LIMIT_ENABLED': True,
+    'RATE_LIMIT_BACKEND': 'memory',
+    'RATE_LIMIT_PATH': os.path.join('instance', 'rate_limits.db'),
+    'RATE_LIMIT_MAX_KEYS': 100000,
+    'RATE_LIMIT_METHODS': ('POST',),
+    'RATE_LIMIT_PROXY_HOPS': 0,
+    'RATE_LIMIT_BUSY_RETRY_AFTER': 2,
+    'RATE_LIMITS': {},
+    'RATE_LIMITS_TOTAL': {},
+    'INFLIGHT_LIMITS': {},
+}
+
+
+def take_token(tokens, updated, now, burst, rate):
+    """Refill a bucket up to now and take a token: (tokens left, seconds until one is available, 0 if taken)"""
+    tokens = min(burst, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryStore:
+    """Buckets in this process; beyond max_size the least recently used is dropped and starts full again"""
+
+    def __init__(self, max_size=100000, clock=time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, rate):
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens, wait = take_token(tokens, updated, now, burst, rate)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def give_back(self, key, burst, rate):
+        """Return a token taken from a bucket"""
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:
+                self._buckets[key] = (min(burst, entry[0] + 1), entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteStore:
+    """Buckets shared by all processes on the host through a local SQLite file, opened on first use.
+
+    Each take is one IMMEDIATE transaction, so processes drawing from the
+    same bucket see each other's tokens. Buckets that have refilled
+    completely are the same as missing ones and are swept out now and then.
+    """
+
+    def __init__(self, path, max_size=100000, clock=time.time):
+        self.path = path
+        self.max_size = max_size
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket ('
+                         'key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                         'updated REAL NOT NULL, full_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)')
+            self._local.conn = conn
+            self._local.takes = 0
+        return conn
+
+    def take(self, key, burst, rate):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = self.clock()
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, wait = take_token(*(row or (burst, now)), now, burst, rate)
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                         (key, tokens, now, now + (burst - tokens) / rate))
+            self._local.takes += 1
+            if self._local.takes % PRUNE_INTERVAL == 0 or self._local.takes == 1:
+                self._prune(conn, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def give_back(self, key, burst, rate):
+        """Return a token taken from a bucket"""
+        self._connect().execute('UPDATE bucket SET tokens = MIN(?, tokens + 1), '
+                                'full_at = updated + (? - MIN(?, tokens + 1)) / ? WHERE key = ?',
+                                (burst, burst, burst, rate, key))
+
+    def _prune(self, conn, now):
+        conn.execute('DELETE FROM bucket WHERE full_at < ?', (now,))
+        excess = conn.execute('SELECT COUNT(*) FROM bucket').fetchone()[0] - self.max_size
+        if excess > 0:
+            conn.execute('DELETE FROM bucket WHERE key IN '
+                         '(SELECT key FROM bucket ORDER BY updated LIMIT ?)', (excess,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM bucket')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM bucket').fetchone()[0]
+
+
+def create_store(backend='memory', max_size=100000, path=None):
+    """Build a bucket store from configuration values"""
+    if backend == 'memory':
+        return MemoryStore(max_size)
+    if backend == 'sqlite':
+        return SQLiteStore(path, max_size)
+    raise ValueError(f'Unknown rate limit backend: {backend}')
+
+
+def client_address(hops=0):
+    """The client's IP: the remote address, or behind hops trusted proxies the address they forwarded"""
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or 'unknown'
+
+
+class RateLimiter:
+    """Flask extension applying the token buckets and in-flight limits described above"""
+
+    def __init__(self, registry=None, app=None):
+        self.requests = Counter('rate_limit_requests_total',
+                                'Requests to limited endpoints by outcome: allowed, limited (429) or shed (503).',
+                                ('endpoint', 'outcome'))
+        self.inflight = Gauge('rate_limit_inflight', 'Requests running per endpoint with an in-flight limit.',
+                              ('endpoint',))
+        if registry is not None:
+            registry.register(self.requests)
+            registry.register(self.inflight)
+        self._stores = {}
+        self._running = _Tally()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in DEFAULTS.items():
+            app.config.setdefault(key, value)
+        app.extensions['rate_limiter'] = self
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def store(self):
+        """The bucket store configured for the current app, built on first use"""
+        config = current_app.config
+        backend = config['RATE_LIMIT_BACKEND']
+        path = config['RATE_LIMIT_PATH'] if backend == 'sqlite' else None
+        with self._lock:
+            store = self._stores.get((backend, path))
+            if store is None:
+                store = self._stores[backend, path] = create_store(backend, config['RATE_LIMIT_MAX_KEYS'], path)
+        return store
+
+    def reset(self):
+        """Refill every bucket, e.g. between tests"""
+        for store in list(self._stores.values()):
+            store.clear()
+
+    def _take(self, endpoint, client, limit):
+        burst, seconds = limit
+        try:
+            return self.store().take(f'{endpoint}|{client}', burst, burst / seconds)
+        except sqlite3.Error:
+            logger.exception('Rate limit store failed; letting the request through')
+            return 0.0
+
+    def _give_back(self, endpoint, client, limit):
+        burst, seconds = limit
+        try:
+            self.store().give_back(f'{endpoint}|{client}', burst, burst / seconds)
+        except sqlite3.Error:
+            logger.exception('Rate limit store failed; the token was not given back')
+
+    def _before_request(self):
+        config = current_app.config
+        endpoint = request.endpoint
+        if not config['RATE_LIMIT_ENABLED'] or request.method not in config['RATE_LIMIT_METHODS']:
+            return
+        per_client = config['RATE_LIMITS'].get(endpoint)
+        total = config['RATE_LIMITS_TOTAL'].get(endpoint)
+        capacity = config['INFLIGHT_LIMITS'].get(endpoint)
+        if per_client is None and total is None and capacity is None:
+            return
+
+        if capacity is not None:
+            with self._lock:
+                if self._running[endpoint] >= capacity:
+                    self.requests.inc(endpoint, 'shed')
+                    raise ServiceUnavailable(retry_after=config['RATE_LIMIT_BUSY_RETRY_AFTER'])
+                self._running[endpoint] += 1
+            # Released by _teardown_request, which also runs after a 429 below
+            request.environ[_ENVIRON_KEY] = endpoint
+            self.inflight.inc(endpoint)
+
+        taken = []
+        for client, limit in ((client_address(config['RATE_LIMIT_PROXY_HOPS']), per_client), (ALL_CLIENTS, total)):
+            if not limit:
+                continue
+            wait = self._take(endpoint, client, limit)
+            if wait:
+                # Turned away by the shared bucket: the request cost the client nothing
+                for earlier, earlier_limit in taken:
+                    self._give_back(endpoint, earlier, earlier_limit)
+                self.requests.inc(endpoint, 'limited')
+                raise TooManyRequests(retry_after=max(1, math.ceil(wait)))
+            taken.append((client, limit))
+        self.requests.inc(endpoint, 'allowed')
+
+    def _teardown_request(self, exc):
+        endpoint = request.environ.pop(_ENVIRON_KEY, None)
+        if endpoint is not None:
+            with self._lock:
+                self._running[endpoint] -= 1
+            self.inflight.dec(endpoint)
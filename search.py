@@ -0,0 +1,239 @@
+"""Full-text search over applications for the admin console and API.
+
+On SQLite the student table is mirrored into an FTS5 index (student_search)
+kept in sync by triggers, so every write path, ORM or raw SQL, updates it in
+the same transaction. The last word of a query matches as a prefix, the
+others as whole words. Results are ranked with bm25, weighting identifiers
+and contact details above names and names above the qualification text.
+
+Other backends (and SQLite builds without FTS5) use a trigram table instead:
+each searchable word is split into overlapping three-letter grams and an
+application matches when it shares enough of the query's grams, which also
+tolerates typos. Rows are ranked by how many grams they share. The trigram
+table is maintained from the ORM session; rebuild() refills it after writes
+that bypass the ORM.
+
+Both return (id, score) pages ordered by score, lower scores first, then by
+newest application, so results page with keyset cursors like the rest of the
+API.
+"""
+import math
+import re
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, column, event, func, inspect, literal, literal_column, or_, select, table
+
+from pagination import Page, encode_cursor
+
+# Searchable Student columns and their bm25 weights
+FIELDS = ('application_id', 'first_name', 'last_name', 'email', 'phone', 'previous_qualification')
+WEIGHTS = (10.0, 5.0, 5.0, 8.0, 8.0, 1.0)
+FTS_TABLE = 'student_search'
+REBUILD_BATCH_SIZE = 5000
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+
+def words(value):
+    """Lowercased words of a search query or field value"""
+    return _WORD.findall((value or '').lower())
+
+
+def fts_query(query):
+    """FTS5 MATCH expression requiring every word of query, the last one (still being typed) as a prefix.
+
+    Only the last word is a prefix because a prefix term has to merge the
+    postings of every word it covers, while whole words are looked up directly.
+    """
+    terms = [f'"{word}"' for word in words(query)]
+    if terms and len(words(query)[-1]) > 1:  # a one-letter prefix would cover a large part of the index
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def trigrams(value):
+    """Three-letter grams of every word, padded so short words and word starts still produce grams"""
+    grams = set()
+    for word in words(value):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def row_trigrams(row):
+    grams = set()
+    for name in FIELDS:
+        grams |= trigrams(getattr(row, name))
+    return grams
+
+
+def fts_available(conn):
+    return bool(conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def create_fts(conn, rebuild=True):
+    """Create the FTS5 index and its sync triggers on SQLite, filling it from existing rows if rebuild"""
+    columns = ', '.join(FIELDS)
+    new = ', '.join(f'new.{name}' for name in FIELDS)
+    old = ', '.join(f'old.{name}' for name in FIELDS)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, content='student', "
+        f"content_rowid='id', prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({', '.join(map(str, WEIGHTS))})')",
+        f"CREATE TRIGGER IF NOT EXISTS student_search_insert AFTER INSERT ON student BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS student_search_delete AFTER DELETE ON student BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS student_search_update AFTER UPDATE OF {columns} ON student BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new}); END",
+    ]
+    if rebuild:
+        statements.append(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+
+def drop_fts(conn):
+    for trigger in ('student_search_insert', 'student_search_delete', 'student_search_update'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def rebuild_trigrams(conn, student, trigram):
+    """Refill the trigram table from the student table, one id range at a time"""
+    conn.execute(trigram.delete())
+    last_id = 0
+    while True:
+        rows = conn.execute(select(student.c.id, *[student.c[name] for name in FIELDS])
+                            .where(student.c.id > last_id).order_by(student.c.id)
+                            .limit(REBUILD_BATCH_SIZE)).all()
+        if not rows:
+            break
+        conn.execute(trigram.insert(), [{'trigram': gram, 'student_id': row.id}
+                                        for row in rows for gram in row_trigrams(row)])
+        last_id = rows[-1].id
+
+
+class SearchIndex:
+    """Ranked, paginated application search on FTS5, or on the trigram table where FTS5 is unavailable"""
+
+    def __init__(self, db=None, model=None, trigram_model=None):
+        self.db = db
+        self.model = model
+        self.trigram = trigram_model.__table__
+        self._fts = {}
+        event.listen(model.__table__, 'after_create', self._after_create)
+        event.listen(db.session, 'after_flush', self._after_flush)
+
+    def _after_create(self, target, connection, **kw):
+        # A new student table starts empty, so any index left from an old one is stale
+        if connection.dialect.name == 'sqlite' and fts_available(connection):
+            drop_fts(connection)
+            create_fts(connection, rebuild=False)
+
+    def backend(self, conn=None):
+        """'fts5' or 'trigram', from SEARCH_BACKEND ('auto' picks FTS5 on SQLite builds that have it)"""
+        configured = current_app.config['SEARCH_BACKEND']
+        if configured != 'auto':
+            return configured
+        conn = conn or self.db.session.connection()
+        if conn.engine.url not in self._fts:
+            self._fts[conn.engine.url] = conn.dialect.name == 'sqlite' and fts_available(conn)
+        return 'fts5' if self._fts[conn.engine.url] else 'trigram'
+
+    def _after_flush(self, session, flush_context):
+        conn = session.connection()
+        if self.backend(conn) != 'trigram':
+            return
+        stale, fresh = [], []
+        for obj in session.new:
+            if isinstance(obj, self.model):
+                fresh.append(obj)
+        for obj in session.dirty:
+            if isinstance(obj, self.model):
+                state = inspect(obj)
+                if any(state.attrs[name].history.has_changes() for name in FIELDS):
+                    stale.append(obj.id)
+                    fresh.append(obj)
+        for obj in session.deleted:
+            if isinstance(obj, self.model):
+                stale.append(obj.id)
+        if stale:
+            conn.execute(self.trigram.delete().where(self.trigram.c.student_id.in_(stale)))
+        self._insert(conn, fresh)
+
+    def _insert(self, conn, rows):
+        grams = [{'trigram': gram, 'student_id': row.id} for row in rows for gram in row_trigrams(row)]
+        if grams:
+            conn.execute(self.trigram.insert(), grams)
+
+    def add(self, rows):
+        """Index applications inserted without the ORM session; FTS5 has already indexed them in its triggers"""
+        conn = self.db.session.connection()
+        if self.backend(conn) == 'trigram':
+            self._insert(conn, rows)
+
+    def _matches(self, query):
+        """(select of id, score for applications matching query, whether it is ranked), or None without words"""
+        Student = self.model
+        config = current_app.config
+        if self.backend() == 'fts5':
+            match = fts_query(query)
+            if not match:
+                return None
+            matched = literal_column(FTS_TABLE).op('MATCH')(bindparam('match', match))
+            # bm25 has to score every match before the best can be picked, so a
+            # query matching most of the table is listed newest first instead,
+            # which FTS5 streams straight from its index
+            probe = select(_fts.c.rowid).where(matched).limit(config['SEARCH_RANK_LIMIT'] + 1).subquery()
+            ranked = self.db.session.execute(select(func.count()).select_from(probe)).scalar() \
+                <= config['SEARCH_RANK_LIMIT']
+            score = _fts.c.rank if ranked else literal(0.0)
+            return (select(_fts.c.rowid.label('id'), score.label('score'))
+                    .select_from(_fts).join(Student, Student.id == _fts.c.rowid).where(matched)), ranked
+        grams = trigrams(query)
+        if not grams:
+            return None
+        need = max(1, math.ceil(len(grams) * config['SEARCH_MIN_SIMILARITY']))
+        hits = func.count(self.trigram.c.trigram)
+        return (select(Student.id.label('id'), (-hits).label('score'))
+                .select_from(self.trigram).join(Student, Student.id == self.trigram.c.student_id)
+                .where(self.trigram.c.trigram.in_(sorted(grams)))
+                .group_by(Student.id).having(hits >= need)), True
+
+    def search(self, query, limit, after=None, where=None):
+        """One page of (id, score) rows matching query, best first and newest first among equals.
+
+        where(select) may add filters on Student columns. after is the
+        (score, id) key decoded from the previous page's next_cursor.
+        """
+        matches = self._matches(query)
+        if matches is None:
+            return Page([], None, None)
+        statement, ranked = matches
+        if where is not None:
+            statement = where(statement)
+        matched = statement.subquery()
+        statement = select(matched.c.id, matched.c.score)
+        if after is not None:
+            score, last_id = after
+            if ranked:
+                statement = statement.where(or_(matched.c.score > score,
+                                                and_(matched.c.score == score, matched.c.id < last_id)))
+            else:
+                statement = statement.where(matched.c.id < last_id)
+        order = [matched.c.score, matched.c.id.desc()] if ranked else [matched.c.id.desc()]
+        rows = self.db.session.execute(statement.order_by(*order).limit(limit + 1)).all()
+        next_cursor = encode_cursor([rows[limit - 1].score, rows[limit - 1].id]) if len(rows) > limit else None
+        return Page(rows[:limit], next_cursor, None)
+
+    def rebuild(self):
+        """Rebuild the index from the student table, e.g. after rows were loaded with raw SQL"""
+        conn = self.db.session.connection()
+        if self.backend() == 'fts5':
+            create_fts(conn)
+        else:
+            rebuild_trigrams(conn, self.model.__table__, self.trigram)
+        self.db.session.commit()
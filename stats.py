@@ -0,0 +1,236 @@
+"""Materialized application counts by status, course and day.
+
+The dashboard badges and the analytics API read these counters instead of
+counting the student table. Every application is counted in four cells,
+keyed by (day, course, status), where '' stands for "any":
+
+    day          course          status
+    ''           ''              pending    all applications
+    ''           data_science    pending    per course
+    2025-01-01   ''              pending    per day
+    2025-01-01   data_science    pending    per day and course
+
+day is the application date, so a review moves one application between two
+status cells of the same day. Inserts and status changes through the ORM
+session are counted in the same transaction that writes them; bulk UPDATEs
+report their changes with record(). reconcile() recounts the student table
+and corrects any drift.
+"""
+import importlib
+import logging
+from collections import Counter
+
+from sqlalchemy import Date, and_, cast, event, func, inspect, select, text, update
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('pending', 'approved', 'rejected')
+ANY = ''
+
+# Student attributes that decide which cells an application is counted in
+TRACKED = ('application_date', 'course_applied', 'status')
+
+
+def day_of(value):
+    """The day cell for an application date, as stored by the database or as a datetime"""
+    if value is None:
+        return None
+    return value.date().isoformat() if hasattr(value, 'date') else str(value)[:10]
+
+
+def cells(day, course, status):
+    """The four counter keys one application in (day, course, status) is counted in"""
+    status = status or 'pending'
+    keys = [(ANY, ANY, status), (ANY, course or ANY, status)]
+    if day:
+        keys += [(day, ANY, status), (day, course or ANY, status)]
+    return set(keys)
+
+
+def add(deltas, day, course, status, count):
+    for key in cells(day, course, status):
+        deltas[key] += count
+
+
+def apply_deltas(conn, stat, deltas):
+    """Add deltas (key -> change) to the counter rows, creating missing ones"""
+    rows = [{'day': day, 'course': course, 'status': status, 'count': n}
+            for (day, course, status), n in sorted(deltas.items()) if n]
+    if not rows:
+        return
+    if conn.dialect.name in ('sqlite', 'postgresql'):
+        # The backend's own dialect module, so SQLite deployments never import PostgreSQL's
+        statement = importlib.import_module(f'sqlalchemy.dialects.{conn.dialect.name}').insert(stat)
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=['day', 'course', 'status'],
+            set_={'count': stat.c.count + statement.excluded['count']}), rows)
+        return
+    for row in rows:
+        key = and_(stat.c.day == row['day'], stat.c.course == row['course'], stat.c.status == row['status'])
+        if conn.execute(update(stat).where(key).values(count=stat.c.count + row['count'])).rowcount == 0:
+            conn.execute(stat.insert(), [row])
+
+
+def count_cells(conn, student):
+    """Exact counter values, from one GROUP BY over the student table"""
+    if conn.dialect.name == 'sqlite':
+        day = func.date(student.c.application_date)
+    else:
+        day = cast(student.c.application_date, Date)
+    counts = Counter()
+    rows = conn.execute(select(day, student.c.course_applied, student.c.status, func.count())
+                        .group_by(day, student.c.course_applied, student.c.status))
+    for row_day, course, status, count in rows:
+        add(counts, day_of(row_day), course, status, count)
+    return counts
+
+
+def lock_counters(conn, stat):
+    """Hold off counter updates from other transactions until this one ends.
+
+    On SQLite any write takes the database's single write lock, so a write
+    that changes nothing is enough. PostgreSQL gets a table lock that
+    conflicts with the row locks of every UPDATE and INSERT but not with
+    readers. Elsewhere the existing counter rows are locked FOR UPDATE,
+    which holds off changes to them but not the first count of a new cell.
+    """
+    if conn.dialect.name == 'sqlite':
+        conn.execute(update(stat).where(stat.c.day.is_(None)).values(count=stat.c.count))
+    elif conn.dialect.name == 'postgresql':
+        conn.execute(text(f'LOCK TABLE {stat.name} IN SHARE ROW EXCLUSIVE MODE'))
+    else:
+        conn.execute(select(stat.c.day).with_for_update()).fetchall()
+
+
+def reconcile(conn, student, stat):
+    """Rewrite the counters that differ from a recount of the student table; returns how many were wrong"""
+    # Lock the counters before counting, so no increment can land between
+    # the recount and the rewrite and be lost or counted twice
+    lock_counters(conn, stat)
+    actual = count_cells(conn, student)
+    stored = {(row.day, row.course, row.status): row.count for row in conn.execute(select(stat))}
+
+    deltas = Counter()
+    for key in set(actual) | set(stored):
+        deltas[key] = actual.get(key, 0) - stored.get(key, 0)
+    wrong = sum(1 for n in deltas.values() if n)
+    apply_deltas(conn, stat, deltas)
+    conn.execute(stat.delete().where(stat.c.count == 0))
+    return wrong
+
+
+class ApplicationStats:
+    """Keeps the counter table in step with the student table and answers count queries from it"""
+
+    def __init__(self, db=None, model=None, stat_model=None):
+        self.db = db
+        self.model = model
+        self.stat = stat_model.__table__
+        # Load the old value before a tracked attribute is overwritten, even on
+        # an expired instance, so the old cell can be decremented
+        for name in TRACKED:
+            event.listen(getattr(model, name), 'set', lambda *args: None, active_history=True)
+        event.listen(db.session, 'after_flush', self._after_flush)
+
+    def _after_flush(self, session, flush_context):
+        deltas = Counter()
+        for obj in session.new:
+            if isinstance(obj, self.model):
+                add(deltas, day_of(obj.application_date), obj.course_applied, obj.status, 1)
+        for obj in session.dirty:
+            if isinstance(obj, self.model):
+                state = inspect(obj)
+                old = [self._previous(state, name) for name in TRACKED]
+                new = [getattr(obj, name) for name in TRACKED]
+                if old != new:
+                    add(deltas, day_of(old[0]), old[1], old[2], -1)
+                    add(deltas, day_of(new[0]), new[1], new[2], 1)
+        for obj in session.deleted:
+            if isinstance(obj, self.model):
+                state = inspect(obj)
+                old = [self._previous(state, name) for name in TRACKED]
+                add(deltas, day_of(old[0]), old[1], old[2], -1)
+        apply_deltas(session.connection(), self.stat, deltas)
+
+    @staticmethod
+    def _previous(state, name):
+        history = state.attrs[name].history
+        if history.deleted:
+            return history.deleted[0]
+        return history.unchanged[0] if history.unchanged else state.attrs[name].value
+
+    def record(self, changes):
+        """Count changes written without the ORM session: (application_date, course, old, new) tuples.
+
+        old is the status before a bulk UPDATE, or None for an application
+        inserted in bulk.
+        """
+        deltas = Counter()
+        for applied, course, old, new in changes:
+            if old != new:
+                if old is not None:
+                    add(deltas, day_of(applied), course, old, -1)
+                add(deltas, day_of(applied), course, new, 1)
+        apply_deltas(self.db.session.connection(), self.stat, deltas)
+
+    def counts(self, course=None, day_from=None, day_to=None):
+        """Applications per status (and their total), optionally for one course and an inclusive day range"""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self.db.session.execute(self.counts_query(course, day_from, day_to)):
+            counts[status] = counts.get(status, 0) + int(count or 0)
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def counts_query(self, course=None, day_from=None, day_to=None):
+        """The SELECT behind counts(): one row of (status, count) per status"""
+        stat = self.stat
+        query = select(stat.c.status, func.sum(stat.c.count)).where(stat.c.course == (course or ANY))
+        if day_from or day_to:
+            query = query.where(stat.c.day != ANY)
+            if day_from:
+                query = query.where(stat.c.day >= day_of(day_from))
+            if day_to:
+                query = query.where(stat.c.day <= day_of(day_to))
+        else:
+            query = query.where(stat.c.day == ANY)
+        return query.group_by(stat.c.status)
+
+    def by_course(self):
+        """Status counts for every course with applications"""
+        stat = self.stat
+        courses = {}
+        for course, status, count in self.db.session.execute(
+                select(stat.c.course, stat.c.status, stat.c.count)
+                .where(stat.c.day == ANY, stat.c.course != ANY)):
+            courses.setdefault(course, dict.fromkeys(STATUSES, 0))[status] = count
+        for counts in courses.values():
+            counts['total'] = sum(counts.values())
+        return courses
+
+    def by_day(self, course=None, day_from=None, day_to=None, limit=30):
+        """Status counts per application day, newest first, at most limit days"""
+        stat = self.stat
+        days = select(stat.c.day).where(stat.c.course == (course or ANY), stat.c.day != ANY)
+        if day_from:
+            days = days.where(stat.c.day >= day_of(day_from))
+        if day_to:
+            days = days.where(stat.c.day <= day_of(day_to))
+        days = days.group_by(stat.c.day).order_by(stat.c.day.desc()).limit(limit).subquery()
+        rows = self.db.session.execute(
+            select(stat.c.day, stat.c.status, stat.c.count)
+            .where(stat.c.course == (course or ANY), stat.c.day.in_(select(days.c.day)))
+            .order_by(stat.c.day.desc()))
+        result = {}
+        for day, status, count in rows:
+            result.setdefault(day, dict.fromkeys(STATUSES, 0))[status] = count
+        for counts in result.values():
+            counts['total'] = sum(counts.values())
+        return [dict(counts, day=day) for day, counts in result.items()]
+
+    def reconcile(self):
+        """Correct the counters from a recount of the student table and commit; returns how many were wrong"""
+        wrong = reconcile(self.db.session.connection(), self.model.__table__, self.stat)
+        self.db.session.commit()
+        if wrong:
+            logger.warning('Corrected %d drifted application counters', wrong)
+        return wrong
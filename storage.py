@@ -0,0 +1,61 @@
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+from werkzeug.utils import secure_filename
+
+CHUNK_SIZE = 64 * 1024
+
+StoredBlob = namedtuple('StoredBlob', ['path', 'sha256', 'size', 'created'])
+
+
+def blob_path(digest, extension):
+    """Sharded relative path for a digest, e.g. 'ab/cd/abcd...ef.pdf'"""
+    return os.path.join(digest[:2], digest[2:4], digest + extension)
+
+
+def save_stream(stream, root, filename):
+    """Stream an upload to root in CHUNK_SIZE pieces and store it under its SHA-256.
+
+    Memory use is one chunk regardless of the upload size. If a file with the
+    same content is already stored the new copy is discarded, so identical
+    uploads share one file on disk.
+    """
+    extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    tmp_dir = os.path.join(root, '.incoming')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        relative = blob_path(digest.hexdigest(), extension)
+        target = os.path.join(root, relative)
+        if os.path.exists(target):
+            os.unlink(tmp_path)
+            return StoredBlob(relative, digest.hexdigest(), size, False)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        return StoredBlob(relative, digest.hexdigest(), size, True)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def delete_blob(root, relative):
+    """Remove a stored file once nothing references it"""
+    try:
+        os.unlink(os.path.join(root, relative))
+    except FileNotFoundError:
+        pass
@@ -1,10 +1,14 @@
+import io
+import itertools
 import pytest
 import tempfile
+from datetime import datetime, timedelta
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # tests/conftest.py 
-from app import app, db, Admin
+os.environ['APP_CONFIG'] = 'config.TestConfig'
+from app import app, db, Admin, Student, status_cache
 from werkzeug.security import generate_password_hash
 
 @pytest.fixture
@@ -12,16 +16,13 @@ def client():
     """Create a test client with isolated database"""
     # Create a temporary file to serve as the database
     db_fd, app.config['DATABASE'] = tempfile.mkstemp()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['WTF_CSRF_ENABLED'] = False
-    app.config['UPLOAD_FOLDER'] = 'test_uploads'
-    app.config['PDF_FOLDER'] = 'test_pdfs'
     
     # Create test directories
     os.makedirs('test_uploads', exist_ok=True)
     os.makedirs('test_pdfs', exist_ok=True)
     
+    status_cache.clear()
+    
     with app.test_client() as client:
         with app.app_context():
             # Drop all tables first to avoid conflicts
@@ -55,3 +56,41 @@ def auth_client(client):
         })
     return client
 
+@pytest.fixture
+def make_student():
+    """Factory adding a valid Student to the session; keyword arguments override its fields.
+
+    Students made in one test get distinct ids, names and emails, and
+    application dates an hour apart in the order they are made. Nothing is
+    committed, so a test can add several and commit once.
+    make_student.form(**fields) is the matching POST data for /apply; its
+    uploads may be given as bytes.
+    """
+    sequence = itertools.count()
+
+    def defaults(n):
+        return dict(first_name='Test', last_name=f'Student{n:05d}', email=f'student{n}@example.com',
+                    phone=f'9{n:09d}', address='1 Test Road', date_of_birth='2000-01-01',
+                    course_applied='computer_science', previous_qualification='Bachelor of Science',
+                    cgpa='8.0')
+
+    def make(**fields):
+        n = next(sequence)
+        values = dict(defaults(n), application_id=f'TEST{n:05d}',
+                      application_date=datetime(2025, 1, 1) + timedelta(hours=n))
+        values.update(fields)
+        student = Student(**values)
+        db.session.add(student)
+        return student
+
+    def form(**fields):
+        values = dict(defaults(next(sequence)), degree_certificate=b'degree certificate', id_proof=b'id proof')
+        values.update(fields)
+        # Upload contents may be given as bytes, sent as a PDF named after the field
+        for name in ('degree_certificate', 'id_proof'):
+            if isinstance(values[name], bytes):
+                values[name] = (io.BytesIO(values[name]), f'{name}.pdf')
+        return values
+
+    make.form = form
+    return make
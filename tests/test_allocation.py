@@ -0,0 +1,127 @@
+# tests/test_allocation.py
+import os
+import random
+from datetime import datetime
+from sqlalchemy import event
+from app import Student, db, allocate_seats, application_stats, lookup_status
+import allocation
+
+
+def test_allocate_is_stable_with_ranked_preferences():
+    rng = random.Random(7)
+    courses = ['a', 'b', 'c']
+    applicants = [allocation.Applicant(i, rng.choice([6.0, 7.5, 8.0, 9.0]), datetime(2025, 1, 1 + i % 28),
+                                       tuple(rng.sample(courses, rng.randint(1, 3))))
+                  for i in range(500)]
+    capacities = {'a': 40, 'b': 25, 'c': 10}
+    result = allocation.allocate(applicants, capacities)
+
+    assert len(result.assigned) == 75
+    assert result.remaining == {'a': 0, 'b': 0, 'c': 0}
+    assert allocation.is_stable(applicants, capacities, result)
+    for course, capacity in capacities.items():
+        assert sum(1 for c in result.assigned.values() if c == course) == capacity
+
+
+def test_allocate_falls_back_to_later_preferences():
+    applicants = [
+        allocation.Applicant(1, 9.0, 1, ('a', 'b')),
+        allocation.Applicant(2, 8.0, 1, ('a', 'b')),
+        allocation.Applicant(3, 8.0, 0, ('a',)),
+    ]
+    result = allocation.allocate(applicants, {'a': 1, 'b': 1})
+    # 3 outranks 2 on the earlier application but only wanted the full course
+    assert result.assigned == {1: 'a', 2: 'b'}
+    assert result.unassigned == [3]
+    assert result.cutoffs == {'a': 9.0, 'b': 8.0}
+
+
+def test_dry_run_changes_nothing(auth_client, make_student):
+    with auth_client.application.app_context():
+        for cgpa in ['9.0', '8.0', '7.0']:
+            make_student(course_applied='data_science', cgpa=cgpa)
+        db.session.commit()
+
+    response = auth_client.post('/api/allocation', json={'seats': {'data_science': 2}, 'dry_run': True})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['dry_run'] is True
+    assert summary['allocated'] == 2
+    assert summary['courses']['data_science'] == {
+        'seats': 2, 'already_approved': 0, 'allocated': 2, 'remaining': 0, 'cutoff': 8.0}
+    with auth_client.application.app_context():
+        assert Student.query.filter_by(status='pending').count() == 3
+
+
+def test_allocation_records_decisions_in_batches(auth_client, make_student):
+    app = auth_client.application
+    app.config['ALLOCATION_BATCH_SIZE'] = 2
+    try:
+        with app.app_context():
+            make_student(course_applied='civil_engineering', cgpa='9.9', status='approved')
+            ranked = [make_student(course_applied='civil_engineering', cgpa=cgpa).application_id
+                      for cgpa in ['9.0', '8.5', '8.0', '7.0', '6.0']]
+            other = make_student(course_applied='data_science', cgpa='9.5').application_id
+            db.session.commit()
+            lookup_status(ranked[0])  # cached as pending
+
+            updates = []
+            def record(conn, cursor, statement, *args):
+                if statement.startswith('UPDATE student'):
+                    updates.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                summary = allocate_seats({'civil_engineering': 4}, reject_unassigned=True)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+            # One approved already holds a seat, so three more are allocated
+            assert summary['courses']['civil_engineering']['allocated'] == 3
+            statuses = dict(db.session.query(Student.application_id, Student.status))
+            assert [statuses[i] for i in ranked] == ['approved', 'approved', 'approved', 'rejected', 'rejected']
+            assert statuses[other] == 'pending'  # course not being allocated
+            # 3 approvals and 2 rejections at 2 per batch; letter status updates come from the renderer
+            assert len([u for u in updates if 'SET status=' in u]) == 3
+            assert lookup_status(ranked[0]).status == 'approved'
+            student = Student.query.filter_by(application_id=ranked[0]).one()
+            assert student.letter_status == 'ready'
+            assert os.path.exists(os.path.join('test_pdfs', student.admission_letter_path))
+    finally:
+        app.config['ALLOCATION_BATCH_SIZE'] = 5000
+
+
+def test_allocation_counts_only_the_rows_it_changed(auth_client, make_student, monkeypatch):
+    allocate = allocation.allocate
+
+    def review_meanwhile(applicants, capacities):
+        # Another admin rejects the best applicant after the pending rows were read
+        best.status = 'rejected'
+        db.session.commit()
+        return allocate(applicants, capacities)
+
+    monkeypatch.setattr(allocation, 'allocate', review_meanwhile)
+    with auth_client.application.app_context():
+        best, second, third = [make_student(course_applied='data_science', cgpa=cgpa)
+                               for cgpa in ['9.0', '8.0', '7.0']]
+        db.session.commit()
+        allocate_seats({'data_science': 2}, reject_unassigned=True)
+
+        db.session.expire_all()
+        assert [s.status for s in (best, second, third)] == ['rejected', 'approved', 'rejected']
+        assert application_stats.reconcile() == 0
+
+
+def test_allocation_rejects_bad_seats(auth_client):
+    assert auth_client.post('/api/allocation', json={'seats': {'astrology': 3}}).status_code == 400
+    assert auth_client.post('/api/allocation', json={'seats': {'data_science': -1}}).status_code == 400
+    assert auth_client.post('/api/allocation', json=[1]).status_code == 400
+
+
+def test_allocate_seats_cli(client, make_student):
+    app = client.application
+    with app.app_context():
+        make_student(course_applied='data_science', cgpa='9.0')
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=['allocate-seats', '--seats', 'data_science=1', '--dry-run'])
+    assert result.exit_code == 0, result.output
+    assert '1 of 1 applicants allocated (dry run, nothing saved)' in result.output
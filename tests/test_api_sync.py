@@ -0,0 +1,78 @@
+# tests/test_api_sync.py
+from datetime import datetime
+from app import Student, db
+
+
+def test_cursor_pagination_walks_every_row(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(7):
+            make_student()
+        db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        url = '/api/applications?limit=3&fields=application_id' + (f'&cursor={cursor}' if cursor else '')
+        data = auth_client.get(url).get_json()
+        assert all(set(item) == {'application_id'} for item in data['items'])
+        seen.extend(item['application_id'] for item in data['items'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 7
+
+
+def test_updated_since_returns_only_changed_rows(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(5):
+            make_student()
+        db.session.commit()
+        Student.query.update({'updated_at': datetime(2025, 1, 1)}, synchronize_session=False)
+        db.session.commit()
+        changed = Student.query.order_by(Student.id).first()
+        changed.status = 'approved'
+        db.session.commit()
+        assert changed.updated_at > datetime(2025, 1, 2)
+        changed_id = changed.application_id
+
+    data = auth_client.get('/api/applications?updated_since=2025-01-02T00:00:00Z').get_json()
+    assert [item['application_id'] for item in data['items']] == [changed_id]
+    assert auth_client.get('/api/applications?updated_since=yesterday').status_code == 400
+
+
+def test_list_etag_returns_304_until_something_changes(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student()
+        db.session.commit()
+        student_id = Student.query.first().id
+
+    first = auth_client.get('/api/applications?limit=10')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = auth_client.get('/api/applications?limit=10', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    auth_client.post('/api/applications/review', json={'status': 'rejected', 'ids': [student_id]})
+    changed = auth_client.get('/api/applications?limit=10', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_detail_projection_and_etag(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student()
+        db.session.commit()
+        student_id = Student.query.first().id
+
+    response = auth_client.get(f'/api/application/{student_id}?fields=status,cgpa')
+    assert response.get_json() == {'status': 'pending', 'cgpa': '8.0'}
+    cached = auth_client.get(f'/api/application/{student_id}?fields=status,cgpa',
+                             headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert auth_client.get('/api/application/999999').status_code == 404
+
+
+def test_invalid_cursor_is_rejected(auth_client):
+    assert auth_client.get('/api/applications?cursor=garbage').status_code == 400
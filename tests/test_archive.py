@@ -0,0 +1,143 @@
+# tests/test_archive.py
+import io
+import os
+import uuid
+import zipfile
+from datetime import datetime
+import pytest
+from werkzeug.datastructures import FileStorage
+from app import (ArchivedApplication, Student, StoredFile, add_file_reference, application_stats,
+                 archive_applications, db, delete_unreferenced_file, letter_queue, release_file, save_file,
+                 search_index)
+import applications
+import archive
+import storage
+
+
+@pytest.fixture
+def archive_folder(client, tmp_path):
+    config = client.application.config
+    folder, config['ARCHIVE_FOLDER'] = config['ARCHIVE_FOLDER'], str(tmp_path)
+    yield tmp_path
+    config['ARCHIVE_FOLDER'] = folder
+
+
+def upload(name, references=1):
+    blob = storage.save_stream(io.BytesIO(b'%PDF-1.4 ' + uuid.uuid4().bytes * 100), 'test_uploads', name)
+    for _ in range(references):
+        add_file_reference(blob)
+    return blob.path
+
+
+def test_cycles_are_named_after_their_years():
+    assert archive.cycle_of(datetime(2024, 12, 31)) == '2024'
+    assert archive.cycle_of(datetime(2024, 8, 1), start_month=8) == '2024-25'
+    assert archive.cycle_of(datetime(2024, 7, 31), start_month=8) == '2023-24'
+
+
+def test_old_decisions_move_to_their_cycle_archive(client, archive_folder, make_student):
+    with client.application.app_context():
+        own, shared = upload('own.pdf'), upload('shared.pdf', references=2)
+        db.session.commit()
+        approved = make_student(status='approved', application_date=datetime(2023, 3, 1),
+                                degree_certificate=own, id_proof=shared, first_name='Archivable')
+        db.session.commit()
+        letter_queue.enqueue(approved)
+        db.session.commit()
+        rejected = make_student(status='rejected', application_date=datetime(2024, 2, 1))
+        rendering = make_student(status='approved', letter_status='rendering', application_date=datetime(2023, 3, 2))
+        pending = make_student(application_date=datetime(2023, 3, 3))
+        recent = make_student(status='approved', application_date=datetime(2025, 6, 1), id_proof=shared)
+        db.session.commit()
+        approved_id, rejected_id, letter_path = approved.application_id, rejected.application_id, approved.admission_letter_path
+        with open(os.path.join('test_pdfs', letter_path), 'rb') as f:
+            letter = f.read()
+        kept = {rendering.application_id, pending.application_id, recent.application_id}
+
+        cutoff = datetime(2025, 1, 1)
+        assert archive_applications(cutoff, dry_run=True) == {'2023': 1, '2024': 1}
+        assert Student.query.count() == 5
+        assert archive_applications(cutoff) == {'2023': 1, '2024': 1}
+        assert archive_applications(cutoff) == {}
+
+        assert {s.application_id for s in Student.query} == kept
+        assert {a.application_id: a.cycle for a in ArchivedApplication.query} == {approved_id: '2023', rejected_id: '2024'}
+        assert application_stats.counts()['total'] == 3
+        assert not search_index.search('Archivable', 10).items
+
+        # The packed documents are gone from the hot folders unless a live application still uses them
+        assert sorted(os.listdir(archive_folder / '2023')) == ['applications.db', 'documents-0001.zip']
+        with zipfile.ZipFile(archive_folder / '2023' / 'documents-0001.zip') as pack:
+            assert set(pack.namelist()) == {archive.member('uploads', own), archive.member('uploads', shared),
+                                            archive.member('letters', letter_path)}
+            assert pack.getinfo(archive.member('uploads', own)).compress_type == zipfile.ZIP_DEFLATED
+        assert not os.path.exists(os.path.join('test_uploads', own))
+        assert db.session.get(StoredFile, own) is None
+        assert os.path.exists(os.path.join('test_uploads', shared))
+        assert db.session.get(StoredFile, shared).ref_count == 1
+        assert not os.path.exists(os.path.join('test_pdfs', letter_path))
+
+    # Status checks and downloads fall back to the archive
+    page = client.post('/check_status', data={'application_id': approved_id}).data
+    assert approved_id.encode() in page and b'Download Admission Letter' in page
+    assert b'Rejected' in client.post('/check_status', data={'application_id': rejected_id}).data
+    url = f'/download_letter/{approved_id}'
+    response = client.get(url)
+    assert response.status_code == 200 and response.data == letter
+    assert response.headers['Content-Disposition'] == f'attachment; filename=admission_letter_{approved_id}.pdf'
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(url, headers={'Range': 'bytes=0-7'}).data == letter[:8]
+    assert client.get(f'/download_letter/{rejected_id}').status_code == 302
+
+
+def test_interrupted_batch_is_archived_again(client, archive_folder, monkeypatch, make_student):
+    with client.application.app_context():
+        student = make_student(status='rejected', application_date=datetime(2022, 5, 5),
+                               degree_certificate=upload('a.pdf'))
+        db.session.commit()
+        application_id = student.application_id
+
+        def fail():
+            raise RuntimeError('interrupted')
+        monkeypatch.setattr(db.session, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            archive_applications(datetime(2023, 1, 1))
+        monkeypatch.undo()
+        db.session.rollback()
+        assert Student.query.filter_by(application_id=application_id).count() == 1
+
+        assert archive_applications(datetime(2023, 1, 1)) == {'2022': 1}
+        assert sorted(os.listdir(archive_folder / '2022')) == ['applications.db', 'documents-0001.zip',
+                                                               'documents-0002.zip']
+    assert b'Rejected' in client.post('/check_status', data={'application_id': application_id}).data
+
+
+def test_upload_referenced_again_after_release_is_kept(client, monkeypatch):
+    content = b'%PDF-1.4 ' + uuid.uuid4().bytes * 100
+    with client.application.app_context():
+        blob = storage.save_stream(io.BytesIO(content), 'test_uploads', 'again.pdf')
+        add_file_reference(blob)
+        db.session.commit()
+        assert release_file(blob.path)
+        db.session.commit()
+
+        # A new application with the same content arrives before the archiver deletes the file
+        add_file_reference(blob)
+        db.session.commit()
+        assert delete_unreferenced_file(blob.path) is False
+        assert os.path.exists(os.path.join('test_uploads', blob.path))
+
+        # ...or after save_stream found it but before the reference was taken
+        assert release_file(blob.path)
+        db.session.commit()
+
+        def deleted_meanwhile(blob):
+            delete_unreferenced_file(blob.path)
+            original(blob)
+        original = applications.add_file_reference
+        monkeypatch.setattr(applications, 'add_file_reference', deleted_meanwhile)
+        path = save_file(FileStorage(io.BytesIO(content), 'again.pdf'), 'test_uploads')
+        db.session.commit()
+        assert path == blob.path and db.session.get(StoredFile, path).ref_count == 1
+        with open(os.path.join('test_uploads', path), 'rb') as f:
+            assert f.read() == content
@@ -0,0 +1,139 @@
+# tests/test_bulk_review.py
+import os
+import pytest
+from sqlalchemy import event
+from app import Student, db
+
+
+def test_bulk_approve_by_ids(auth_client, make_student):
+    """Approving a list of IDs reports per-item results and renders every letter"""
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student()
+        db.session.commit()
+        ids = [s.id for s in Student.query.order_by(Student.id)]
+
+    response = auth_client.post('/api/applications/review', json={
+        'status': 'approved', 'comments': 'Committee decision', 'ids': ids + [99999]
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['updated'] == 3
+    assert {r['id']: r['result'] for r in data['results']} == {ids[0]: 'updated', ids[1]: 'updated',
+                                                              ids[2]: 'updated', 99999: 'not_found'}
+    assert all(r['letter_status'] == 'ready' for r in data['results'] if r['result'] == 'updated')
+
+    with auth_client.application.app_context():
+        for student in Student.query.all():
+            assert student.status == 'approved'
+            assert student.admin_comments == 'Committee decision'
+            assert student.admission_letter_path == f'admission_letter_{student.application_id}.pdf'
+            assert os.path.exists(os.path.join('test_pdfs', student.admission_letter_path))
+
+
+def test_bulk_reject_by_filter_uses_one_update(auth_client, make_student):
+    """A filter expression is applied with a single UPDATE statement"""
+    with auth_client.application.app_context():
+        for _ in range(4):
+            make_student(course_applied='civil_engineering')
+        for _ in range(2):
+            make_student(course_applied='data_science')
+        db.session.commit()
+        engine = db.engine
+
+    updates = []
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('UPDATE STUDENT'):
+            updates.append(statement)
+    event.listen(engine, 'before_cursor_execute', count_updates)
+    try:
+        response = auth_client.post('/api/applications/review', json={
+            'status': 'rejected', 'filter': {'course': 'civil_engineering'}
+        })
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_updates)
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 4
+    assert len(updates) == 1
+    with auth_client.application.app_context():
+        assert Student.query.filter_by(status='rejected').count() == 4
+        assert Student.query.filter_by(course_applied='data_science', status='pending').count() == 2
+
+
+def test_bulk_review_validation(auth_client):
+    assert auth_client.post('/api/applications/review', json={'status': 'maybe', 'ids': [1]}).status_code == 400
+    assert auth_client.post('/api/applications/review', json={'status': 'approved'}).status_code == 400
+    assert auth_client.post('/api/applications/review', json={'status': 'approved', 'ids': ['x']}).status_code == 400
+    assert auth_client.post('/api/applications/review', json={'status': 'approved', 'ids': [True]}).status_code == 400
+    assert auth_client.post('/api/applications/review', json=[{'status': 'approved'}]).status_code == 400
+    assert auth_client.post('/api/applications/review',
+                            json={'status': 'approved', 'ids': [1], 'comments': 5}).status_code == 400
+
+
+@pytest.mark.parametrize('review_filter', [
+    {}, {'stauts': 'pending'}, {'status': ''}, {'status': 'pending', 'course': None},
+    {'date_from': 'yesterday'}, {'course': 'astrology'}, {'duplicate_group': True}, 'pending',
+])
+def test_bulk_review_needs_a_recognised_filter(auth_client, review_filter, make_student):
+    """A typo in the filter must not turn into an update of the whole table"""
+    with auth_client.application.app_context():
+        for _ in range(2):
+            make_student()
+        db.session.commit()
+    response = auth_client.post('/api/applications/review', json={'status': 'rejected', 'filter': review_filter})
+    assert response.status_code == 400
+    with auth_client.application.app_context():
+        assert Student.query.filter_by(status='rejected').count() == 0
+
+
+def test_dashboard_apply_to_all_needs_a_filter(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(2):
+            make_student()
+        db.session.commit()
+    form = {'status': 'rejected', 'comments': '', 'scope': 'filtered',
+            'status_filter': '', 'course': '', 'date_from': '', 'date_to': ''}
+    response = auth_client.post('/admin/review/bulk', data=form, follow_redirects=True)
+    assert b'Set at least one filter' in response.data
+    with auth_client.application.app_context():
+        assert Student.query.filter_by(status='rejected').count() == 0
+
+    response = auth_client.post('/admin/review/bulk', data=dict(form, status_filter='pending'), follow_redirects=True)
+    assert b'2 applications rejected successfully' in response.data
+
+
+def test_bulk_review_limit(auth_client, make_student):
+    app = auth_client.application
+    app.config['BULK_REVIEW_LIMIT'] = 2
+    try:
+        with app.app_context():
+            for _ in range(3):
+                make_student()
+            db.session.commit()
+        response = auth_client.post('/api/applications/review', json={
+            'status': 'approved', 'filter': {'status': 'pending'}
+        })
+        assert response.status_code == 400
+        with app.app_context():
+            assert Student.query.filter_by(status='pending').count() == 3
+    finally:
+        app.config['BULK_REVIEW_LIMIT'] = 1000
+
+
+def test_dashboard_bulk_action(auth_client, make_student):
+    """The dashboard form approves the checked rows"""
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student()
+        db.session.commit()
+        ids = [s.id for s in Student.query.order_by(Student.id)]
+
+    response = auth_client.post('/admin/review/bulk', data={
+        'status': 'approved', 'comments': '', 'scope': 'selected', 'student_ids': ids[:2],
+        'status_filter': '', 'course': '', 'date_from': '', 'date_to': ''
+    }, follow_redirects=True)
+    assert response.status_code == 200
+    assert b'2 applications approved successfully' in response.data
+    with auth_client.application.app_context():
+        assert Student.query.filter_by(status='approved').count() == 2
@@ -0,0 +1,130 @@
+# tests/test_cache.py
+import pytest
+import uuid
+from app import Student, create_app, db, init_caches, letter_store, status_cache
+from cache import MemoryBackend, ReadThroughCache, SQLiteBackend, create_cache
+from config import TestConfig
+
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = ReadThroughCache(MemoryBackend(max_size=2), ttl=60)
+    cache.get('a', str.upper)
+    cache.get('b', str.upper)
+    cache.get('a', str.upper)      # 'a' is now most recently used
+    cache.get('c', str.upper)      # evicts 'b'
+
+    loads = []
+    cache.get('b', lambda key: loads.append(key) or key)
+    assert loads == ['b']
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 4
+    assert stats['evictions'] == 2
+    assert stats['size'] == 2
+
+
+def test_expired_entries_are_reloaded():
+    cache = ReadThroughCache(MemoryBackend(), ttl=-1)
+    cache.get('a', lambda key: 1)
+    assert cache.get('a', lambda key: 2) == 2
+    assert cache.hits == 0
+
+
+def test_missing_keys_are_not_cached():
+    cache = ReadThroughCache(MemoryBackend(), ttl=60)
+    assert cache.get('NEW', lambda key: None) is None
+    assert cache.get('NEW', lambda key: ('pending', key)) == ('pending', 'NEW')
+    assert cache.stats()['size'] == 1
+
+
+def test_status_cache_is_configured_by_create_app(client, tmp_path):
+    class SharedConfig(TestConfig):
+        STATUS_CACHE_BACKEND = 'sqlite'
+        STATUS_CACHE_PATH = str(tmp_path / 'status.db')
+        STATUS_CACHE_TTL = 5
+        LETTER_CACHE_SIZE = 3
+
+    try:
+        create_app(SharedConfig)
+        assert isinstance(status_cache.backend, SQLiteBackend) and status_cache.ttl == 5
+        assert status_cache.backend.path == SharedConfig.STATUS_CACHE_PATH
+        assert letter_store.max_entries == 3
+    finally:
+        init_caches(client.application)
+    assert isinstance(status_cache.backend, MemoryBackend)
+    assert letter_store.max_entries == TestConfig.LETTER_CACHE_SIZE
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """Two caches on one file behave like two worker processes on one host"""
+    path = str(tmp_path / 'cache.db')
+    first = create_cache('sqlite', max_size=10, ttl=60, path=path)
+    second = create_cache('sqlite', max_size=10, ttl=60, path=path)
+
+    first.get('APP1', lambda key: ('pending', key))
+    assert second.get('APP1', lambda key: pytest.fail('should be cached')) == ('pending', 'APP1')
+
+    second.invalidate('APP1')
+    assert first.get('APP1', lambda key: ('approved', key)) == ('approved', 'APP1')
+
+
+def test_sqlite_backend_evicts_oldest(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'cache.db'), max_size=3)
+    cache = ReadThroughCache(backend, ttl=60)
+    for key in 'abcde':
+        cache.get(key, str.upper)
+    assert len(backend) == 3
+    assert backend.evictions == 2
+
+
+def test_sqlite_backend_hits_do_not_write(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'cache.db'))
+    backend.set('a', 'A', 60)
+    conn = backend._connect()
+    writes = conn.total_changes
+    assert backend.get('a') == 'A'
+    assert conn.total_changes == writes
+
+
+def test_sqlite_backend_drops_expired_entries_before_evicting(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'cache.db'), max_size=2)
+    backend.set('old', 'OLD', -1)
+    backend.set('a', 'A', 60)
+    backend.set('b', 'B', 60)
+    assert len(backend) == 2
+    assert backend.evictions == 0
+    assert (backend.get('a'), backend.get('b')) == ('A', 'B')
+
+
+def test_status_check_is_cached_and_invalidated_on_review(auth_client):
+    with auth_client.application.app_context():
+        application_id = f'CACHE{uuid.uuid4().hex[:8]}'
+        student = Student(
+            application_id=application_id,
+            first_name='Cache',
+            last_name='Poller',
+            email=f'{application_id}@example.com',
+            phone='5555555555',
+            address='1 Cache Court',
+            date_of_birth='1994-08-20',
+            course_applied='data_science',
+            previous_qualification='Bachelor of Science',
+            cgpa='7.8'
+        )
+        db.session.add(student)
+        db.session.commit()
+        student_id = student.id
+
+    for _ in range(3):
+        response = auth_client.post('/check_status', data={'application_id': application_id})
+        assert b'Cache Poller' in response.data
+        assert b'Pending' in response.data
+    assert status_cache.stats()['misses'] >= 1
+    assert status_cache.stats()['hits'] >= 2
+
+    auth_client.post('/api/applications/review', json={'status': 'rejected', 'ids': [student_id]})
+    response = auth_client.post('/check_status', data={'application_id': application_id})
+    assert b'Rejected' in response.data
+
+    stats = auth_client.get('/admin/cache/stats').get_json()['status_cache']
+    assert set(stats) >= {'hits', 'misses', 'evictions', 'size'}
@@ -0,0 +1,72 @@
+# tests/test_dashboard.py
+import pytest
+from datetime import datetime
+from app import Student, db
+
+
+def test_dashboard_is_paginated(auth_client, make_student):
+    """Dashboard shows one page at a time and links to the next one"""
+    app = auth_client.application
+    app.config['DASHBOARD_PAGE_SIZE'] = 5
+    with app.app_context():
+        for _ in range(12):
+            make_student()
+        db.session.commit()
+
+    response = auth_client.get('/admin/dashboard')
+    assert response.status_code == 200
+    assert b'Student00011' in response.data  # newest first
+    assert b'Student00006' not in response.data
+    assert b'Total Applications: 12' in response.data
+    assert b'after=' in response.data
+    app.config['DASHBOARD_PAGE_SIZE'] = 50
+
+
+def test_dashboard_keyset_walks_all_rows(client, make_student):
+    """Following next cursors visits every row exactly once"""
+    from pagination import keyset_page, decode_cursor
+    with client.application.app_context():
+        for _ in range(7):
+            make_student()
+        db.session.commit()
+        seen = []
+        columns = [Student.application_date, Student.id]
+        after = None
+        while True:
+            page = keyset_page(Student.query, columns, 3, after=after)
+            seen.extend(s.application_id for s in page.items)
+            if not page.next_cursor:
+                break
+            after = decode_cursor(page.next_cursor, (datetime, int))
+        assert len(seen) == 7
+        assert len(set(seen)) == 7
+
+        back = keyset_page(Student.query, columns, 3,
+                           before=decode_cursor(page.prev_cursor, (datetime, int)))
+        assert [s.application_id for s in back.items] == seen[3:6]
+
+
+def test_dashboard_filters_and_counts(auth_client, make_student):
+    """Filters narrow the table and badge counts come from one aggregate"""
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student(course_applied='data_science', status='approved')
+        for _ in range(2):
+            make_student(course_applied='data_science', status='rejected')
+        for _ in range(4):
+            make_student(course_applied='civil_engineering', status='pending')
+        db.session.commit()
+
+    response = auth_client.get('/admin/dashboard?course=data_science&status=approved')
+    assert response.status_code == 200
+    assert b'Total Applications: 5' in response.data
+    assert b'Approved: 3' in response.data
+    assert b'Rejected: 2' in response.data
+    assert b'Civil Engineering</td>' not in response.data
+    assert response.data.count(b'>Review</a>') == 3
+
+
+def test_invalid_cursor_is_ignored(auth_client):
+    """A tampered cursor falls back to the first page"""
+    response = auth_client.get('/admin/dashboard?after=not-a-cursor')
+    assert response.status_code == 200
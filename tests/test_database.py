@@ -0,0 +1,85 @@
+# tests/test_database.py
+import io
+import threading
+import pytest
+from sqlalchemy import text
+from app import create_app, db, Student, StoredFile
+from config import TestConfig
+import database
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """An app on a SQLite file, as used in production, rather than the shared in-memory test DB"""
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'admission.db'}"
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        PDF_FOLDER = str(tmp_path / 'letters')
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_engine_options_for_backends():
+    config = {
+        'SQLALCHEMY_DATABASE_URI': 'postgresql://db/admissions', 'DB_POOL_SIZE': 5, 'DB_MAX_OVERFLOW': 7,
+        'DB_POOL_TIMEOUT': 30, 'DB_POOL_RECYCLE': 600, 'DB_POOL_PRE_PING': True,
+        'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 3},
+    }
+    options = database.engine_options(config)
+    assert options == {'pool_size': 3, 'max_overflow': 7, 'pool_timeout': 30,
+                       'pool_recycle': 600, 'pool_pre_ping': True}
+
+    config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', SQLALCHEMY_ENGINE_OPTIONS=None)
+    assert 'pool_size' not in database.engine_options(config)
+
+
+def test_sqlite_pragmas_are_applied(file_app):
+    with file_app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == file_app.config['SQLITE_BUSY_TIMEOUT_MS']
+            assert conn.execute(text('PRAGMA mmap_size')).scalar() == file_app.config['SQLITE_MMAP_SIZE']
+        assert db.engine.pool.size() == file_app.config['DB_POOL_SIZE']
+
+
+def test_parallel_applications_all_succeed(file_app):
+    """Concurrent /apply submissions wait for the write lock instead of failing with 'database is locked'"""
+    threads, per_thread = 8, 5
+    statuses = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def submit(worker):
+        client = file_app.test_client()
+        start.wait()
+        for i in range(per_thread):
+            response = client.post('/apply', content_type='multipart/form-data', data={
+                'first_name': 'Parallel', 'last_name': f'Applicant{worker}x{i}',
+                'email': f'parallel{worker}.{i}@example.com', 'phone': '9876543210',
+                'address': '1 Concurrency Road, Test City', 'date_of_birth': '2000-01-01',
+                'course_applied': 'data_science', 'previous_qualification': 'Higher Secondary',
+                'cgpa': '8.0',
+                'degree_certificate': (io.BytesIO(b'%PDF-1.4 shared degree'), 'degree.pdf'),
+                'id_proof': (io.BytesIO(f'%PDF-1.4 id {worker} {i}'.encode()), 'id.pdf'),
+            })
+            with lock:
+                statuses.append(response.status_code)
+
+    workers = [threading.Thread(target=submit, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert statuses == [302] * threads * per_thread
+    with file_app.app_context():
+        assert Student.query.count() == threads * per_thread
+        # Every submission took a reference to the one shared degree certificate
+        shared = Student.query.first().degree_certificate
+        assert db.session.get(StoredFile, shared).ref_count == threads * per_thread
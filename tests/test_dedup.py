@@ -0,0 +1,147 @@
+# tests/test_dedup.py
+from types import SimpleNamespace
+from datetime import date
+from sqlalchemy import create_engine, text
+from app import DuplicateKey, Student, db
+from tests.test_migrations import OLD_STUDENT_SCHEMA
+import dedup
+import migrations
+
+
+def groups():
+    return {s.first_name + ' ' + s.last_name: s.duplicate_group for s in Student.query.order_by(Student.id)}
+
+
+def test_keys_are_normalized():
+    row = SimpleNamespace(email=' Jane.Roe+apply@GoogleMail.com ', phone='+91 98765-43210',
+                          first_name='René', last_name='DU Pont', birth_date=date(2000, 1, 31))
+    assert dedup.keys(row) == [('email', 'janeroe@gmail.com'), ('phone', '9876543210'),
+                               ('name_dob', 'du pont rene|2000-01-31')]
+    assert dedup.normalize_email('not-an-email') is None
+    assert dedup.normalize_phone('12345') is None
+    assert dedup.normalize_name('Roe', 'Jane') == dedup.normalize_name('jane', 'ROE')
+
+
+def test_new_applications_join_the_group_they_match(client, make_student):
+    with client.application.app_context():
+        make_student(first_name='Jane', last_name='Roe', email='jane.roe@gmail.com', phone='1111111111')
+        make_student(first_name='Someone', last_name='Else', email='else@example.com', phone='2222222222')
+        db.session.commit()
+        make_student(first_name='J', last_name='Roe', email='janeroe+second@gmail.com', phone='3333333333')
+        db.session.commit()
+        # Same person with the names swapped and a new email and phone
+        make_student(first_name='Roe', last_name='Jane', email='jr@example.org', phone='4444444444')
+        db.session.commit()
+
+        jane = Student.query.filter_by(email='jane.roe@gmail.com').one()
+        assert groups() == {'Jane Roe': jane.id, 'Someone Else': None, 'J Roe': jane.id, 'Roe Jane': jane.id}
+
+
+def test_apply_refuses_a_pending_repeat(client, make_student):
+    first = make_student.form(email='Repeat.Applicant@example.com', course_applied='data_science')
+    assert b'Application submitted successfully' in client.post('/apply', data=first, follow_redirects=True).data
+
+    response = client.post('/apply', data=make_student.form(email='repeat.applicant@EXAMPLE.com',
+                                                            course_applied='data_science'))
+    assert response.status_code == 409
+    assert b'already under review' in response.data
+
+    other_course = make_student.form(email='repeat.applicant@example.com', course_applied='computer_science')
+    assert client.post('/apply', data=other_course).status_code == 302
+    with client.application.app_context():
+        first, second = Student.query.order_by(Student.id)
+        assert second.duplicate_group == first.id
+        first.status = 'rejected'
+        db.session.commit()
+    # Once the earlier application is decided the applicant may apply again
+    assert client.post('/apply', data=make_student.form(email='repeat.applicant@example.com',
+                                                       course_applied='data_science')).status_code == 302
+
+
+def test_cluster_merges_chains_and_ignores_common_keys(client, make_student):
+    app = client.application
+    with app.app_context():
+        app.config['DUPLICATE_MAX_BUCKET'] = 3
+        try:
+            ann = make_student(first_name='Ann', last_name='Lee', email='ann@example.com', phone='1000000001')
+            make_student(first_name='Ann', last_name='Lee', email='ann.lee@example.com',
+                         phone='1000000002')  # name and birth date
+            make_student(first_name='Anne', last_name='Li', email='other@example.com',
+                         phone='1000000002')  # phone of the second
+            bob = make_student(first_name='Bob', last_name='Roy', email='bob@example.com', phone='1000000003')
+            for name in ('Asha', 'Bina', 'Chet'):  # a switchboard number shared by too many
+                make_student(first_name=name, last_name='Roy', email=f'{name}@example.com', phone='1000000003')
+            db.session.commit()
+            db.session.execute(text('UPDATE student SET duplicate_group = NULL'))
+            db.session.execute(text('UPDATE student SET duplicate_group = 99 WHERE id = :id'), {'id': bob.id})
+            db.session.commit()
+
+            result = app.test_cli_runner().invoke(args=['find-duplicates'])
+            assert result.exit_code == 0, result.output
+            assert '1 duplicate groups, 4 applications regrouped' in result.output
+            assert [s.duplicate_group for s in Student.query.order_by(Student.id)] == [ann.id] * 3 + [None] * 4
+            assert dedup.cluster(db.session.connection(), Student.__table__, DuplicateKey.__table__, 3) == (1, 0)
+        finally:
+            app.config['DUPLICATE_MAX_BUCKET'] = 20
+
+
+def test_keys_follow_edits_and_rebuild(client, make_student):
+    app = client.application
+    with app.app_context():
+        student = make_student()
+        db.session.commit()
+        email = student.email
+        student.email = 'changed@example.com'
+        db.session.commit()
+        stored = set(db.session.execute(text('SELECT kind, value FROM duplicate_key')))
+        assert ('email', 'changed@example.com') in stored
+        assert ('email', email) not in stored
+
+        db.session.execute(text('DELETE FROM duplicate_key'))
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=['find-duplicates', '--rebuild'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert set(db.session.execute(text('SELECT kind, value FROM duplicate_key'))) == stored
+
+
+def test_review_page_and_dashboard_show_duplicates(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student(application_id='DUPA', first_name='Jane', last_name='Roe', email='jane@example.com',
+                     phone='1111111111', course_applied='data_science')
+        make_student(application_id='DUPB', first_name='Jane', last_name='Roe', email='jane@example.com',
+                     phone='2222222222')
+        make_student(application_id='DUPC', first_name='Other', last_name='Person', email='other@example.com',
+                     phone='3333333333', course_applied='data_science')
+        db.session.commit()
+        first, second, _ = Student.query.order_by(Student.id)
+        first_id, group = first.id, second.duplicate_group
+
+    page = auth_client.get(f'/admin/review/{first_id}').data
+    assert b'Possible Duplicates' in page and b'DUPB' in page
+
+    dashboard = auth_client.get('/admin/dashboard').data
+    assert dashboard.count(b'Possible duplicate<') == 2
+    filtered = auth_client.get(f'/admin/dashboard?duplicate_group={group}').data
+    assert b'DUPA' in filtered and b'DUPB' in filtered and b'DUPC' not in filtered
+
+    response = auth_client.get(f'/api/applications?duplicate_group={group}&fields=application_id,duplicate_group')
+    assert sorted(item['application_id'] for item in response.get_json()) == ['DUPA', 'DUPB']
+
+
+def test_migration_groups_existing_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_STUDENT_SCHEMA))
+        conn.execute(text(
+            "INSERT INTO student (application_id, first_name, last_name, email, phone, address, date_of_birth, "
+            "course_applied, previous_qualification, cgpa) VALUES "
+            "('OLD1', 'Meera', 'Nair', 'meera@example.com', '1234567890', 'Somewhere', '1999-12-31', "
+            "'data_science', 'HSC', '76%'),"
+            "('OLD2', 'Meera', 'Nair', 'meera.n@example.com', '5550001111', 'Somewhere', '1999-12-31', "
+            "'civil_engineering', 'HSC', '76%')"))
+
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT duplicate_group FROM student ORDER BY id')).scalars().all() == [1, 1]
+        assert conn.execute(text("SELECT count(*) FROM duplicate_key WHERE kind = 'name_dob'")).scalar() == 2
@@ -0,0 +1,112 @@
+# tests/test_documents.py
+import os
+import uuid
+import pytest
+from app import Student, StoredFile, db
+
+
+@pytest.fixture
+def offload(client):
+    def set_mode(mode):
+        client.application.config['DOCUMENT_OFFLOAD'] = mode
+    yield set_mode
+    client.application.config['DOCUMENT_OFFLOAD'] = ''
+
+
+def applied(client, make_student, degree):
+    email = f'documents.{uuid.uuid4().hex[:8]}@example.com'
+    client.post('/apply', data=make_student.form(email=email, degree_certificate=degree))
+    with client.application.app_context():
+        student = Student.query.filter_by(email=email).one()
+        return student.id, student.application_id, db.session.get(StoredFile, student.degree_certificate).sha256
+
+
+def with_letter(client, make_student, content):
+    with client.application.app_context():
+        student = make_student(status='approved', letter_status='ready',
+                               admission_letter_path=f'letter_{uuid.uuid4().hex[:8]}.pdf')
+        db.session.commit()
+        with open(os.path.join('test_pdfs', student.admission_letter_path), 'wb') as f:
+            f.write(content)
+        return student.application_id, student.admission_letter_path
+
+
+def test_admin_views_uploads_with_ranges_and_etags(auth_client, make_student):
+    degree = b'%PDF-1.4 degree certificate ' + uuid.uuid4().bytes
+    student_id, application_id, digest = applied(auth_client, make_student, degree)
+    url = f'/admin/review/{student_id}/documents/degree_certificate'
+
+    assert url.encode() in auth_client.get(f'/admin/review/{student_id}').data
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    assert response.data == degree
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Disposition'] == f'inline; filename={application_id}_degree_certificate.pdf'
+    assert response.headers['ETag'] == f'"{digest}"'
+    assert response.cache_control.private and response.cache_control.max_age == 86400
+
+    assert auth_client.get(url, headers={'If-None-Match': f'"{digest}"'}).status_code == 304
+    partial = auth_client.get(url, headers={'Range': 'bytes=5-12'})
+    assert partial.status_code == 206
+    assert partial.data == degree[5:13]
+    assert partial.headers['Content-Range'] == f'bytes 5-12/{len(degree)}'
+
+    assert auth_client.get(f'/admin/review/{student_id}/documents/password_hash').status_code == 404
+    assert auth_client.get(f'/admin/review/{student_id + 100}/documents/id_proof').status_code == 404
+
+
+def test_uploads_need_an_admin(client, make_student):
+    student_id, _, _ = applied(client, make_student, b'private certificate')
+    response = client.get(f'/admin/review/{student_id}/documents/degree_certificate')
+    assert response.status_code == 302
+    assert '/admin/login' in response.headers['Location']
+
+
+def test_letters_are_sent_conditionally(client, make_student):
+    content = b'%PDF-1.4 admission letter ' * 100
+    application_id, _ = with_letter(client, make_student, content)
+    url = f'/download_letter/{application_id}'
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.data == content
+    assert response.headers['Content-Disposition'] == f'attachment; filename=admission_letter_{application_id}.pdf'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.cache_control.private and response.cache_control.no_cache
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(url, headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+    assert client.get(url, headers={'Range': 'bytes=-10'}).data == content[-10:]
+
+
+def test_offload_leaves_the_bytes_to_the_proxy(client, offload, make_student):
+    application_id, path = with_letter(client, make_student, b'%PDF-1.4 offloaded letter')
+    url = f'/download_letter/{application_id}'
+
+    offload('x-accel')
+    response = client.get(url, headers={'Range': 'bytes=0-3'})
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f'/protected/letters/{path}'
+    assert response.data == b'' and response.headers['Content-Length'] == '0'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    assert 'X-Accel-Redirect' not in client.get(url, headers={'If-None-Match': response.headers['ETag']}).headers
+
+    offload('x-sendfile')
+    response = client.get(url)
+    assert response.headers['X-Sendfile'] == os.path.abspath(os.path.join('test_pdfs', path))
+    assert response.data == b''
+
+
+def test_document_folders_are_not_served_as_static_files(client, tmp_path):
+    app = client.application
+    (tmp_path / 'uploads').mkdir()
+    (tmp_path / 'uploads' / 'secret.pdf').write_bytes(b'secret')
+    (tmp_path / 'site.css').write_text('body {}')
+    static_folder, upload_folder = app.static_folder, app.config['UPLOAD_FOLDER']
+    app.static_folder, app.config['UPLOAD_FOLDER'] = str(tmp_path), str(tmp_path / 'uploads')
+    try:
+        assert client.get('/static/uploads/secret.pdf').status_code == 404
+        assert client.get('/static/uploads/../uploads/secret.pdf').status_code == 404
+        response = client.get('/static/site.css')
+        assert response.status_code == 200
+        response.close()
+    finally:
+        app.static_folder, app.config['UPLOAD_FOLDER'] = static_folder, upload_folder
@@ -0,0 +1,138 @@
+# tests/test_export.py
+import csv
+import io
+import json
+import pytest
+from sqlalchemy import event, select
+from app import APPLICATION_FIELDS, Student, application_serializer, db
+import export
+
+
+def test_ndjson_export_streams_projected_rows(auth_client, make_student):
+    app = auth_client.application
+    app.config['EXPORT_BATCH_SIZE'] = 4
+    try:
+        with app.app_context():
+            for _ in range(10):
+                make_student()
+            db.session.commit()
+        response = auth_client.get('/api/applications?format=ndjson&fields=application_id,status')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.is_streamed
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(rows) == 10
+        assert set(rows[0]) == {'application_id', 'status'}
+    finally:
+        app.config['EXPORT_BATCH_SIZE'] = 1000
+
+
+def test_csv_export_with_filters(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student(course_applied='data_science')
+        for _ in range(2):
+            make_student(course_applied='civil_engineering')
+        db.session.commit()
+    response = auth_client.get('/api/applications?format=csv&course=data_science&fields=name,course,application_date')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['name', 'course', 'application_date']
+    assert len(rows) == 4
+    assert all(row[1] == 'data_science' for row in rows[1:])
+    assert rows[1][0].startswith('Test Student')
+
+
+def test_export_selects_only_requested_columns(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(2):
+            make_student()
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM student' in statement:
+            statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        auth_client.get('/api/applications?format=ndjson&fields=email').get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    select_list = statements[-1].split('FROM')[0]
+    assert 'student.email' in select_list
+    assert 'student.address' not in select_list
+    assert 'student.first_name' not in select_list
+
+
+def test_json_default_payload_is_unchanged(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student()
+        db.session.commit()
+    data = auth_client.get('/api/applications').get_json()
+    assert set(data[0]) == {'id', 'application_id', 'name', 'email', 'course', 'status', 'application_date'}
+
+
+def test_export_rejects_bad_parameters(auth_client):
+    assert auth_client.get('/api/applications?format=xml').status_code == 400
+    assert auth_client.get('/api/applications?fields=password_hash').status_code == 400
+
+
+def test_serializer_matches_field_by_field_encoding(client, make_student):
+    with client.application.app_context():
+        for _ in range(3):
+            make_student()
+        db.session.commit()
+        names = list(APPLICATION_FIELDS)
+        columns = [getattr(Student, name) for name in export.required_columns(names, APPLICATION_FIELDS)]
+        rows = db.session.execute(select(*reversed(columns)).order_by(Student.id)).all()
+
+    serializer = export.Serializer(APPLICATION_FIELDS, Student.__table__)
+    items = serializer.to_dicts(rows, names)
+    assert items == [export.to_dict(row, names, APPLICATION_FIELDS) for row in rows]
+    assert items[0]['name'] == 'Test Student00000'
+    assert items[0]['birth_date'] == '2000-01-01' and items[0]['application_date'].startswith('2025-01-01T')
+    assert serializer.encoder(names, rows[0]._fields).to_list(rows[0]) == list(items[0].values())
+    # One encoder per projection, compiled on first use
+    assert serializer.encoder(names, rows[0]._fields) is serializer.encoder(names, rows[1]._fields)
+    assert serializer.to_dicts([], names) == []
+
+
+def test_serializer_keeps_a_bounded_set_of_encoders(client, make_student):
+    with client.application.app_context():
+        make_student()
+        db.session.commit()
+        row = db.session.execute(select(Student.id, Student.email, Student.status)).one()
+    serializer = export.Serializer(APPLICATION_FIELDS, Student.__table__, max_encoders=2)
+    first = serializer.encoder(['id'], row._fields)
+    serializer.encoder(['email'], row._fields)
+    serializer.encoder(['status'], row._fields)
+    assert len(serializer._encoders) == 2
+    assert serializer.encoder(['id'], row._fields) is not first
+
+
+def test_json_backends_agree(monkeypatch):
+    payload = {'name': 'Zoë', 'score': 8.5, 'items': [None, True, 3]}
+    fast = export.dumps(payload)
+    monkeypatch.setattr(export, 'orjson', None)
+    assert json.loads(export.dumps(payload)) == json.loads(fast) == payload
+
+
+def test_api_payloads_come_from_the_serializer(auth_client, monkeypatch, make_student):
+    with auth_client.application.app_context():
+        for _ in range(2):
+            make_student()
+        db.session.commit()
+        student_id = Student.query.first().id
+    compiled = []
+    original = application_serializer._compile
+    monkeypatch.setattr(application_serializer, '_compile', lambda *args: compiled.append(args) or original(*args))
+    monkeypatch.setattr(application_serializer, '_encoders', {})
+
+    for _ in range(2):
+        assert len(auth_client.get('/api/applications?fields=id,name,application_date').get_json()) == 2
+    detail = auth_client.get(f'/api/application/{student_id}?fields=email,course').get_json()
+    assert detail == {'email': 'student0@example.com', 'course': 'computer_science'}
+    assert [names for names, _ in compiled] == [('id', 'name', 'application_date'), ('email', 'course')]
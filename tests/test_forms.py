@@ -1,7 +1,7 @@
 
 # tests/test_forms.py 
 import pytest
-from app import ApplicationForm, LoginForm, ReviewForm, app
+from app import ApplicationForm, LoginForm, ReviewForm, Student, app
 
 def test_application_form_validation():
     """Test application form validation"""
@@ -38,6 +38,37 @@ def test_application_form_valid_data():
         assert form.email.validate(form)
         assert form.phone.validate(form)
 
+@pytest.mark.parametrize('date_of_birth', ['01/01/1995', '1995-02-30', 'sometime in 1995'])
+def test_application_form_rejects_unreadable_birth_dates(date_of_birth):
+    """Birth dates must be real YYYY-MM-DD dates"""
+    with app.app_context():
+        form = ApplicationForm(date_of_birth=date_of_birth)
+        assert not form.validate()
+        assert form.errors['date_of_birth'] == ['Enter the date of birth as YYYY-MM-DD.']
+
+@pytest.mark.parametrize('cgpa, valid', [
+    ('8.5', True), ('3.6/4', True), ('85%', True),
+    ('excellent', False), ('120', False), ('5/4', False),
+])
+def test_application_form_checks_cgpa(cgpa, valid):
+    """CGPA must read as a grade on a known scale or a percentage"""
+    with app.app_context():
+        form = ApplicationForm(cgpa=cgpa)
+        form.validate()
+        if valid:
+            assert 'cgpa' not in form.errors
+        else:
+            assert form.errors['cgpa'] == ['Enter a CGPA (e.g. 8.5 or 3.6/4) or a percentage (e.g. 85%).']
+
+def test_apply_reports_unreadable_birth_date_and_cgpa(client, make_student):
+    """A submission the form used to accept is now sent back with the errors"""
+    response = client.post('/apply', data=make_student.form(date_of_birth='31/12/1999', cgpa='excellent'))
+    assert response.status_code == 200
+    assert b'Enter the date of birth as YYYY-MM-DD.' in response.data
+    assert b'Enter a CGPA (e.g. 8.5 or 3.6/4) or a percentage (e.g. 85%).' in response.data
+    with client.application.app_context():
+        assert Student.query.count() == 0
+
 def test_login_form_validation():
     """Test login form validation"""
     with app.app_context():
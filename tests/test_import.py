@@ -0,0 +1,169 @@
+# tests/test_import.py
+import csv
+import io
+import json
+import re
+from sqlalchemy import event
+from app import ApplicationForm, Student, db, application_stats, application_validator, search_index
+import importer
+
+GOOD = {
+    'first_name': 'Priya', 'last_name': 'Sharma', 'email': 'priya.sharma@example.com', 'phone': '9876543210',
+    'address': '12 Partner Portal Road, Pune', 'date_of_birth': '2001-04-05', 'course_applied': 'data_science',
+    'previous_qualification': 'Higher Secondary', 'cgpa': '88%',
+}
+
+
+def rows(count, **overrides):
+    return [dict(GOOD, email=f'partner{i}@example.com', first_name=f'Partner{i}', phone=f'90000000{i:02d}',
+                 **overrides) for i in range(count)]
+
+
+def to_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(GOOD))
+    writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+def test_rows_are_checked_with_the_form_rules(client):
+    bad = dict(GOOD, first_name='', email='not-an-email', phone='123', course_applied='astrology',
+               date_of_birth='05/04/2001', cgpa='11/10')
+    values, errors = application_validator(GOOD, 2)
+    assert errors == []
+    assert values['cgpa_score'] == 8.8 and values['birth_date'].isoformat() == '2001-04-05'
+
+    _, errors = application_validator(bad, 3)
+    with client.application.test_request_context():
+        form = ApplicationForm(data=bad)
+        form.validate()
+    # The same fields fail with the same messages as on the form
+    assert {e.field: e.message for e in errors} == {
+        name: messages[0] for name, messages in form.errors.items()
+        if name not in ('degree_certificate', 'id_proof')}
+    assert {e.line for e in errors} == {3}
+
+    _, errors = application_validator(dict(GOOD, phone=9876543210, cgpa=8.5))
+    assert errors == []
+    _, errors = application_validator(dict(GOOD, address=['not', 'text']))
+    assert errors == [importer.RowError(0, 'address', 'Must be text.')]
+
+
+def test_cli_imports_csv_in_batches_and_reports_bad_rows(client, tmp_path):
+    app = client.application
+    records = rows(5) + [dict(GOOD, email='broken', first_name='Broken')] + [rows(1)[0]]
+    source = tmp_path / 'partner.csv'
+    source.write_text(to_csv(records))
+    report = tmp_path / 'errors.csv'
+
+    with app.app_context():
+        engine = db.engine
+    inserts = []
+    def record(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO student '):
+            inserts.append(statement)
+    app.config['IMPORT_BATCH_SIZE'] = 2
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        result = app.test_cli_runner().invoke(args=['import-applications', str(source), '--errors', str(report)])
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+        app.config['IMPORT_BATCH_SIZE'] = 1000
+    assert result.exit_code == 0, result.output
+    assert '5 applications imported, 2 rows rejected' in result.output
+    assert len(inserts) == 3
+
+    with open(report, newline='') as f:
+        assert list(csv.DictReader(f)) == [
+            {'line': '7', 'field': 'email', 'message': 'Invalid email address.'},
+            {'line': '8', 'field': '', 'message': 'An application for this course with these details is already pending.'},
+        ]
+    with app.app_context():
+        imported = Student.query.order_by(Student.id).all()
+        assert len(imported) == 5
+        assert all(re.fullmatch(r'APP\d{8}[0-9A-F]{8}', s.application_id) for s in imported)
+        assert len({s.application_id for s in imported}) == 5
+        assert {s.status for s in imported} == {'pending'}
+        assert imported[0].cgpa_score == 8.8
+        assert application_stats.counts(course='data_science')['pending'] == 5
+        assert [row.id for row in search_index.search('partner3', 10).items] == [imported[3].id]
+
+
+def test_api_imports_jsonl_and_csv_uploads(auth_client):
+    body = '\n'.join([json.dumps(GOOD), '{not json', '[1, 2]', '', json.dumps(dict(GOOD, email='b@example.com',
+                                                                                     course_applied='nope'))])
+    response = auth_client.post('/api/applications/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert (payload['imported'], payload['rejected'], payload['errors_truncated']) == (1, 3, False)
+    assert [(e['line'], e['field']) for e in payload['errors']] == [(2, ''), (3, ''), (5, 'course_applied')]
+
+    # The same person again, now pending, is refused; a new one comes in through a CSV upload
+    upload = to_csv([GOOD, dict(GOOD, email='someone.else@example.com', first_name='Meena', phone='9123456780')])
+    response = auth_client.post('/api/applications/import', content_type='multipart/form-data',
+                                data={'file': (io.BytesIO(upload.encode('utf-8-sig')), 'portal.csv')})
+    assert response.get_json()['imported'] == 1
+    assert response.get_json()['rejected'] == 1
+    with auth_client.application.app_context():
+        assert Student.query.count() == 2
+        meena = Student.query.filter_by(first_name='Meena').one()
+        # The same address and course alone do not make a duplicate
+        assert meena.duplicate_group is None
+
+    response = auth_client.post('/api/applications/import', data='x', content_type='text/plain')
+    assert response.status_code == 400
+
+
+def test_api_import_limits_listed_errors(auth_client):
+    auth_client.application.config['IMPORT_ERROR_LIMIT'] = 2
+    try:
+        response = auth_client.post('/api/applications/import?format=csv',
+                                    data=to_csv([dict(GOOD, email='bad')] * 4), content_type='text/csv')
+    finally:
+        auth_client.application.config['IMPORT_ERROR_LIMIT'] = 1000
+    payload = response.get_json()
+    assert payload['rejected'] == 4
+    assert len(payload['errors']) == 2 and payload['errors_truncated']
+
+
+def test_readers_stream_line_by_line():
+    source = io.StringIO('first_name,last_name\n"Multi\nline",Name\nAnn,Lee\n')
+    assert [(line, record['first_name']) for line, record in importer.read_csv(source)] == [
+        (2, 'Multi\nline'), (4, 'Ann')]
+
+    class Endless(io.RawIOBase):
+        """A JSONL source that never ends; reading it all would never return"""
+        def readable(self):
+            return True
+        def readinto(self, buffer):
+            line = json.dumps(GOOD).encode() + b'\n'
+            buffer[:len(line)] = line
+            return len(line)
+    reader = importer.read_jsonl(importer.text_stream(io.BufferedReader(Endless(), 4096)))
+    assert [next(reader)[0] for _ in range(3)] == [1, 2, 3]
+
+
+def test_unreadable_bytes_are_reported_as_row_errors(auth_client):
+    """Bytes that are not UTF-8 or not CSV reject their row instead of failing the whole request"""
+    people = rows(3)
+    lines = to_csv(people).encode().split(b'\r\n')
+    lines[2] = lines[2].replace(b'Partner1', b'Partner\xff1')
+    lines[3] = lines[3].replace(b'Partner2', b'Partner2' + b'x' * 200000)
+    body = b'\r\n'.join(lines)
+    response = auth_client.post('/api/applications/import', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert (payload['imported'], payload['rejected']) == (1, 2)
+    assert [(e['line'], e['message']) for e in payload['errors']] == [
+        (3, importer.NOT_UTF8), (4, 'Invalid CSV: field larger than field limit (131072)')]
+
+    response = auth_client.post('/api/applications/import', data=b'\xff\xfe' + to_csv(rows(2)).encode(),
+                                content_type='text/csv')
+    assert response.status_code == 200
+    assert (response.get_json()['imported'], response.get_json()['rejected']) == (0, 1)
+    assert response.get_json()['errors'][0]['line'] == 1
+
+    response = auth_client.post('/api/applications/import', content_type='application/x-ndjson',
+                                data=b'{"first_name": "\xff"}\n' + json.dumps(dict(GOOD, email='z@example.com')).encode())
+    assert (response.get_json()['imported'], response.get_json()['rejected']) == (1, 1)
@@ -0,0 +1,81 @@
+# tests/test_letter_queue.py
+import os
+import pytest
+from app import Student, db, letter_queue
+
+
+def test_inline_rendering_marks_letter_ready(client, make_student):
+    """With LETTER_WORKERS = 0 the letter is rendered during enqueue"""
+    with client.application.app_context():
+        student = make_student(status='approved')
+        db.session.commit()
+        letter_queue.enqueue(student)
+        db.session.commit()
+        assert student.letter_status == 'ready'
+        assert os.path.exists(os.path.join('test_pdfs', student.admission_letter_path))
+
+
+def test_download_reports_letter_in_progress(client, make_student):
+    """Downloading a queued letter answers 202 instead of 'not found'"""
+    with client.application.app_context():
+        student = make_student(status='approved', letter_status='queued',
+                               admission_letter_path='admission_letter_pending.pdf')
+        db.session.commit()
+        application_id = student.application_id
+
+    client.application.config['LETTER_WORKERS'] = 0  # keep the dispatcher from starting
+    response = client.get(f'/download_letter/{application_id}')
+    assert response.status_code == 202
+    assert 'Retry-After' in response.headers
+    assert b'still being generated' in response.data
+
+
+def test_process_pool_renders_queued_letters(client, make_student):
+    """The dispatcher claims queued rows and records the result on the student"""
+    app = client.application
+    app.config['LETTER_WORKERS'] = 1
+    try:
+        with app.app_context():
+            student = make_student(status='approved')
+            db.session.commit()
+            letter_queue.enqueue(student)
+            db.session.commit()
+            assert student.letter_status == 'queued'
+
+            letter_queue.run_once()
+            assert db.session.get(Student, student.id).letter_status == 'rendering'
+            for future in list(letter_queue._inflight):
+                future.result(timeout=60)
+            letter_queue.run_once()
+
+            db.session.expire_all()
+            student = db.session.get(Student, student.id)
+            assert student.letter_status == 'ready'
+            assert os.path.exists(os.path.join('test_pdfs', student.admission_letter_path))
+    finally:
+        letter_queue.stop()
+        app.config['LETTER_WORKERS'] = 0
+
+
+def test_failed_render_is_recorded(client, make_student):
+    app = client.application
+    app.config['LETTER_WORKERS'] = 1
+    app.config['PDF_FOLDER'] = 'test_pdfs/missing-directory'
+    try:
+        with app.app_context():
+            student = make_student(status='approved')
+            db.session.commit()
+            letter_queue.enqueue(student)
+            db.session.commit()
+
+            letter_queue.run_once()
+            for future in list(letter_queue._inflight):
+                future.exception(timeout=60)
+            letter_queue.run_once()
+
+            db.session.expire_all()
+            assert db.session.get(Student, student.id).letter_status == 'failed'
+    finally:
+        letter_queue.stop()
+        app.config['LETTER_WORKERS'] = 0
+        app.config['PDF_FOLDER'] = 'test_pdfs'
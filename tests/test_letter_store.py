@@ -0,0 +1,119 @@
+# tests/test_letter_store.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import Student, db, letter_queue, letter_store
+from tests.test_letters import letter_text
+from letter_store import LetterStore, stored_letter
+import letters
+
+
+@pytest.fixture
+def approved(client, make_student):
+    letter_store.clear()
+    with client.application.app_context():
+        student = make_student(status='approved')
+        db.session.commit()
+        letter_queue.enqueue(student)
+        db.session.commit()
+        return student.id, student.application_id
+
+
+def test_letter_key_follows_the_letter_fields():
+    fields = {name: 'x' for name in letters.LETTER_FIELDS}
+    assert letters.letter_key(fields) == letters.letter_key(dict(fields, address='elsewhere'))
+    assert letters.letter_key(fields) != letters.letter_key(dict(fields, cgpa='9.9'))
+
+
+def test_stale_and_missing_letters_are_rendered_again(client, approved):
+    student_id, application_id = approved
+    url = f'/download_letter/{application_id}'
+    first = client.get(url)
+    assert first.status_code == 200 and 'Dear Test Student00000,' in letter_text(first.data)
+    hits = letter_store.stats()['hits']
+    assert client.get(url).data == first.data
+    assert letter_store.stats()['hits'] == hits + 1
+
+    with client.application.app_context():
+        student = db.session.get(Student, student_id)
+        student.first_name = 'Renamed'
+        db.session.commit()
+    renamed = client.get(url)
+    assert renamed.status_code == 200 and 'Dear Renamed Student00000,' in letter_text(renamed.data)
+    assert renamed.headers['ETag'] != first.headers['ETag']
+
+    with client.application.app_context():
+        student = db.session.get(Student, student_id)
+        path = os.path.join('test_pdfs', student.admission_letter_path)
+        assert student.letter_key == letters.letter_key(letters.letter_fields(student))
+        with open(path, 'rb') as f:
+            assert f.read() == renamed.data
+
+        # A deleted or failed letter is rendered on the next download
+        os.unlink(path)
+        student.letter_status = 'failed'
+        db.session.commit()
+    response = client.get(url)
+    assert response.status_code == 200 and response.headers['Accept-Ranges'] == 'bytes'
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(url, headers={'Range': 'bytes=0-7'}).data == b'%PDF-1.4'
+    with client.application.app_context():
+        assert db.session.get(Student, student_id).letter_status == 'ready'
+        assert os.path.exists(path)
+
+
+def test_download_answers_202_while_another_request_renders(client, approved, monkeypatch):
+    _, application_id = approved
+
+    def busy(*args, **kwargs):
+        raise TimeoutError
+    monkeypatch.setattr(letter_store, 'load', busy)
+    response = client.get(f'/download_letter/{application_id}')
+    assert response.status_code == 202 and 'Retry-After' in response.headers
+
+
+def test_concurrent_loads_share_one_render():
+    store = LetterStore()
+    started, release = threading.Event(), threading.Event()
+    renders = []
+
+    def render():
+        renders.append(1)
+        started.set()
+        release.wait(10)
+        return stored_letter('k' * 64, b'%PDF letter', time.time_ns())
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        first = pool.submit(store.load, 'key', render)
+        started.wait(10)
+        waiting = [pool.submit(store.load, 'key', render) for _ in range(4)]
+        while store.stats()['coalesced'] < 4:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(10) for future in [first] + waiting]
+    assert len(renders) == 1
+    assert all(result is results[0] for result in results)
+    assert store.load('key', render) is results[0]
+    assert store.stats() == {'hits': 1, 'misses': 1, 'coalesced': 4, 'evictions': 0, 'size': 1, 'bytes': 11}
+
+    def fail():
+        raise RuntimeError('render failed')
+    with pytest.raises(RuntimeError):
+        store.load('other', fail)
+    assert store.load('other', lambda: results[0]) is results[0]
+
+
+def test_cache_is_bounded_by_count_and_bytes():
+    store = LetterStore(max_entries=2, max_bytes=100)
+    for key in 'abc':
+        store.load(key, lambda: stored_letter(key * 64, b'x' * 40, 0))
+    assert store.stats()['size'] == 2 and store.stats()['evictions'] == 1
+    store.load('b', lambda: None)  # a hit moves b to the front
+    store.load('d', lambda: stored_letter('d' * 64, b'x' * 70, 0))
+    assert store.stats()['size'] == 1 and store.stats()['bytes'] == 70
+    store.load('e', lambda: stored_letter('e' * 64, b'x' * 200, 0))
+    assert store.stats()['size'] == 1
+    again = stored_letter('e' * 64, b'x' * 10, 0)
+    assert store.load('e', lambda: again) is again
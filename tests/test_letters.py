@@ -0,0 +1,72 @@
+# tests/test_letters.py
+import io
+import os
+import reportlab
+from pypdf import PdfReader
+import letters
+
+FIELDS = {
+    'application_id': 'APP20250101ABCD1234',
+    'first_name': 'Ada',
+    'last_name': 'Lovelace (Byron)',
+    'course_applied': 'computer_science',
+    'email': 'ada@example.com',
+    'phone': '1234567890',
+    'previous_qualification': 'Bachelor of Science',
+    'cgpa': '9.5',
+}
+
+
+def letter_text(data):
+    return '\n'.join(page.extract_text() for page in PdfReader(io.BytesIO(data)).pages)
+
+
+def test_letter_contains_student_fields():
+    data = letters.get_template().render_bytes(FIELDS)
+    assert data.startswith(b'%PDF-1.4')
+    text = letter_text(data)
+    assert 'UNIVERSITY ADMISSION LETTER' in text
+    assert 'Dear Ada Lovelace (Byron),' in text
+    assert 'Application ID: APP20250101ABCD1234' in text
+    assert 'Course: Computer Science' in text
+
+
+def test_letters_use_the_builtin_fonts_by_default():
+    data = letters.get_template().render_bytes(dict(FIELDS, first_name='Zoë'))
+    assert b'/BaseFont /Helvetica' in data
+    assert b'/FontFile2' not in data
+    assert len(data) < 5000
+    assert 'Dear Zoë Lovelace (Byron),' in letter_text(data)
+
+
+def test_configured_fonts_are_embedded():
+    bundled = os.path.join(os.path.dirname(reportlab.__file__), 'fonts')
+    fonts = (os.path.join(bundled, 'VeraIt.ttf'), os.path.join(bundled, 'VeraBI.ttf'))
+    data = letters.get_template(fonts).render_bytes(FIELDS)
+    assert b'/FontFile2' in data
+    assert 'Dear Ada Lovelace (Byron),' in letter_text(data)
+
+
+def test_names_outside_latin1_and_markup_survive():
+    fields = dict(FIELDS, first_name='Łukasz', last_name='Żółć <b>&amp;')
+    data = letters.get_template().render_bytes(fields)
+    assert b'/FontFile2' in data
+    assert 'Dear Łukasz Żółć <b>&amp;,' in letter_text(data)
+
+
+def test_long_fields_wrap_and_continue_on_the_next_page():
+    fields = dict(FIELDS, previous_qualification=' '.join(['Qualification'] * 600))
+    reader = PdfReader(io.BytesIO(letters.get_template().render_bytes(fields)))
+    assert len(reader.pages) > 1
+    assert 'University Name' in reader.pages[-1].extract_text()
+    assert len(PdfReader(io.BytesIO(letters.get_template().render_bytes(FIELDS))).pages) == 1
+
+
+def test_batch_reports_per_letter_errors(tmp_path):
+    results = letters.render_admission_letters([
+        (FIELDS, str(tmp_path / 'ok.pdf')),
+        (FIELDS, str(tmp_path / 'missing' / 'fail.pdf')),
+    ])
+    assert results[0] is None
+    assert 'FileNotFoundError' in results[1]
+    assert 'Dear Ada' in letter_text((tmp_path / 'ok.pdf').read_bytes())
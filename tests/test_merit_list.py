@@ -0,0 +1,117 @@
+# tests/test_merit_list.py
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, event, text
+from app import Student, db, merit_list
+from tests.test_migrations import OLD_STUDENT_SCHEMA
+import grades
+import migrations
+
+
+@pytest.mark.parametrize('raw, score', [
+    ('8.7', 8.7), ('8.7/10', 8.7), ('3.6/4', 9.0), ('87%', 8.7), ('87', 8.7), (' 9 ', 9.0),
+    ('abc', None), ('120', None), ('5/4', None), ('', None), (None, None),
+])
+def test_parse_cgpa(raw, score):
+    assert grades.parse_cgpa(raw) == score
+
+
+def test_typed_columns_follow_raw_values(client, make_student):
+    with client.application.app_context():
+        make_student(cgpa='85%', date_of_birth='2001-02-03')
+        db.session.commit()
+        student = Student.query.one()
+        assert student.cgpa_score == 8.5
+        assert student.birth_date == date(2001, 2, 3)
+
+        student.cgpa = '3.2/4'
+        db.session.commit()
+        assert Student.query.one().cgpa_score == 8.0
+
+
+def test_merit_list_ranks_top_n_per_course(auth_client, make_student):
+    with auth_client.application.app_context():
+        ids = [make_student(cgpa=cgpa).application_id for cgpa in ['7.0', '9.5', '82%', '9.5', '6.1']]
+        ids.append(make_student(course_applied='data_science', cgpa='3.9/4').application_id)
+        make_student(course_applied='data_science', cgpa='unreadable')
+        db.session.commit()
+
+    response = auth_client.get('/api/merit-list?limit=3&fields=application_id,cgpa_score')
+    assert response.status_code == 200
+    courses = response.get_json()['courses']
+    # Equal scores go to the earlier application
+    assert courses['computer_science'] == [
+        {'application_id': ids[1], 'cgpa_score': 9.5, 'rank': 1},
+        {'application_id': ids[3], 'cgpa_score': 9.5, 'rank': 2},
+        {'application_id': ids[2], 'cgpa_score': 8.2, 'rank': 3},
+    ]
+    assert courses['data_science'] == [{'application_id': ids[5], 'cgpa_score': 9.75, 'rank': 1}]
+    assert courses['civil_engineering'] == []
+
+
+def test_merit_list_filters_course_and_status(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student(cgpa='9.9', status='rejected')
+        pending = make_student(cgpa='8.0').application_id
+        make_student(course_applied='data_science', cgpa='9.0')
+        db.session.commit()
+
+    response = auth_client.get('/api/merit-list?course=computer_science&status=pending&limit=5')
+    courses = response.get_json()['courses']
+    assert list(courses) == ['computer_science']
+    assert [row['application_id'] for row in courses['computer_science']] == [pending]
+
+    assert auth_client.get('/api/merit-list?course=astrology').status_code == 400
+    assert auth_client.get('/api/merit-list?limit=0').status_code == 400
+    assert auth_client.get('/api/merit-list?fields=nope').status_code == 400
+
+
+def test_merit_list_only_ranks_top_rows(client, make_student):
+    """The window function sees each course's top rows, read from the merit index, not the whole table"""
+    with client.application.app_context():
+        ids = [make_student(course_applied='civil_engineering', cgpa=f'{5 + i / 10:.1f}').application_id
+               for i in range(40)]
+        db.session.commit()
+
+        statements = []
+        def record(conn, cursor, statement, parameters, *args):
+            statements.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            ranked = merit_list(2, ['application_id', 'cgpa_score'], courses=['civil_engineering'])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert [row.application_id for row in ranked['civil_engineering']] == [ids[39], ids[38]]
+        assert len(statements) == 1
+        plan = ' | '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+            'EXPLAIN QUERY PLAN ' + statements[0][0], statements[0][1]))
+        assert 'ix_student_course_cgpa' in plan
+        assert 'SCAN student' not in plan.replace('SCAN student USING', '')
+
+
+def test_filters_by_birth_date_and_min_cgpa(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student(cgpa='9.0', date_of_birth='1998-05-01')
+        make_student(cgpa='6.0', date_of_birth='2003-05-01')
+        young = make_student(cgpa='8.0', date_of_birth='2004-05-01').application_id
+        db.session.commit()
+
+    response = auth_client.get('/api/applications?born_from=2000-01-01&min_cgpa=7&fields=application_id')
+    assert response.get_json() == [{'application_id': young}]
+
+
+def test_backfill_migration_parses_existing_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_STUDENT_SCHEMA))
+        conn.execute(text(
+            "INSERT INTO student (application_id, first_name, last_name, email, phone, address, date_of_birth, "
+            "course_applied, previous_qualification, cgpa) VALUES "
+            "('OLD1', 'A', 'B', 'a@example.com', '1234567890', 'Somewhere', '1999-12-31', 'data_science', 'HSC', '76%'),"
+            "('OLD2', 'C', 'D', 'c@example.com', '1234567890', 'Somewhere', '31/12/1999', 'data_science', 'HSC', 'n/a')"))
+
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT application_id, cgpa_score, birth_date FROM student ORDER BY id')).all()
+    assert rows == [('OLD1', 7.6, '1999-12-31'), ('OLD2', None, None)]
@@ -0,0 +1,92 @@
+# tests/test_metrics.py
+import logging
+from app import Student, db, instrumentation
+from metrics import Histogram
+
+
+def test_histogram_exposition_is_cumulative():
+    """Buckets are cumulative and end with +Inf, _sum and _count"""
+    histogram = Histogram('demo_seconds', 'Demo.', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'a')
+    histogram.observe(0.5, 'a')
+    histogram.observe(5, 'a')
+    lines = histogram.collect()
+    assert 'demo_seconds_bucket{route="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="a",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{route="a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_sum{route="a"} 5.55' in lines
+    assert 'demo_seconds_count{route="a"} 3' in lines
+
+
+def test_metrics_endpoint_requires_login(client):
+    response = client.get('/admin/metrics')
+    assert response.status_code == 302
+
+
+def test_metrics_report_requests_sql_and_templates(auth_client):
+    """Route latency, per-request SQL and template timings appear in the scrape"""
+    auth_client.get('/admin/dashboard')
+    response = auth_client.get('/admin/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_count{endpoint="admin.admin_dashboard",method="GET",status="200"}' in body
+    assert 'http_request_sql_queries_count{endpoint="admin.admin_dashboard"}' in body
+    assert 'template_render_seconds_count{template="admin_dashboard.html"}' in body
+    assert 'status_cache_hits' in body
+
+
+def test_letter_render_time_is_recorded(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student()
+        db.session.commit()
+        student_id = Student.query.first().id
+    before = instrumentation.letter_latency.collect()
+
+    auth_client.post(f'/admin/review/{student_id}', data={'status': 'approved', 'comments': 'ok'})
+    assert instrumentation.letter_latency.collect() != before
+
+    # A download that finds the letter stale renders it in the request, and is timed too
+    with auth_client.application.app_context():
+        student = Student.query.get(student_id)
+        student.letter_status = 'failed'
+        application_id = student.application_id
+        db.session.commit()
+    before = instrumentation.letter_latency.collect()
+    assert auth_client.get(f'/download_letter/{application_id}').status_code == 200
+    assert instrumentation.letter_latency.collect() != before
+
+
+def test_repeated_statements_are_logged(auth_client, caplog, make_student):
+    """A statement run N_PLUS_ONE_THRESHOLD times in one request is flagged"""
+    app = auth_client.application
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student()
+        db.session.commit()
+    app.config['N_PLUS_ONE_THRESHOLD'] = 3
+    try:
+        with caplog.at_level(logging.WARNING, logger='metrics'):
+            for _ in range(3):
+                auth_client.post('/check_status', data={'application_id': 'missing'})
+            assert not any('Possible N+1' in r.message for r in caplog.records)
+
+            with app.test_request_context('/admin/dashboard'):
+                app.preprocess_request()
+                for student in Student.query.all():
+                    Student.query.filter_by(id=student.id).first()
+        assert any('Possible N+1 in admin.admin_dashboard' in r.message for r in caplog.records)
+    finally:
+        app.config['N_PLUS_ONE_THRESHOLD'] = 10
+
+
+def test_slow_queries_are_logged(auth_client, caplog):
+    app = auth_client.application
+    app.config['SLOW_QUERY_MS'] = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger='metrics'):
+            auth_client.get('/admin/dashboard')
+        assert any(r.message.startswith('Slow query') for r in caplog.records)
+    finally:
+        app.config['SLOW_QUERY_MS'] = 200
@@ -0,0 +1,105 @@
+# tests/test_migrations.py
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, text
+from app import Student, application_stats, db, filter_applications
+import migrations
+
+OLD_STUDENT_SCHEMA = """
+CREATE TABLE student (
+    id INTEGER NOT NULL PRIMARY KEY,
+    application_id VARCHAR(20) NOT NULL UNIQUE,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    phone VARCHAR(20) NOT NULL,
+    address TEXT NOT NULL,
+    date_of_birth VARCHAR(20) NOT NULL,
+    course_applied VARCHAR(100) NOT NULL,
+    previous_qualification VARCHAR(200) NOT NULL,
+    cgpa VARCHAR(10) NOT NULL,
+    status VARCHAR(20),
+    degree_certificate VARCHAR(200),
+    id_proof VARCHAR(200),
+    application_date DATETIME,
+    review_date DATETIME,
+    admin_comments TEXT,
+    admission_letter_path VARCHAR(200)
+)
+"""
+
+
+def explain(query):
+    """Return SQLite's EXPLAIN QUERY PLAN output for an ORM query or a SELECT as one string"""
+    compiled = getattr(query, 'statement', query).compile(dialect=db.engine.dialect)
+    params = tuple(
+        compiled.params[name].isoformat(' ') if isinstance(compiled.params[name], datetime)
+        else compiled.params[name]
+        for name in compiled.positiontup
+    )
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).fetchall()
+    return ' | '.join(str(row[-1]) for row in rows)
+
+
+def test_upgrade_adds_indexes_to_existing_database(tmp_path):
+    """An old database without indexes is brought up to the latest version"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_STUDENT_SCHEMA))
+
+    applied = migrations.upgrade(engine)
+    assert applied == [m.version for m in migrations.MIGRATIONS]
+
+    names = {ix['name'] for ix in inspect(engine).get_indexes('student')}
+    assert {'ix_student_status_date', 'ix_student_course_status',
+            'ix_student_application_date_id', 'ix_student_email'} <= names
+
+    # Running again is a no-op
+    assert migrations.upgrade(engine) == []
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == migrations.MIGRATIONS[-1].version
+
+
+def test_upgrade_is_safe_after_create_all(client):
+    """Migrations skip indexes that create_all() already built"""
+    with client.application.app_context():
+        migrations.upgrade(db.engine)
+        with db.engine.connect() as conn:
+            assert migrations.current_version(conn) == migrations.MIGRATIONS[-1].version
+
+
+def test_dashboard_query_uses_date_index(client):
+    with client.application.app_context():
+        query = Student.query.order_by(Student.application_date.desc(), Student.id.desc()).limit(51)
+        plan = explain(query)
+        assert 'ix_student_application_date_id' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+def test_status_filter_uses_status_index(client):
+    with client.application.app_context():
+        query = (filter_applications(Student.query, {'status': 'pending'})
+                 .order_by(Student.application_date.desc(), Student.id.desc()).limit(51))
+        plan = explain(query)
+        assert 'ix_student_status_date' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+def test_course_filter_uses_course_index(client):
+    with client.application.app_context():
+        query = filter_applications(Student.query, {'course': 'data_science', 'status': 'approved'})
+        assert 'ix_student_course_status' in explain(query)
+
+
+def test_dashboard_counts_read_the_counter_rows(client):
+    """The badge totals are looked up in application_stat's primary key, not counted from student"""
+    with client.application.app_context():
+        for query in (application_stats.counts_query(), application_stats.counts_query(course='data_science')):
+            plan = explain(query)
+            assert 'SEARCH application_stat USING INDEX' in plan and 'student' not in plan
+        assert application_stats.counts()['total'] == 0
+
+
+def test_email_lookup_uses_email_index(client):
+    with client.application.app_context():
+        assert 'ix_student_email' in explain(Student.query.filter_by(email='someone@example.com'))
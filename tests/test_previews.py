@@ -0,0 +1,138 @@
+# tests/test_previews.py
+import io
+import os
+import uuid
+import zlib
+from PIL import Image
+from reportlab.pdfgen import canvas
+from sqlalchemy import create_engine, text
+from app import Student, StoredFile, add_file_reference, db, document_queue
+from tests.test_migrations import OLD_STUDENT_SCHEMA
+import migrations
+import previews
+import storage
+
+
+def pdf_bytes(pages):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for i in range(pages):
+        pdf.drawString(100, 700, f'Page {i + 1} {uuid.uuid4()}')
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (width, height), os.urandom(width * height * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def apply_with(client, make_student, degree, degree_name, id_proof, id_name):
+    email = f'preview.{uuid.uuid4().hex[:8]}@example.com'
+    data = make_student.form(email=email, degree_certificate=(io.BytesIO(degree), degree_name),
+                             id_proof=(io.BytesIO(id_proof), id_name))
+    assert client.post('/apply', data=data).status_code == 302
+    with client.application.app_context():
+        student = Student.query.filter_by(email=email).one()
+        return (student.id, db.session.get(StoredFile, student.degree_certificate),
+                db.session.get(StoredFile, student.id_proof))
+
+
+def test_file_types_and_page_counts():
+    assert previews.sniff(b'%PDF-1.7\n') == 'pdf'
+    assert previews.sniff(b'\xef\xbb\xbf%PDF-1.4') == 'pdf'
+    assert previews.sniff(b'\x89PNG\r\n\x1a\nrest') == 'png'
+    assert previews.sniff(b'\xff\xd8\xff\xe0') == 'jpeg'
+    assert previews.sniff(b'MZ\x90\x00') is None
+    assert previews.pdf_page_count(pdf_bytes(3)) == 3
+
+    # PDF 1.5 keeps the page tree in compressed object streams
+    objects = (b'<< /Type /Catalog /Pages 2 0 R >>' + b'<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>'
+               + b'<< /Type /Page /Parent 2 0 R >><< /Type /Page /Parent 2 0 R >>')
+    stream = zlib.compress(b'1 0 2 34 3 81 4 113 ' + objects)
+    pdf = (b'%PDF-1.5\n5 0 obj\n<< /Type /ObjStm /N 4 /First 20 /Filter /FlateDecode /Length '
+           + str(len(stream)).encode() + b' >>\nstream\n' + stream + b'\nendstream\nendobj\n%%EOF\n')
+    assert previews.pdf_page_count(pdf) == 2
+
+
+def test_uploads_get_checked_and_previewed(auth_client, make_student):
+    scan = png_bytes(2400, 300)
+    student_id, image, pdf = apply_with(auth_client, make_student, scan, 'scan.png', pdf_bytes(2), 'id.pdf')
+
+    assert (image.check_status, image.detected_type, image.page_count) == ('ready', 'png', 1)
+    assert (pdf.check_status, pdf.detected_type, pdf.page_count) == ('ready', 'pdf', 2)
+    with Image.open(os.path.join('test_uploads', image.thumbnail_path)) as thumbnail:
+        assert max(thumbnail.size) == 320
+    with Image.open(os.path.join('test_uploads', image.display_path)) as display:
+        assert display.size == (2000, 250)
+    assert os.path.getsize(os.path.join('test_uploads', image.display_path)) < len(scan)
+
+    url = f'/admin/review/{student_id}/documents/degree_certificate'
+    page = auth_client.get(f'/admin/review/{student_id}').data
+    assert f'{url}?version=thumbnail'.encode() in page
+    assert f'{url}?version=original'.encode() in page
+    assert b'PDF, 2 pages' in page
+
+    assert auth_client.get(url).mimetype == 'image/jpeg'
+    assert auth_client.get(f'{url}?version=original').data == scan
+    thumbnail = auth_client.get(f'{url}?version=thumbnail')
+    assert thumbnail.mimetype == 'image/jpeg' and thumbnail.headers['ETag'] == f'"{image.sha256}-thumbnail"'
+    assert auth_client.get(f'{url}?version=huge').status_code == 404
+    if not pdf.thumbnail_path:  # without pdftoppm
+        id_url = f'/admin/review/{student_id}/documents/id_proof'
+        assert auth_client.get(f'{id_url}?version=thumbnail').status_code == 404
+        assert auth_client.get(id_url).mimetype == 'application/pdf'
+
+
+def test_renamed_files_are_flagged(auth_client, make_student):
+    student_id, renamed, small = apply_with(auth_client, make_student, b'MZ\x90\x00 not a certificate',
+                                            'degree.pdf', png_bytes(40, 40), 'photo.jpg')
+    assert (renamed.check_status, renamed.detected_type) == ('mismatch', None)
+    assert (small.check_status, small.detected_type, small.thumbnail_path) == ('mismatch', 'png', None)
+    page = auth_client.get(f'/admin/review/{student_id}').data
+    assert page.count(b'does not match its extension') == 2
+    assert b'(it is a PNG)' in page
+
+
+def test_process_pool_checks_queued_uploads(client):
+    app = client.application
+    app.config['DOCUMENT_WORKERS'] = 1
+    try:
+        with app.app_context():
+            image = storage.save_stream(io.BytesIO(png_bytes(50, 50)), 'test_uploads', 'small.png')
+            missing = storage.save_stream(io.BytesIO(pdf_bytes(1)), 'test_uploads', 'gone.pdf')
+            add_file_reference(image)
+            add_file_reference(missing)
+            db.session.commit()
+            os.unlink(os.path.join('test_uploads', missing.path))
+            assert {row.check_status for row in StoredFile.query} == {'queued'}
+            document_queue.run_once()
+            assert {row.check_status for row in StoredFile.query} == {'processing'}
+            for future in list(document_queue._inflight):
+                future.result(timeout=60)
+            document_queue.run_once()
+
+            db.session.expire_all()
+            image, missing = db.session.get(StoredFile, image.path), db.session.get(StoredFile, missing.path)
+            assert (image.check_status, image.display_path) == ('ready', None)
+            assert os.path.exists(os.path.join('test_uploads', image.thumbnail_path))
+            assert missing.check_status == 'failed'
+
+            assert document_queue.requeue_all() == 2
+    finally:
+        document_queue.stop()
+        app.config['DOCUMENT_WORKERS'] = 0
+
+
+def test_migration_queues_existing_uploads(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_STUDENT_SCHEMA))
+        conn.execute(text('CREATE TABLE stored_file (path VARCHAR(200) PRIMARY KEY, sha256 VARCHAR(64) NOT NULL, '
+                          'size INTEGER NOT NULL, ref_count INTEGER NOT NULL, created_at DATETIME)'))
+        conn.execute(text("INSERT INTO stored_file VALUES ('ab/cd/abcd.pdf', 'abcd', 10, 1, NULL)"))
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT check_status FROM stored_file')).scalar() == 'queued'
@@ -0,0 +1,121 @@
+# tests/test_ratelimit.py
+import threading
+import pytest
+from app import rate_limiter
+from ratelimit import MemoryStore, SQLiteStore
+import public_views
+
+
+@pytest.fixture
+def limits(client):
+    config = client.application.config
+    keys = ('RATE_LIMIT_ENABLED', 'RATE_LIMITS', 'RATE_LIMITS_TOTAL', 'INFLIGHT_LIMITS', 'RATE_LIMIT_PROXY_HOPS')
+    saved = {key: config[key] for key in keys}
+    config.update(RATE_LIMIT_ENABLED=True, RATE_LIMITS={}, RATE_LIMITS_TOTAL={}, INFLIGHT_LIMITS={})
+    rate_limiter.reset()
+    yield config
+    config.update(saved)
+    rate_limiter.reset()
+
+
+def check(client, address='10.0.0.1', **kwargs):
+    return client.post('/check_status', data={'application_id': 'NOPE'},
+                       environ_base={'REMOTE_ADDR': address}, **kwargs)
+
+
+def test_buckets_per_client_and_per_route(client, limits):
+    limits['RATE_LIMITS'] = {'public.check_status': (2, 60)}
+    assert [check(client).status_code for _ in range(3)] == [302, 302, 429]
+    limited = check(client)
+    assert limited.headers['Retry-After'] == '30'
+    assert check(client, '10.0.0.2').status_code == 302
+    assert client.get('/status').status_code == 200  # only POSTs are limited
+
+    limits['RATE_LIMITS_TOTAL'] = {'public.check_status': (1, 60)}
+    assert check(client, '10.0.0.3').status_code == 302
+    assert check(client, '10.0.0.4').status_code == 429
+
+    metrics = rate_limiter.requests.collect()
+    assert 'rate_limit_requests_total{endpoint="public.check_status",outcome="limited"} 3' in metrics
+
+
+def test_shared_bucket_429_costs_the_client_nothing(client, limits):
+    limits.update(RATE_LIMITS={'public.check_status': (1, 60)}, RATE_LIMITS_TOTAL={'public.check_status': (1, 60)})
+    assert check(client, '10.0.0.1').status_code == 302
+    assert check(client, '10.0.0.2').status_code == 429
+    # 10.0.0.2 got its token back once the shared bucket said no
+    limits['RATE_LIMITS_TOTAL'] = {}
+    assert check(client, '10.0.0.2').status_code == 302
+    assert check(client, '10.0.0.2').status_code == 429
+
+
+def test_forwarded_address_behind_trusted_proxy(client, limits):
+    limits.update(RATE_LIMITS={'public.check_status': (1, 60)}, RATE_LIMIT_PROXY_HOPS=1)
+    assert check(client, headers={'X-Forwarded-For': '198.51.100.7'}).status_code == 302
+    assert check(client, headers={'X-Forwarded-For': '198.51.100.8'}).status_code == 302
+    assert check(client, headers={'X-Forwarded-For': '198.51.100.7'}).status_code == 429
+
+
+def test_requests_over_the_inflight_limit_are_shed(client, limits, monkeypatch):
+    limits.update(INFLIGHT_LIMITS={'public.check_status': 1}, RATE_LIMITS={'public.check_status': (2, 600)})
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_lookup(application_id):
+        entered.set()
+        release.wait(10)
+    monkeypatch.setattr(public_views, 'lookup_status', slow_lookup)
+
+    first = threading.Thread(target=lambda: check(client.application.test_client()))
+    first.start()
+    try:
+        assert entered.wait(10)
+        assert 'rate_limit_inflight{endpoint="public.check_status"} 1' in rate_limiter.inflight.collect()
+        shed = [check(client) for _ in range(3)]
+        assert [response.status_code for response in shed] == [503] * 3
+        assert shed[0].headers['Retry-After'] == '2'
+    finally:
+        release.set()
+        first.join(10)
+    assert 'rate_limit_inflight{endpoint="public.check_status"} 0' in rate_limiter.inflight.collect()
+    # Shed requests took no tokens, and a limited one gives its slot back
+    assert [check(client).status_code for _ in range(2)] == [302, 429]
+    assert 'rate_limit_inflight{endpoint="public.check_status"} 0' in rate_limiter.inflight.collect()
+
+
+def test_tokens_refill_over_time(tmp_path):
+    now = [100.0]
+    for store in (MemoryStore(clock=lambda: now[0]), SQLiteStore(str(tmp_path / 'limits.db'), clock=lambda: now[0])):
+        now[0] = 100.0
+        assert [store.take('k', 2, 0.5) for _ in range(3)] == [0.0, 0.0, 2.0]
+        now[0] += 1
+        assert store.take('k', 2, 0.5) == 1.0
+        now[0] += 1
+        assert store.take('k', 2, 0.5) == 0.0
+
+
+def test_tokens_are_given_back(tmp_path):
+    now = [100.0]
+    for store in (MemoryStore(clock=lambda: now[0]), SQLiteStore(str(tmp_path / 'limits.db'), clock=lambda: now[0])):
+        assert [store.take('k', 2, 0.5) for _ in range(2)] == [0.0, 0.0]
+        store.give_back('k', 2, 0.5)
+        store.give_back('k', 2, 0.5)
+        store.give_back('k', 2, 0.5)  # never above burst
+        assert [store.take('k', 2, 0.5) for _ in range(3)] == [0.0, 0.0, 2.0]
+
+
+def test_sqlite_store_is_shared_and_swept(tmp_path):
+    now = [100.0]
+    first = SQLiteStore(str(tmp_path / 'limits.db'), clock=lambda: now[0])
+    second = SQLiteStore(str(tmp_path / 'limits.db'), clock=lambda: now[0])
+    assert first.take('k', 1, 1.0) == 0.0
+    assert second.take('k', 1, 1.0) == 1.0
+    now[0] += 10
+    assert SQLiteStore(str(tmp_path / 'limits.db'), clock=lambda: now[0]).take('other', 1, 1.0) == 0.0
+    assert len(first) == 1  # 'k' had refilled and was swept out
+
+
+def test_memory_store_is_bounded():
+    store = MemoryStore(max_size=2)
+    for key in 'abc':
+        store.take(key, 1, 1.0)
+    assert len(store) == 2
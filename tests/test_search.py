@@ -0,0 +1,183 @@
+# tests/test_search.py
+import pytest
+from sqlalchemy import create_engine, text
+from app import Student, db, search_index
+from pagination import decode_cursor
+from tests.test_migrations import OLD_STUDENT_SCHEMA
+import migrations
+import search
+
+
+@pytest.fixture
+def trigram_backend(client):
+    client.application.config['SEARCH_BACKEND'] = 'trigram'
+    yield client
+    client.application.config['SEARCH_BACKEND'] = 'auto'
+
+
+def ids(query, limit=10, **kwargs):
+    return [row.id for row in search_index.search(query, limit, **kwargs).items]
+
+
+def test_words_and_trigrams():
+    assert search.words('Jane.Roe@Example.com  98765') == ['jane', 'roe', 'example', 'com', '98765']
+    assert search.fts_query('Jane Ro') == '"jane" "ro"*'
+    assert search.trigrams('Ann') == {'  a', ' an', 'ann', 'nn '}
+
+
+def test_fts_finds_every_searchable_field(client, make_student):
+    with client.application.app_context():
+        assert search_index.backend() == 'fts5'
+        make_student(last_name='Candidate1')
+        student = make_student(last_name='Candidate2')
+        db.session.commit()
+        student.first_name, student.phone = 'Saksham', '5550001111'
+        student.previous_qualification = 'Diploma in Robotics'
+        db.session.commit()
+
+        assert ids('saks') == [student.id]
+        assert ids(student.application_id) == [student.id]
+        assert ids(student.email) == [student.id]
+        assert ids('555000') == [student.id]
+        assert ids('robotics') == [student.id]
+        assert ids('candidate1') == [student.id - 1]
+        assert ids('saksham candidate1') == []
+
+
+def test_fts_follows_updates_and_deletes(client, make_student):
+    with client.application.app_context():
+        student = make_student(last_name='Candidate1')
+        db.session.commit()
+        student.last_name = 'Umate'
+        db.session.commit()
+        assert ids('candidate1') == []
+        assert ids('umate') == [student.id]
+
+        # Writes that bypass the ORM are indexed by the triggers
+        db.session.execute(text("UPDATE student SET email = 'new.address@example.org'"))
+        db.session.commit()
+        assert ids('address') == [student.id]
+        db.session.execute(text('DELETE FROM student'))
+        db.session.commit()
+        assert ids('umate') == []
+
+
+def test_identifier_matches_rank_above_qualification(client, make_student):
+    with client.application.app_context():
+        first, second = make_student(), make_student()
+        db.session.commit()
+        db.session.execute(text("UPDATE student SET previous_qualification = 'Graduate of Kepler College' "
+                                "WHERE id = :id"), {'id': first.id})
+        db.session.execute(text("UPDATE student SET email = 'kepler@example.com' WHERE id = :id"),
+                           {'id': second.id})
+        db.session.commit()
+        assert ids('kepler') == [second.id, first.id]
+
+
+def test_search_uses_the_index(client, make_student):
+    with client.application.app_context():
+        make_student()
+        db.session.commit()
+        plan = ' | '.join(row[-1] for row in db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT student.id FROM student_search JOIN student ON student.id = "
+            "student_search.rowid WHERE student_search MATCH 'test*' ORDER BY rank")))
+        assert 'SCAN student_search VIRTUAL TABLE INDEX' in plan
+        assert 'SEARCH student USING INTEGER PRIMARY KEY' in plan
+
+
+def test_search_api_pages_and_filters(auth_client, make_student):
+    with auth_client.application.app_context():
+        applied = [make_student(course_applied='data_science' if i % 2 else 'civil_engineering').application_id
+                   for i in range(7)]
+        db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        response = auth_client.get('/api/applications/search', query_string={
+            'q': 'test', 'limit': 3, 'fields': 'application_id', **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.get_json()
+        seen.extend(item['application_id'] for item in body['items'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(applied)
+
+    response = auth_client.get('/api/applications/search?q=test&course=data_science&fields=application_id,course')
+    assert {item['course'] for item in response.get_json()['items']} == {'data_science'}
+    assert 'score' in response.get_json()['items'][0]
+
+    assert auth_client.get('/api/applications/search?q=%20').status_code == 400
+    assert auth_client.get('/api/applications/search?q=test&cursor=bogus').status_code == 400
+    assert auth_client.get('/api/applications/search?q=test&fields=nope').status_code == 400
+
+
+def test_dashboard_search(auth_client, make_student):
+    with auth_client.application.app_context():
+        make_student(last_name='Candidate1')
+        make_student(last_name='Candidate2')
+        db.session.commit()
+
+    response = auth_client.get('/admin/dashboard?q=candidate2')
+    assert response.status_code == 200
+    assert b'Search Results' in response.data
+    assert b'Candidate2' in response.data
+    assert b'Candidate1<' not in response.data
+    # "Apply to all filtered" would ignore the search, so it is hidden
+    assert b'Apply to All Filtered' not in response.data
+    assert b'No applications match your search.' in auth_client.get('/admin/dashboard?q=nobody').data
+
+
+def test_trigram_backend_tolerates_typos_and_follows_updates(trigram_backend, make_student):
+    with trigram_backend.application.app_context():
+        make_student(last_name='Candidate1')
+        student = make_student(last_name='Candidate2')
+        db.session.commit()
+        student.first_name = 'Saksham'
+        db.session.commit()
+
+        assert ids('saksam') == [student.id]
+        assert ids('saksham candidate2')[0] == student.id
+        student.first_name = 'Aarav'
+        db.session.commit()
+        assert ids('saksham') == []
+        assert ids('aarav') == [student.id]
+
+        page = search_index.search('test', 1)
+        rest = search_index.search('test', 5, after=decode_cursor(page.next_cursor, (float, int)))
+        assert sorted([row.id for row in page.items + rest.items]) == sorted(
+            s.id for s in Student.query)
+
+
+def test_migration_indexes_existing_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_STUDENT_SCHEMA))
+        conn.execute(text(
+            "INSERT INTO student (application_id, first_name, last_name, email, phone, address, date_of_birth, "
+            "course_applied, previous_qualification, cgpa) VALUES "
+            "('OLD1', 'Meera', 'Nair', 'meera@example.com', '1234567890', 'Somewhere', '1999-12-31', "
+            "'data_science', 'HSC', '76%')"))
+
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT rowid FROM student_search WHERE student_search MATCH 'meer*'")).all() == [(1,)]
+        conn.execute(text("UPDATE student SET last_name = 'Iyer'"))
+        assert conn.execute(text("SELECT rowid FROM student_search WHERE student_search MATCH 'iyer'")).all() == [(1,)]
+
+
+def test_broad_queries_list_newest_first(client, make_student):
+    app = client.application
+    with app.app_context():
+        for _ in range(5):
+            make_student()
+        db.session.commit()
+        newest = [s.id for s in Student.query.order_by(Student.id.desc())]
+        app.config['SEARCH_RANK_LIMIT'] = 3
+        try:
+            page = search_index.search('test', 2)
+            rest = search_index.search('test', 5, after=decode_cursor(page.next_cursor, (float, int)))
+        finally:
+            app.config['SEARCH_RANK_LIMIT'] = 10000
+        assert [row.id for row in page.items + rest.items] == newest
+        assert {row.score for row in page.items} == {0.0}
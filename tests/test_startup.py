@@ -0,0 +1,30 @@
+# tests/test_startup.py
+import os
+import subprocess
+import sys
+from app import db, letter_queue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Milliseconds `import app` may add on top of Flask and Flask-SQLAlchemy; raise it for a slow CI runner
+BUDGET_MS = os.environ.get('STARTUP_BUDGET_MS', '250')
+
+
+def test_import_stays_within_budget():
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'bench_startup.py'),
+                             '--runs', '3', '--max-ms', BUDGET_MS], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_letter_folder_is_created_by_the_first_letter(client, tmp_path, make_student):
+    app = client.application
+    app.config['PDF_FOLDER'] = str(tmp_path / 'letters')
+    try:
+        with app.app_context():
+            student = make_student(status='approved')
+            db.session.commit()
+            letter_queue.enqueue(student)
+            db.session.commit()
+            assert student.letter_status == 'ready'
+            assert os.path.isfile(tmp_path / 'letters' / student.admission_letter_path)
+    finally:
+        app.config['PDF_FOLDER'] = 'test_pdfs'
@@ -0,0 +1,131 @@
+# tests/test_stats.py
+from datetime import datetime
+from sqlalchemy import create_engine, event, text
+from app import ApplicationStat, Student, db, application_stats, allocate_seats
+from tests.test_migrations import OLD_STUDENT_SCHEMA
+import migrations
+import stats
+
+
+def test_counters_follow_inserts_reviews_and_bulk_updates(auth_client, make_student):
+    app = auth_client.application
+    with app.app_context():
+        for _ in range(3):
+            make_student(course_applied='data_science', application_date=datetime(2025, 3, 1))
+        for _ in range(2):
+            make_student(course_applied='civil_engineering', application_date=datetime(2025, 3, 2))
+        db.session.commit()
+        first, second, third = [s.id for s in Student.query.filter_by(course_applied='data_science')]
+
+    auth_client.post(f'/admin/review/{first}', data={'status': 'rejected', 'comments': 'Incomplete'})
+    auth_client.post('/api/applications/review', json={'status': 'approved', 'ids': [second, third]})
+    with app.app_context():
+        make_student(course_applied='civil_engineering', cgpa='9.0')
+        db.session.commit()
+        allocate_seats({'civil_engineering': 1}, reject_unassigned=True)
+
+        assert application_stats.counts() == {'pending': 0, 'approved': 3, 'rejected': 3, 'total': 6}
+        assert application_stats.counts(course='data_science') == {
+            'pending': 0, 'approved': 2, 'rejected': 1, 'total': 3}
+        assert application_stats.counts(day_from=datetime(2025, 3, 2), day_to=datetime(2025, 3, 2)) == {
+            'pending': 0, 'approved': 0, 'rejected': 2, 'total': 2}
+        # Every change was counted as it happened, so a recount finds nothing to fix
+        assert application_stats.reconcile() == 0
+
+
+def test_reconcile_corrects_drift(client, make_student):
+    app = client.application
+    with app.app_context():
+        for _ in range(4):
+            make_student(course_applied='data_science')
+        db.session.commit()
+        # Bypasses the ORM and the counters
+        db.session.execute(text("UPDATE student SET status = 'approved' WHERE id <= 2"))
+        db.session.execute(text("DELETE FROM student WHERE id = 4"))
+        db.session.commit()
+        assert application_stats.counts()['pending'] == 4
+
+    result = app.test_cli_runner().invoke(args=['reconcile-stats', '--once'])
+    assert result.exit_code == 0, result.output
+    assert 'counters corrected' in result.output
+    with app.app_context():
+        assert application_stats.counts() == {'pending': 1, 'approved': 2, 'rejected': 0, 'total': 3}
+        assert application_stats.reconcile() == 0
+
+
+def test_dashboard_totals_do_not_scan_students(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(3):
+            make_student(course_applied='data_science', status='approved')
+        for _ in range(2):
+            make_student(course_applied='civil_engineering')
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = auth_client.get('/admin/dashboard?course=data_science')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert b'Total Applications: 3' in response.data
+    assert b'Approved: 3' in response.data
+    assert not [s for s in statements if 'count(' in s.lower() and 'FROM student' in s]
+
+
+def test_stats_endpoint(auth_client, make_student):
+    with auth_client.application.app_context():
+        for _ in range(2):
+            make_student(course_applied='data_science', application_date=datetime(2025, 3, 1))
+        make_student(course_applied='data_science', status='approved', application_date=datetime(2025, 3, 3))
+        db.session.commit()
+
+    response = auth_client.get('/api/stats?course=data_science&days=1')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['totals'] == {'pending': 2, 'approved': 1, 'rejected': 0, 'total': 3}
+    assert body['by_course'] == {'data_science': {'pending': 2, 'approved': 1, 'rejected': 0, 'total': 3}}
+    assert body['by_day'] == [{'day': '2025-03-03', 'pending': 0, 'approved': 1, 'rejected': 0, 'total': 1}]
+
+    again = auth_client.get('/api/stats?course=data_science&days=1',
+                            headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert auth_client.get('/api/stats?days=0').status_code == 400
+    assert auth_client.get('/api/stats?course=astrology').status_code == 400
+
+
+def test_migration_counts_existing_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_STUDENT_SCHEMA))
+        conn.execute(text(
+            "INSERT INTO student (application_id, first_name, last_name, email, phone, address, date_of_birth, "
+            "course_applied, previous_qualification, cgpa, status, application_date) VALUES "
+            "('OLD1', 'A', 'B', 'a@example.com', '1234567890', 'Somewhere', '1999-12-31', 'data_science', 'HSC', "
+            "'76%', 'pending', '2024-06-01 10:00:00'),"
+            "('OLD2', 'C', 'D', 'c@example.com', '1234567890', 'Somewhere', '1999-12-31', 'data_science', 'HSC', "
+            "'81%', 'approved', '2024-06-01 11:00:00')"))
+
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        rows = set(conn.execute(text('SELECT day, course, status, count FROM application_stat')))
+    assert ('', '', 'pending', 1) in rows
+    assert ('2024-06-01', 'data_science', 'approved', 1) in rows
+    assert len(rows) == 8
+
+
+def test_reconcile_locks_the_counters_on_postgresql():
+    """PostgreSQL needs a table lock; a no-op UPDATE would lock no rows there"""
+    class Connection:
+        dialect = type('Dialect', (), {'name': 'postgresql'})
+        statements = []
+
+        def execute(self, statement):
+            self.statements.append(str(statement))
+
+    conn = Connection()
+    stats.lock_counters(conn, ApplicationStat.__table__)
+    assert conn.statements == ['LOCK TABLE application_stat IN SHARE ROW EXCLUSIVE MODE']
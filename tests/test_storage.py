@@ -0,0 +1,64 @@
+# tests/test_storage.py
+import hashlib
+import io
+import os
+import uuid
+from app import Student, StoredFile, db, delete_unreferenced_file, release_file
+import storage
+
+
+def test_save_stream_is_content_addressed(tmp_path):
+    data = os.urandom(storage.CHUNK_SIZE * 3 + 17)
+    digest = hashlib.sha256(data).hexdigest()
+
+    first = storage.save_stream(io.BytesIO(data), str(tmp_path), 'Scan Copy.PDF')
+    assert first.created
+    assert first.sha256 == digest
+    assert first.size == len(data)
+    assert first.path == os.path.join(digest[:2], digest[2:4], digest + '.pdf')
+    assert (tmp_path / first.path).read_bytes() == data
+
+    second = storage.save_stream(io.BytesIO(data), str(tmp_path), 'copy.pdf')
+    assert not second.created
+    assert second.path == first.path
+    assert os.listdir(tmp_path / '.incoming') == []
+
+
+def test_save_stream_reads_in_chunks(tmp_path):
+    """Uploads are never read in one piece"""
+    class Recorder(io.BytesIO):
+        sizes = []
+        def read(self, size=-1):
+            self.sizes.append(size)
+            return super().read(size)
+
+    stream = Recorder(b'x' * (storage.CHUNK_SIZE * 2))
+    storage.save_stream(stream, str(tmp_path), 'big.pdf')
+    assert stream.sizes and all(size == storage.CHUNK_SIZE for size in stream.sizes)
+
+
+def test_duplicate_uploads_share_one_file(client, make_student):
+    """Two applications with the same certificate store it once with two references"""
+    degree = b'identical degree certificate ' + uuid.uuid4().bytes
+    for i in range(2):
+        response = client.post('/apply', data=make_student.form(degree_certificate=degree, id_proof=uuid.uuid4().bytes,
+                                                                last_name='Tester'), follow_redirects=True)
+        assert b'Application submitted successfully' in response.data
+
+    with client.application.app_context():
+        students = Student.query.filter_by(last_name='Tester').all()
+        assert len(students) == 2
+        assert students[0].degree_certificate == students[1].degree_certificate
+        assert students[0].id_proof != students[1].id_proof
+
+        stored = db.session.get(StoredFile, students[0].degree_certificate)
+        assert stored.ref_count == 2
+        assert stored.sha256 == hashlib.sha256(degree).hexdigest()
+
+        assert release_file(stored.path) is False
+        assert release_file(stored.path) is True
+        db.session.commit()
+        path = stored.path
+        assert delete_unreferenced_file(path) is True
+        assert db.session.get(StoredFile, path) is None
+        assert not os.path.exists(os.path.join('test_uploads', path))